@@ -0,0 +1,234 @@
+import datetime
+import numpy as np
+from station_columns import ELEMENTS
+
+SEASONAL_MONTHS = {
+    "spring": {3, 4, 5},
+    "summer": {6, 7, 8},
+    "fall": {9, 10, 11},
+    "winter": {12, 1, 2},
+}
+MONTH_SEASONS = {month: season for season, months in SEASONAL_MONTHS.items() for month in months}
+# Zuordnung Monat -> Jahreszeit als Matrix (12 x 4) für gruppierte Summen
+SEASON_MATRIX = np.array([[month in months for months in SEASONAL_MONTHS.values()] for month in range(1, 13)], dtype=np.int64)
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# Summe und Anzahl eines Werts zu den Jahresdaten hinzufügen
+def add_to_year_data(year_data, year, month, datatype, total, count):
+    """
+    Adds a sum of values to the yearly and seasonal totals of a year.
+
+    Args:
+        year_data (dict): Totals per year, updated in place.
+        year (int): Year the values are attributed to (December already shifted).
+        month (int): Month of the values.
+        datatype (str): "TMAX" or "TMIN".
+        total (int): Sum of the values.
+        count (int): Number of values.
+    """
+    if year not in year_data:
+        year_data[year] = {
+            "tmax": [0, 0], "tmin": [0, 0],
+            "seasons": {season: {"tmax": [0, 0], "tmin": [0, 0]} for season in SEASONAL_MONTHS}
+        }
+
+    key = datatype.lower()
+    for totals in (year_data[year][key], year_data[year]["seasons"][MONTH_SEASONS[month]][key]):
+        totals[0] += total
+        totals[1] += count
+
+# Durchschnittswerte aus den Jahressummen berechnen
+def format_averages(year_data):
+    """
+    Converts yearly and seasonal totals into the list of average temperatures.
+    The last year is removed because it contains incomplete data.
+
+    Args:
+        year_data (dict): Totals per year as built by add_to_year_data.
+
+    Returns:
+        list: List of dictionaries containing average temperatures per year and season.
+    """
+    result = []
+    for year, values in sorted(year_data.items()):
+        season_averages = {}
+        for season, temps in values["seasons"].items():
+            season_averages[f"{season}_tmax"] = _average(temps["tmax"])
+            season_averages[f"{season}_tmin"] = _average(temps["tmin"])
+
+        result.append({"year": year, "tmax": _average(values["tmax"]), "tmin": _average(values["tmin"]), **season_averages})
+    result.pop()  # Entferne letztes Jahr, da es unvollständige Daten enthält
+
+    return result
+
+def _average(totals):
+    total, count = totals
+    return round(total / count / 10, 1) if count else None
+
+
+# Monatssummen einer Station
+class MonthlyAggregates:
+    """
+    Sums and counts of the TMAX/TMIN values of one station per (year, month, element).
+
+    Any year window can be answered from these cells with exactly the result
+    of calculate_averages on the raw data.
+
+    Attributes:
+        first_year (int): Year of the first row of the arrays.
+        sums (numpy.ndarray): Sums of the values, shape (years, 12, 2).
+        counts (numpy.ndarray): Number of values, shape (years, 12, 2).
+    """
+    __slots__ = ("first_year", "sums", "counts")
+
+    def __init__(self, first_year, sums, counts):
+        self.first_year = first_year
+        self.sums = sums
+        self.counts = counts
+
+    @classmethod
+    def from_results(cls, data):
+        """
+        Builds the monthly cells from parsed station data.
+
+        Args:
+            data (dict): Parsed station data as returned by parse_station_data.
+
+        Returns:
+            MonthlyAggregates: Monthly sums and counts of the station.
+        """
+        return cls.from_rows(data["results"])
+
+    @classmethod
+    def from_rows(cls, entries):
+        """
+        Builds the monthly cells from a stream of parsed entries without keeping the entries.
+
+        Args:
+            entries (iterable): Parsed entries as yielded by iter_station_data.
+
+        Returns:
+            MonthlyAggregates: Monthly sums and counts of the station.
+        """
+        cells = {}
+        for entry in entries:
+            try:
+                date = datetime.datetime.strptime(entry["date"], "%Y%m%d")
+            except (TypeError, ValueError):
+                continue  # Überspringe Einträge mit ungültigem Datum
+            if entry.get("datatype") not in ELEMENTS or entry.get("value") is None:
+                continue
+
+            cell = cells.setdefault((date.year, date.month, ELEMENTS.index(entry["datatype"])), [0, 0])
+            cell[0] += entry["value"]
+            cell[1] += 1
+
+        years = [year for year, _, _ in cells]
+        first_year = min(years, default=0)
+        shape = (max(years, default=-1) - first_year + 1, 12, len(ELEMENTS))
+        sums = np.zeros(shape, dtype=np.int64)
+        counts = np.zeros(shape, dtype=np.int64)
+        for (year, month, element), (total, count) in cells.items():
+            sums[year - first_year, month - 1, element] = total
+            counts[year - first_year, month - 1, element] = count
+        return cls(first_year, sums, counts)
+
+    @classmethod
+    def from_columns(cls, blocks):
+        """
+        Builds the monthly cells from column blocks with grouped reductions.
+
+        Dates that strptime would reject (invalid month or day) are skipped,
+        like in calculate_averages.
+
+        Args:
+            blocks (iterable): (dates, element codes, values) arrays as yielded by iter_station_columns.
+
+        Returns:
+            MonthlyAggregates: Monthly sums and counts of the station.
+        """
+        parts = []
+        for dates, elements, values in blocks:
+            years, months, days = dates // 10000, dates // 100 % 100, dates % 100
+            valid = (years >= 1) & (months >= 1) & (months <= 12) & (days >= 1) & (days <= _days_in_month(years, months))
+            if not valid.any():
+                continue
+            years, months, elements, values = years[valid], months[valid], elements[valid], values[valid]
+
+            first_year = int(years.min())
+            cells = ((years - first_year) * 12 + months - 1) * len(ELEMENTS) + elements
+            size = (int(years.max()) - first_year + 1) * 12 * len(ELEMENTS)
+            sums = np.bincount(cells, weights=values, minlength=size)
+            counts = np.bincount(cells, minlength=size)
+            parts.append((first_year, np.rint(sums).astype(np.int64).reshape(-1, 12, len(ELEMENTS)), counts.reshape(-1, 12, len(ELEMENTS))))
+
+        if not parts:
+            return cls(0, np.zeros((0, 12, len(ELEMENTS)), dtype=np.int64), np.zeros((0, 12, len(ELEMENTS)), dtype=np.int64))
+
+        first_year = min(part[0] for part in parts)
+        shape = (max(part[0] + len(part[1]) for part in parts) - first_year, 12, len(ELEMENTS))
+        sums = np.zeros(shape, dtype=np.int64)
+        counts = np.zeros(shape, dtype=np.int64)
+        for part_first_year, part_sums, part_counts in parts:
+            offset = part_first_year - first_year
+            sums[offset:offset + len(part_sums)] += part_sums
+            counts[offset:offset + len(part_counts)] += part_counts
+        return cls(first_year, sums, counts)
+
+    def averages(self, start_year, end_year):
+        """
+        Computes yearly and seasonal temperature averages for a year window.
+
+        Like get_station_data, the raw years start_year-1 .. end_year are
+        considered and December is shifted into the following year.
+
+        Args:
+            start_year (int): The start year for filtering data.
+            end_year (int): The end year for filtering data.
+
+        Returns:
+            list: List of dictionaries containing average temperatures per year and season.
+        """
+        # Monatssummen der Jahre start_year-1 .. end_year+1 mit verschobenem Dezember
+        years = max(end_year - start_year + 3, 1)
+        sums = np.zeros((years, 12, len(ELEMENTS)), dtype=np.int64)
+        counts = np.zeros((years, 12, len(ELEMENTS)), dtype=np.int64)
+        first = max(start_year - 1, self.first_year)
+        last = min(end_year, self.first_year + len(self.counts) - 1)
+        if first <= last:
+            source = slice(first - self.first_year, last - self.first_year + 1)
+            target = slice(first - start_year + 1, last - start_year + 2)
+            sums[target, :11] = self.sums[source, :11]
+            counts[target, :11] = self.counts[source, :11]
+            shifted = slice(target.start + 1, target.stop + 1)  # Verschiebe Dezember in das Folgejahr
+            sums[shifted, 11] = self.sums[source, 11]
+            counts[shifted, 11] = self.counts[source, 11]
+        sums, counts = sums[1:], counts[1:]  # Nur Jahre start_year .. end_year+1
+
+        # Jahres- und Jahreszeitensummen als gruppierte Reduktion
+        season_sums = np.einsum("yme,ms->yse", sums, SEASON_MATRIX)
+        season_counts = np.einsum("yme,ms->yse", counts, SEASON_MATRIX)
+        year_sums = sums.sum(axis=1)
+        year_counts = counts.sum(axis=1)
+
+        year_data = {}
+        for offset in np.flatnonzero(year_counts.sum(axis=1)).tolist():
+            year_data[start_year + offset] = {
+                "tmax": [int(year_sums[offset, 0]), int(year_counts[offset, 0])],
+                "tmin": [int(year_sums[offset, 1]), int(year_counts[offset, 1])],
+                "seasons": {
+                    season: {
+                        "tmax": [int(season_sums[offset, index, 0]), int(season_counts[offset, index, 0])],
+                        "tmin": [int(season_sums[offset, index, 1]), int(season_counts[offset, index, 1])],
+                    }
+                    for index, season in enumerate(SEASONAL_MONTHS)
+                },
+            }
+
+        return format_averages(year_data)
+
+
+def _days_in_month(years, months):
+    leap = ((years % 4 == 0) & (years % 100 != 0)) | (years % 400 == 0)
+    return np.where((months == 2) & leap, 29, DAYS_IN_MONTH[np.clip(months, 1, 12) - 1])
+
@@ -0,0 +1,162 @@
+import asyncio
+import re
+import time
+from asgiref.wsgi import WsgiToAsgi
+from urllib.parse import parse_qs
+from werkzeug.http import parse_etags
+from main import app as flask_app
+from controller import start_inventory_updates
+from catalog import station_catalog
+from response_cache import response_cache
+from business_async import get_stations_within_radius, get_station_data
+from external_async import async_http_client
+from prewarm import start_prewarm, station_popularity
+from metrics import request_metrics, start_request, stage, server_timing, SERVER_TIMING
+from response_format import FORMATS, AVERAGE_COLUMNS, MIN_COMPRESS_BYTES, negotiate_format, negotiate_encoding, serialize
+
+FLOAT = r"(-?\d+\.\d+)"  # Wie der Flask-Konverter float(signed=True)
+INT = r"(\d+)"
+
+# API-Routen mit asynchroner Verarbeitung; alle übrigen Pfade beantwortet die Flask-Anwendung
+ROUTES = [
+    (
+        re.compile(rf"/stations-within-radius/{FLOAT}/{FLOAT}/{INT}/{INT}/{INT}/{INT}"),
+        "stations-within-radius",
+        (float, float, int, int, int, int),
+        get_stations_within_radius,
+    ),
+    (
+        re.compile(rf"/station-data/([^/]+)/{INT}/{INT}"),
+        "station-data",
+        (str, int, int),
+        get_station_data,
+    ),
+]
+
+# Spalten der Spaltenformate je Route; sonst die Schlüssel der ersten Zeile
+ROUTE_COLUMNS = {"station-data": AVERAGE_COLUMNS}
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+# ASGI-Einstiegspunkt, z. B. "uvicorn asgi:app --host 0.0.0.0 --port 5000"
+async def app(scope, receive, send):
+    """
+    ASGI application serving the station API with asynchronous upstream fetches.
+
+    The two data routes are answered by the async business functions with the
+    same response cache, ETag and Cache-Control handling and the same request
+    metrics as the Flask routes.
+    Every other request is passed to the Flask application.
+
+    Args:
+        scope (dict): ASGI connection scope.
+        receive (callable): ASGI receive channel.
+        send (callable): ASGI send channel.
+    """
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    if scope["type"] == "http" and scope["method"] == "GET":
+        for pattern, name, types, handler in ROUTES:
+            match = pattern.fullmatch(scope["path"])
+            if match:
+                params = tuple(convert(value) for convert, value in zip(types, match.groups()))
+                start = time.perf_counter()
+                timings = start_request()
+                status, headers, body = await cached_json(
+                    (name, *params), lambda: handler(*params), _request_headers(scope),
+                    parse_qs(scope.get("query_string", b"").decode("latin-1")), ROUTE_COLUMNS.get(name),
+                )
+                if name == "station-data" and status in (200, 304):
+                    station_popularity.record(params[0])  # Nur gefundene Stationen zählen
+                seconds = time.perf_counter() - start
+                request_metrics.observe_request(name, status, seconds)
+                if SERVER_TIMING:
+                    headers.append((b"server-timing", server_timing(timings, seconds).encode()))
+                await send({"type": "http.response.start", "status": status, "headers": headers})
+                await send({"type": "http.response.body", "body": body})
+                return
+
+    await wsgi_app(scope, receive, send)
+
+# Antwort aus dem Cache liefern oder asynchron berechnen
+async def cached_json(key, compute, request_headers, query=None, columns=None):
+    """
+    Serves a JSON response from the response cache or computes and stores it.
+
+    Format and compression are negotiated like in the Flask routes, see
+    controller.cached_json.
+
+    Args:
+        key (tuple): Normalized route parameters.
+        compute (callable): Coroutine function returning a (result, status code) tuple.
+        request_headers (dict): Lower-case request headers.
+        query (dict): Parsed query string, lists of values by name.
+        columns (list): Field names of the columnar formats; by default the keys of the first row.
+
+    Returns:
+        tuple: (status code, list of ASGI header pairs, body)
+    """
+    format_param = (query or {}).get("format", [None])[0]
+    response_format = negotiate_format(format_param, request_headers.get("accept"))
+    if response_format is None:
+        return 406, [(b"content-type", b"application/json")], _json_body({"error": f"Unsupported format: {format_param}"})
+    if response_format != "json":
+        key = (*key, response_format)
+
+    version = await asyncio.to_thread(lambda: station_catalog.generation)  # Kann den Katalog neu laden
+    entry = response_cache.get(key, version)
+    if entry is None:
+        try:
+            result, status = await compute()
+        except Exception as e:
+            return 500, [(b"content-type", b"application/json")], _json_body({"error": str(e)})
+        with stage("serialize"):
+            body = serialize(result, response_format, columns) if response_format != "json" and status == 200 else _json_body(result)
+        if status != 200:
+            return status, [(b"content-type", b"application/json")], body
+        entry = response_cache.put(key, version, body)
+
+    encoding = negotiate_encoding(request_headers.get("accept-encoding")) if len(entry.body) >= MIN_COMPRESS_BYTES else None
+    headers = [
+        (b"etag", f'"{entry.encoded_etag(encoding)}"'.encode()),
+        (b"cache-control", f"public, max-age={entry.max_age()}".encode()),
+        (b"vary", b"Accept, Accept-Encoding"),
+    ]
+    if parse_etags(request_headers.get("if-none-match")).contains(entry.encoded_etag(encoding)):
+        return 304, headers, b""
+    if encoding:
+        headers.append((b"content-encoding", encoding.encode()))
+        body = response_cache.encoded(key, entry, encoding)
+    else:
+        body = entry.body
+    return 200, [(b"content-type", FORMATS[response_format].encode()), *headers], body
+
+# Start und Ende des Servers
+async def lifespan(receive, send):
+    """
+    Handles the ASGI lifespan protocol: starts the background inventory updates
+    and prewarming on startup and closes the upstream connections on shutdown.
+
+    Args:
+        receive (callable): ASGI receive channel.
+        send (callable): ASGI send channel.
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_inventory_updates()
+            start_prewarm()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await async_http_client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+def _json_body(result):
+    # Gleiche Serialisierung wie jsonify in den Flask-Routen
+    return flask_app.json.response(result).get_data()
+
+def _request_headers(scope):
+    return {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
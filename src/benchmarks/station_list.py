@@ -0,0 +1,54 @@
+import argparse
+import time
+import numpy as np
+from catalog import to_records
+from business import parse_stations_data, parse_inventory_data
+from station_list import parse_stations, join_inventory
+from benchmarks.synthetic import synthetic_files, STATIONS
+
+def _best_of(repeat, function):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+# Zeilenweisen und vektorisierten Parser vergleichen
+def run(stations=STATIONS, repeat=3):
+    """
+    Times the line parser against the vectorized parser on synthetic files and checks that both agree.
+
+    Args:
+        stations (int): Number of stations in the synthetic files.
+        repeat (int): Number of runs; the fastest run is reported.
+
+    Returns:
+        dict: Sizes and timings in seconds.
+    """
+    station_data, inventory_data = synthetic_files(stations)
+    line_seconds, expected = _best_of(repeat, lambda: to_records(parse_inventory_data(inventory_data.decode(), parse_stations_data(station_data.decode()))))
+    vector_seconds, records = _best_of(repeat, lambda: join_inventory(parse_stations([station_data]), [inventory_data]))
+
+    if not all(np.array_equal(records[field], expected[field], equal_nan=records.dtype[field].kind == "f") for field in records.dtype.names):
+        raise AssertionError("Vectorized parser differs from the line parser")
+
+    return {
+        "stations": stations,
+        "inventory_lines": inventory_data.count(b"\n"),
+        "bytes": len(station_data) + len(inventory_data),
+        "line_parser_seconds": line_seconds,
+        "vectorized_seconds": vector_seconds,
+        "speedup": line_seconds / vector_seconds,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the station list and inventory parsers on synthetic full-size files.")
+    parser.add_argument("--stations", type=int, default=STATIONS, help="number of stations in the synthetic files")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs per parser")
+    args = parser.parse_args()
+
+    result = run(args.stations, args.repeat)
+    print(f"{result['stations']} stations, {result['inventory_lines']} inventory lines, {result['bytes'] / 1e6:.1f} MB")
+    print(f"line parser: {result['line_parser_seconds'] * 1000:.0f} ms, vectorized: {result['vectorized_seconds'] * 1000:.0f} ms, speedup {result['speedup']:.1f}x")
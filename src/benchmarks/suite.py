@@ -0,0 +1,231 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import patch
+import numpy as np
+from business import parse_stations_data, parse_inventory_data, get_stations_within_radius, parse_station_data, calculate_averages
+from external import write_catalog
+from catalog import StationCatalog
+from aggregates import MonthlyAggregates
+from station_columns import iter_station_columns
+from station_list import parse_stations, join_inventory
+from benchmarks.synthetic import synthetic_files, synthetic_station_csv, STATIONS, YEARS
+
+STATION_SIZES = (STATIONS // 10, STATIONS)  # Stationszahlen der Stationsliste
+YEAR_SIZES = (YEARS // 5, YEARS)  # Jahre der Stationsdateien
+RUNS = 5  # Messungen pro Fall
+QUERIES = 500  # Umkreissuchen pro Katalogröße
+RESULTS_FILE = "benchmark-results.json"
+
+# Laufzeiten und Speicherspitze eines Falls messen
+def measure(name, params, calls, items, unit):
+    """
+    Times a benchmark case and measures its peak memory.
+
+    Every call is timed on its own; the peak memory is traced in one extra
+    call, so tracing does not distort the timings.
+
+    Args:
+        name (str): Name of the benchmarked function.
+        params (dict): Input size parameters of the case.
+        calls (list): Functions without arguments, each one timed measurement.
+        items (int): Number of processed items per call, for the throughput.
+        unit (str): Name of the items, e.g. "lines" or "queries".
+
+    Returns:
+        dict: Timings in milliseconds, throughput in items per second and peak memory in bytes.
+    """
+    timings = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        calls[0]()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = np.array(timings)
+    return {
+        "name": name,
+        "params": params,
+        "runs": len(timings),
+        "mean_ms": float(timings.mean() * 1000),
+        "p50_ms": float(np.percentile(timings, 50) * 1000),
+        "p99_ms": float(np.percentile(timings, 99) * 1000),
+        "throughput": float(items / np.percentile(timings, 50)),
+        "unit": f"{unit}/s",
+        "peak_memory_bytes": int(peak_memory),
+    }
+
+# Stationsliste, Inventar und Umkreissuche messen
+def station_list_cases(stations, runs=RUNS, queries=QUERIES, seed=0):
+    """
+    Benchmarks parse_stations_data, parse_inventory_data and get_stations_within_radius on a synthetic catalog.
+
+    Args:
+        stations (int): Number of stations.
+        runs (int): Number of measurements of the parsers.
+        queries (int): Number of radius searches, each one measurement.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        list: Results as returned by measure.
+    """
+    station_data, inventory_data = synthetic_files(stations, seed)
+    station_text, inventory_text = station_data.decode(), inventory_data.decode()
+    params = {"stations": stations, "bytes": len(station_data) + len(inventory_data)}
+    results = [
+        measure("parse_stations_data", params, [lambda: parse_stations_data(station_text)] * runs, station_text.count("\n"), "lines"),
+        measure("parse_inventory_data", params, [lambda: parse_inventory_data(inventory_text, parse_stations_data(station_text))] * runs, inventory_text.count("\n"), "lines"),
+    ]
+
+    # Umkreissuche auf einem Katalog in einem temporären Verzeichnis
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "stations.npy")
+        write_catalog(join_inventory(parse_stations([station_data]), [inventory_data]), datetime.date.today().strftime("%Y-%m-%d"), path)
+        catalog = StationCatalog(path, os.path.join(directory, "stations.json"))
+        catalog.snapshot()
+
+        rng = random.Random(seed)
+        searches = [
+            (rng.uniform(-60, 70), rng.uniform(-180, 180), rng.choice([50, 100, 250, 500]), rng.choice([10, 50, 100]), rng.randint(1900, 2000), rng.randint(2000, 2025))
+            for _ in range(queries)
+        ]
+        with patch("business.station_catalog", catalog):
+            results.append(measure(
+                "get_stations_within_radius", {**params, "queries": queries},
+                [lambda search=search: get_stations_within_radius(*search) for search in searches], 1, "queries",
+            ))
+    return results
+
+# Parsen und Mitteln einer Stationsdatei messen
+def station_data_cases(years, runs=RUNS, seed=0):
+    """
+    Benchmarks parse_station_data, calculate_averages and the columnar
+    aggregation used by get_station_data on a synthetic daily station file.
+
+    Args:
+        years (int): Length of the daily series in years.
+        runs (int): Number of measurements per function.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        list: Results as returned by measure.
+    """
+    end_year = 2024
+    start_year = end_year - years + 1
+    data = synthetic_station_csv(years, end_year, seed=seed)
+    text = data.decode()
+    parsed = parse_station_data(text, start_year - 1, end_year)
+    lines = text.count("\n") - 1
+    params = {"years": years, "lines": lines, "bytes": len(data)}
+    return [
+        measure("parse_station_data", params, [lambda: parse_station_data(text, start_year - 1, end_year)] * runs, lines, "lines"),
+        measure("calculate_averages", params, [lambda: calculate_averages(parsed, start_year, end_year)] * runs, len(parsed["results"]), "values"),
+        measure(
+            "station_columns_averages", params,
+            [lambda: MonthlyAggregates.from_columns(iter_station_columns([data], start_year - 1, end_year)).averages(start_year, end_year)] * runs,
+            lines, "lines",
+        ),
+    ]
+
+# Gesamte Benchmark-Suite ausführen
+def run(station_sizes=STATION_SIZES, year_sizes=YEAR_SIZES, runs=RUNS, queries=QUERIES):
+    """
+    Runs all benchmark cases on synthetic data; no network access is needed.
+
+    Args:
+        station_sizes (tuple): Numbers of stations of the catalog cases.
+        year_sizes (tuple): Lengths in years of the station file cases.
+        runs (int): Number of measurements per case.
+        queries (int): Number of radius searches per catalog size.
+
+    Returns:
+        dict: "environment" (commit, versions, time) and the list of "results".
+    """
+    results = []
+    for stations in station_sizes:
+        results += station_list_cases(stations, runs, queries)
+    for years in year_sizes:
+        results += station_data_cases(years, runs)
+    return {"environment": environment(), "results": results}
+
+def environment():
+    """
+    Describes the code version and platform the benchmarks ran on.
+
+    Returns:
+        dict: Git commit (or None), Python and NumPy versions, machine and UTC time.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processors": os.cpu_count(),
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+# Ergebnisse mit einem früheren Lauf vergleichen
+def compare(results, baseline):
+    """
+    Computes the change of the median latency of every case against a previous run.
+
+    Args:
+        results (dict): Results as returned by run.
+        baseline (dict): Results of an earlier run, e.g. loaded from its JSON file.
+
+    Returns:
+        list: (name, params, baseline p50 in ms, current p50 in ms, ratio) for cases present in both runs.
+    """
+    previous = {(result["name"], json.dumps(result["params"], sort_keys=True)): result for result in baseline["results"]}
+    rows = []
+    for result in results["results"]:
+        old = previous.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if old is not None:
+            rows.append((result["name"], result["params"], old["p50_ms"], result["p50_ms"], result["p50_ms"] / old["p50_ms"]))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the parsing, radius search and averaging hot paths on synthetic data.")
+    parser.add_argument("--stations", type=int, nargs="+", default=list(STATION_SIZES), help="numbers of stations of the synthetic catalogs")
+    parser.add_argument("--years", type=int, nargs="+", default=list(YEAR_SIZES), help="lengths in years of the synthetic station files")
+    parser.add_argument("--runs", type=int, default=RUNS, help="measurements per case")
+    parser.add_argument("--queries", type=int, default=QUERIES, help="radius searches per catalog")
+    parser.add_argument("--output", default=RESULTS_FILE, help="JSON file the results are written to")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = run(tuple(args.stations), tuple(args.years), args.runs, args.queries)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    print(f"{'case':<28} {'size':<28} {'p50 ms':>10} {'p99 ms':>10} {'throughput':>20} {'peak MB':>8}")
+    for result in results["results"]:
+        size = ", ".join(f"{key}={value}" for key, value in result["params"].items() if key != "bytes")
+        print(f"{result['name']:<28} {size:<28} {result['p50_ms']:>10.2f} {result['p99_ms']:>10.2f} {result['throughput']:>12.0f} {result['unit']:<7} {result['peak_memory_bytes'] / 1e6:>8.1f}")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)
+        print(f"\nChange against {args.compare} (commit {baseline['environment'].get('commit')}):")
+        for name, params, old, new, ratio in compare(results, baseline):
+            size = ", ".join(f"{key}={value}" for key, value in params.items() if key != "bytes")
+            print(f"{name:<28} {size:<28} {old:>10.2f} -> {new:>10.2f} ms ({ratio:.2f}x)")
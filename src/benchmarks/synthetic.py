@@ -0,0 +1,72 @@
+import random
+import numpy as np
+
+STATIONS = 125000  # Etwa so viele Zeilen wie ghcnd-stations.txt
+YEARS = 50  # Länge der synthetischen Tagesreihen
+ELEMENTS = ("TMAX", "TMIN", "PRCP", "SNOW", "SNWD", "TAVG")
+DAILY_ELEMENTS = ("TMAX", "TMIN", "PRCP")  # Elemente jeder Tageszeile der Stationsdatei
+
+# Synthetische Dateien im Format von ghcnd-stations.txt und ghcnd-inventory.txt erzeugen
+def synthetic_files(stations=STATIONS, seed=0):
+    """
+    Generates station list and inventory data with the column layout of the NOAA files.
+
+    Args:
+        stations (int): Number of stations.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        tuple: (station list as bytes, inventory data as bytes)
+    """
+    rng = random.Random(seed)
+    station_lines = []
+    inventory_lines = []
+    for number in range(stations):
+        station_id = f"{rng.choice(['US', 'GM', 'CA', 'AS'])}{rng.choice('CMW')}{number:08d}"
+        latitude = rng.uniform(-90, 90)
+        longitude = rng.uniform(-180, 180)
+        elevation = f"{rng.uniform(-50, 4000):6.1f}" if rng.random() < 0.95 else "      "
+        state = rng.choice(["  ", "NY", "CA", "TX"])
+        name = f"STATION {number}"
+        station_lines.append(f"{station_id} {latitude:8.4f} {longitude:9.4f} {elevation} {state} {name:<30} {'GSN' if rng.random() < 0.1 else '   '} {rng.randint(10000, 99999)}")
+        for element in rng.sample(ELEMENTS, rng.randint(1, len(ELEMENTS))):
+            first_year = rng.randint(1850, 2020)
+            inventory_lines.append(f"{station_id} {latitude:8.4f} {longitude:9.4f} {element} {first_year} {rng.randint(first_year, 2025)}")
+    return ("\n".join(station_lines) + "\n").encode(), ("\n".join(inventory_lines) + "\n").encode()
+
+# Synthetische Stationsdatei im Format der by_station-CSVs erzeugen
+def synthetic_station_csv(years=YEARS, end_year=2024, station_id="GME00129634", seed=0):
+    """
+    Generates a daily by_station CSV with TMAX, TMIN and PRCP lines for every day.
+
+    About 1 % of the lines are missing, like the gaps in the NOAA files, and
+    a few lines carry a quality flag.
+
+    Args:
+        years (int): Number of years, ending with end_year.
+        end_year (int): Last year of the series.
+        station_id (str): Station ID written to every line.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        bytes: CSV content including the header line.
+    """
+    rng = np.random.default_rng(seed)
+    days = np.arange(np.datetime64(f"{end_year - years + 1}-01-01"), np.datetime64(f"{end_year + 1}-01-01"))
+    dates = np.char.replace(days.astype(str), "-", "")
+    day_of_year = (days - days.astype("datetime64[Y]")).astype(int)
+    seasonal = -np.cos(2 * np.pi * day_of_year / 365.25) * 100
+
+    values = {
+        "TMAX": np.rint(150 + seasonal + rng.normal(0, 40, len(days))).astype(int),
+        "TMIN": np.rint(50 + seasonal + rng.normal(0, 40, len(days))).astype(int),
+        "PRCP": rng.poisson(20, len(days)),
+    }
+    lines = ["ID,DATE,ELEMENT,DATA_VALUE,M_FLAG,Q_FLAG,S_FLAG,OBS_TIME"]
+    present = rng.random((len(days), len(DAILY_ELEMENTS))) >= 0.01
+    flagged = rng.random(len(days)) < 0.002
+    for day, date in enumerate(dates.tolist()):
+        for position, element in enumerate(DAILY_ELEMENTS):
+            if present[day, position]:
+                lines.append(f"{station_id},{date},{element},{values[element][day]},,{'I' if flagged[day] else ''},E,")
+    return ("\n".join(lines) + "\n").encode()
@@ -1,49 +1,115 @@
 import datetime
+import heapq
 import math
-from external import read_data, write_data, fetch_stations, fetch_inventory_data, fetch_station_data
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from external import write_catalog, fetch_stations, fetch_inventory_data, fetch_station_data, STREAM_CHUNK_SIZE
+from catalog import station_catalog
+from spatial import haversine_vector, DISTANCE_TOLERANCE
+from aggregates import MonthlyAggregates, add_to_year_data, format_averages
+from station_columns import parse_station_line
+from station_archive import station_archive
+from metrics import stage
+from single_flight import SingleFlight
+from station_list import parse_station_entry, parse_inventory_entry, parse_stations, join_inventory
+
+station_flight = SingleFlight()
+
+CATALOG_REFRESH_DAYS = int(os.environ.get("CATALOG_REFRESH_DAYS", 365))  # Mindestalter der Stationsliste für eine Aktualisierung
+update_lock = threading.Lock()
+
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", 8))  # Parallele Abrufe aller Batch-Anfragen
+MAX_BATCH_STATIONS = 100  # Maximale Anzahl Stationen pro Batch-Anfrage
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="station-batch")
 
 # Stationsliste aktualisieren
-def update_stations():
+def update_stations(refresh_days=None, force=False):
     """
-    Updates the station list if it hasn't been retrieved for the current year.
-    Fetches station and inventory data, then writes the updated list to storage.
-    """
-    # Prüfe ob Stationsliste dieses Jahr schon abgerufen wurde.
-    current_year = datetime.datetime.now().year
-    data = read_data()
-    last_update = data.get("last_update")
+    Updates the station list if it is older than the refresh interval.
 
-    if last_update and datetime.datetime.strptime(last_update, "%Y-%m-%d").year == current_year:
-        return
+    Station and inventory files are streamed and decoded block by block into
+    station records (see station_list). The new
+    catalog is written to a temporary file and renamed over the old one, so
+    requests keep using the previous catalog until the new one is complete.
+    Concurrent calls in the same process are skipped while an update runs.
 
-    stations = fetch_and_parse(fetch_stations, parse_stations_data)
-    stations_with_inventory = fetch_and_parse(fetch_inventory_data, parse_inventory_data, stations)
+    Args:
+        refresh_days (int): Minimum age of the station list in days (default CATALOG_REFRESH_DAYS).
+        force (bool): Update regardless of the age of the station list.
 
-    stations_data = {
-        "last_update": datetime.datetime.now().strftime("%Y-%m-%d"),
-        "stations": stations_with_inventory
-    }
-    write_data(stations_data)
+    Returns:
+        bool: True if the station list was updated.
+    """
+    if not force and not catalog_refresh_due(refresh_days):
+        return False
+    if not update_lock.acquire(blocking=False):
+        return False  # Aktualisierung läuft bereits
+
+    try:
+        stations = fetch_and_parse(fetch_stations, parse_stations)
+        stations_with_inventory = fetch_and_parse(fetch_inventory_data, join_inventory, stations)
+
+        write_catalog(stations_with_inventory, datetime.datetime.now().strftime("%Y-%m-%d"), station_catalog.path)
+        station_catalog.reload()
+        return True
+    finally:
+        update_lock.release()
+
+# Prüfen, ob die Stationsliste aktualisiert werden muss
+def catalog_refresh_due(refresh_days=None):
+    """
+    Checks whether the station list is older than the refresh interval.
+
+    Args:
+        refresh_days (int): Minimum age of the station list in days (default CATALOG_REFRESH_DAYS).
+
+    Returns:
+        bool: True if there is no station list or it is at least refresh_days old.
+    """
+    last_update = station_catalog.last_update
+    if not last_update:
+        return True
+    age = datetime.date.today() - datetime.datetime.strptime(last_update, "%Y-%m-%d").date()
+    return age.days >= (CATALOG_REFRESH_DAYS if refresh_days is None else refresh_days)
 
-# Daten abrufen und parsen
+# Daten abrufen und blockweise parsen
 def fetch_and_parse(fetch_func, parse_func, *args):
     """
-    Fetches data using the given function and parses it using the corresponding parser.
-    
+    Fetches data as a stream using the given function and parses it block by block.
+
     Args:
-        fetch_func (function): Function to fetch the data.
-        parse_func (function): Function to parse the data.
-        *args: Additional arguments for the parsing function.
-    
+        fetch_func (function): Function to fetch the data, called with stream=True.
+        parse_func (function): Function parsing the data from *args, chunks of bytes and an encoding.
+        *args: Leading arguments for the parsing function.
+
     Returns:
         Parsed data.
     """
+    response = fetch_response(lambda: fetch_func(stream=True))
+    try:
+        # Einzeln geparste Zeilen werden wie response.text dekodiert
+        return parse_func(*args, response.iter_content(STREAM_CHUNK_SIZE), response.encoding or "utf-8")
+    finally:
+        response.close()
+
+# Daten abrufen
+def fetch_response(fetch_func):
+    """
+    Fetches data using the given function and raises an exception on errors.
+
+    Args:
+        fetch_func (function): Function to fetch the data.
+
+    Returns:
+        Response object of the fetch function.
+    """
     response = fetch_func()
     if isinstance(response, tuple):
         error, status = response
         raise Exception(f"{error['message']} (Status: {status})")
-    
-    return parse_func(response.text, *args)
+    return response
 
 # Daten für alle Stationen abrufen
 def parse_stations_data(stations_data):
@@ -57,26 +123,11 @@ def parse_stations_data(stations_data):
         dict: Parsed station data indexed by station ID.
     """
     station_dict = {}
-    lines = stations_data.splitlines()
-    
-    for line in lines:
-        if len(line) < 85:
-            continue  # Überspringe unvollständige Zeilen
-        
-        try:
-            station = {
-                "id": line[0:11].strip(),
-                "latitude": float(line[12:20].strip()),
-                "longitude": float(line[21:30].strip()),
-                "elevation": float(line[31:37].strip()) if line[31:37].strip() != "" else None,
-                "state": line[38:40].strip() if line[38:40].strip() != "" else None,
-                "name": line[41:71].strip(),
-                "mindate": None,
-                "maxdate": None
-            }
+
+    for line in stations_data.splitlines():
+        station = parse_station_entry(line)
+        if station is not None:
             station_dict[station["id"]] = station
-        except (ValueError, IndexError):
-            continue
 
     return station_dict
 
@@ -92,25 +143,17 @@ def parse_inventory_data(inventory_data, station_dict):
     Returns:
         list: List of stations with temperature record availability.
     """
-    lines = inventory_data.splitlines()
-    
-    for line in lines:
-        if len(line) < 45:
-            continue  # Überspringe unvollständige Zeilen
-        
-        try:
-            station_id = line[0:11].strip()
-            element = line[31:35].strip()
-            first_year = int(line[36:40].strip()) if line[36:40].strip().isdigit() else None
-            last_year = int(line[41:45].strip()) if line[41:45].strip().isdigit() else None
-            
-            if station_id in station_dict and element in ["TMAX", "TMIN"] and first_year and last_year:
-                if station_dict[station_id]["mindate"] is None or first_year > station_dict[station_id]["mindate"]:
-                    station_dict[station_id]["mindate"] = first_year
-                if station_dict[station_id]["maxdate"] is None or last_year < station_dict[station_id]["maxdate"]:
-                    station_dict[station_id]["maxdate"] = last_year
-        except (ValueError, IndexError):
+    for line in inventory_data.splitlines():
+        entry = parse_inventory_entry(line)
+        if entry is None:
             continue
+        station_id, first_year, last_year = entry
+
+        if station_id in station_dict:
+            if station_dict[station_id]["mindate"] is None or first_year > station_dict[station_id]["mindate"]:
+                station_dict[station_id]["mindate"] = first_year
+            if station_dict[station_id]["maxdate"] is None or last_year < station_dict[station_id]["maxdate"]:
+                station_dict[station_id]["maxdate"] = last_year
     filtered_stations = {station_id: station for station_id, station in station_dict.items() if station["mindate"] and station["maxdate"]}
 
     return list(filtered_stations.values())
@@ -125,29 +168,59 @@ def get_stations_within_radius(lat, lon, radius, limit, start_year, end_year):
         lon (float): Longitude of the central point.
         radius (float): Maximum distance in kilometers.
         limit (int): Maximum number of stations to return.
-        start_year (int): Minimum start year of station data.
-        end_year (int): Maximum end year of station data.
+        start_year (int): Minimum start year of station data, or None for no year filter.
+        end_year (int): Maximum end year of station data, or None for no year filter.
 
     Returns:
         tuple: (List of stations sorted by distance, HTTP status code 200)
     """
-    stations = read_data().get("stations", [])
-    stations_with_distance = []
-    
-    for station in stations:
-        if "latitude" in station and "longitude" in station and "mindate" in station and "maxdate" in station:
-            distance = haversine(lat, lon, station["latitude"], station["longitude"])
-            if distance <= radius:
-                min_year = station["mindate"] if station["mindate"] else None
-                max_year = station["maxdate"] if station["maxdate"] else None
-                
-                if min_year and max_year and min_year <= start_year and max_year >= end_year:
-                    station["distance"] = distance  # Füge Entfernung zur Station hinzu
-                    stations_with_distance.append(station)
-    
-    stations_sorted = sorted(stations_with_distance, key=lambda station: station["distance"])
-    
-    return stations_sorted[:limit], 200
+    if limit <= 0:
+        return [], 200
+
+    snapshot = station_catalog.snapshot()
+    columns = snapshot.columns
+    # Max-Heap der bisher nächsten Stationen als (-Entfernung, -Index)
+    nearest = []
+
+    # Gitterzellen in aufsteigender Mindestentfernung durchlaufen
+    for lower_bound, candidates in snapshot.grid.cells_by_distance(lat, lon, radius):
+        if len(nearest) == limit and lower_bound > -nearest[0][0] + DISTANCE_TOLERANCE:
+            break  # Keine weitere Zelle kann eine nähere Station enthalten
+
+        distances = haversine_vector(lat, lon, columns.latitudes[candidates], columns.longitudes[candidates])
+        mindates = columns.mindates[candidates]
+        maxdates = columns.maxdates[candidates]
+        mask = (distances <= radius + DISTANCE_TOLERANCE) & (mindates > 0) & (maxdates > 0)
+        if start_year is not None:
+            mask &= mindates <= start_year
+        if end_year is not None:
+            mask &= maxdates >= end_year
+        candidates = candidates[mask]
+        distances = distances[mask]
+
+        # Kandidaten nach Entfernung durchgehen und mit der skalaren Formel exakt prüfen
+        for position in np.argsort(distances, kind="stable").tolist():
+            if len(nearest) == limit and distances[position] > -nearest[0][0] + DISTANCE_TOLERANCE:
+                break  # Alle weiteren Kandidaten der Gruppe sind weiter entfernt
+            index = int(candidates[position])
+            distance = _station_distance(snapshot, lat, lon, index)
+            if distance > radius:
+                continue
+            if len(nearest) < limit:
+                heapq.heappush(nearest, (-distance, -index))
+            elif (distance, index) < (-nearest[0][0], -nearest[0][1]):
+                heapq.heapreplace(nearest, (-distance, -index))
+
+    # Ergebnis als (Index, Entfernung)-Paare; der Katalog selbst wird nie verändert
+    pairs = [(-index, -distance) for distance, index in sorted(nearest, reverse=True)]
+    stations_sorted = [snapshot.station(index, distance) for index, distance in pairs]
+
+    return stations_sorted, 200
+
+# Entfernung zu einer Station des Katalogs berechnen
+def _station_distance(snapshot, lat, lon, index):
+    columns = snapshot.columns
+    return haversine(lat, lon, float(columns.latitudes[index]), float(columns.longitudes[index]))
 
 # Haversine-Formel zur Berechnung der Entfernung zwischen zwei Koordinaten
 def haversine(lat1, lon1, lat2, lon2):
@@ -183,10 +256,90 @@ def get_station_data(station_id, start_year, end_year):
     Returns:
         tuple: (Processed weather data, HTTP status code 200)
     """
-    parsed_station_data = fetch_and_parse(lambda: fetch_station_data(station_id), parse_station_data, start_year-1, end_year)
-    yearly_monthly_averages = calculate_averages(parsed_station_data, start_year, end_year)
+    # Gleichzeitige Anfragen derselben Station teilen sich Download und Archivierung
+    station_flight.do(station_id, lambda: update_station_archive(station_id))
+    with stage("aggregate"):
+        # Nur die Jahrzehnte lesen, die start_year-1 .. end_year abdecken
+        aggregates = MonthlyAggregates.from_columns(station_archive.read(station_id, start_year - 1, end_year))
+        return aggregates.averages(start_year, end_year), 200
+
+# Daten mehrerer Stationen parallel abrufen
+def get_stations_data(station_ids, start_year, end_year):
+    """
+    Retrieves and processes weather data for several stations in parallel.
+
+    Args:
+        station_ids (list): Unique identifiers of the weather stations.
+        start_year (int): Start year for data retrieval.
+        end_year (int): End year for data retrieval.
+
+    Returns:
+        tuple: (List of {"id", "data"} or {"id", "error"} entries in the order of station_ids, HTTP status code 200)
+    """
+    entries = {entry["id"]: entry for entry in iter_stations_data(station_ids, start_year, end_year)}
+    return [entries[station_id] for station_id in dict.fromkeys(station_ids)], 200
+
+# Daten mehrerer Stationen in Reihenfolge der Fertigstellung liefern
+def iter_stations_data(station_ids, start_year, end_year):
+    """
+    Fetches and aggregates several stations on the shared batch thread pool.
+    Duplicate station IDs are processed once.
+
+    Args:
+        station_ids (list): Unique identifiers of the weather stations.
+        start_year (int): Start year for data retrieval.
+        end_year (int): End year for data retrieval.
+
+    Yields:
+        dict: {"id": station ID, "data": averages} or {"id": station ID, "error": message}, as each station completes.
+    """
+    futures = {
+        batch_executor.submit(get_station_data, station_id, start_year, end_year): station_id
+        for station_id in dict.fromkeys(station_ids)
+    }
+    try:
+        for future in as_completed(futures):
+            try:
+                data, _ = future.result()
+                yield {"id": futures[future], "data": data}
+            except Exception as e:
+                yield {"id": futures[future], "error": str(e)}
+    finally:
+        for future in futures:
+            future.cancel()  # Abgebrochener Stream: noch nicht gestartete Abrufe verwerfen
+
+# Archiv einer Station aktualisieren
+def update_station_archive(station_id):
+    """
+    Fetches the station file and brings the station's columnar archive up to date.
+
+    Only the bytes appended since the last update are parsed when the
+    cached file was extended. If the upstream server fails but the station
+    is already archived, the archived data is used.
+
+    Args:
+        station_id (str): Unique identifier of the weather station.
 
-    return yearly_monthly_averages, 200
+    Returns:
+        dict: Description of the archived data (see StationArchive.meta).
+    """
+    try:
+        with stage("fetch"):
+            response = fetch_response(lambda: fetch_station_data(station_id))
+    except Exception:
+        meta = station_archive.meta(station_id)
+        if meta is None:
+            raise
+        return meta  # Quelle nicht erreichbar: archivierte Daten verwenden
+
+    try:
+        with stage("parse"):
+            meta = station_archive.update(station_id, response)
+    finally:
+        response.close()
+    if meta is None:
+        raise Exception(f"Invalid station ID: {station_id}")
+    return meta
 
 # Stationsdaten parsen
 def parse_station_data(station_data, start_year, end_year):
@@ -201,42 +354,29 @@ def parse_station_data(station_data, start_year, end_year):
     Returns:
         dict: Dictionary containing parsed weather data.
     """
-    lines = station_data.splitlines()
-    header = lines.pop(0).strip()  # Entferne die Kopfzeile
-
-    station_data = {"results": []}
-
-    for line in lines:
-        try:
-            line = line.strip()
-            if not line:  
-                continue  # Überspringe leere Zeilen
+    return {"results": list(iter_station_data(station_data.splitlines(), start_year, end_year))}
 
-            parts = line.split(",")
-
-            date = parts[1].strip()
-            datatype = parts[2].strip()
-            value = parts[3].strip()
-
-            # Parse Jahr aus Datum
-            try:
-                year = int(date[:4])
-            except ValueError:
-                print(f"Invalid date format: {date}")
-                continue
+# Stationsdaten zeilenweise parsen
+def iter_station_data(lines, start_year, end_year):
+    """
+    Parses station weather data incrementally, one line at a time.
+    Rows outside the year range and elements other than TMAX/TMIN are dropped as they arrive.
 
-            if start_year <= year <= end_year:
-                if datatype in {"TMAX", "TMIN"}:
-                    station_data["results"].append({
-                        "date": date,
-                        "datatype": datatype,
-                        "value": int(value) if value != "NA" else None,
-                    })
+    Args:
+        lines (iterable): Lines of the station CSV including the header line (str or bytes).
+        start_year (int): Start year for filtering data.
+        end_year (int): End year for filtering data.
 
-        except Exception as e:
-            print(f"Skipping line due to error: {e}, line: {line}")
+    Yields:
+        dict: Parsed entry with "date", "datatype" and "value".
+    """
+    lines = iter(lines)
+    next(lines, None)  # Überspringe die Kopfzeile
 
-    return station_data
+    for line in lines:
+        entry = parse_station_line(line, start_year, end_year)
+        if entry is not None:
+            yield entry
 
 
 # Durchschnittstemperaturen der einzelnen Jahre/Jahreszeiten berechnen
@@ -253,13 +393,6 @@ def calculate_averages(data, start_year, end_year):
     Returns:
         list: List of dictionaries containing average temperatures per year and season.
     """
-    seasonal_months = {
-        "spring": {3, 4, 5},
-        "summer": {6, 7, 8},
-        "fall": {9, 10, 11},
-        "winter": {12, 1, 2},
-    }
-
     year_data = {}
 
     for entry in data["results"]:
@@ -277,37 +410,9 @@ def calculate_averages(data, start_year, end_year):
             if datatype not in {"TMAX", "TMIN"} or value is None:
                 continue  # Überspringe Eintrag wenn kein TMAX oder TMIN Wert vorhanden ist
 
-            if year not in year_data:
-                year_data[year] = {
-                    "tmax": [], "tmin": [],
-                    "seasons": {season: {"tmax": [], "tmin": []} for season in seasonal_months}
-                }
-
-            # Füge den Wert zur entsprechenden Liste hinzu
-            if datatype == "TMAX":
-                year_data[year]["tmax"].append(value)
-            elif datatype == "TMIN":
-                year_data[year]["tmin"].append(value)
-
-            for season, months in seasonal_months.items():
-                if month in months:
-                    if datatype == "TMAX":
-                        year_data[year]["seasons"][season]["tmax"].append(value)
-                    elif datatype == "TMIN":
-                        year_data[year]["seasons"][season]["tmin"].append(value)
+            # Füge den Wert zu den Jahres- und Jahreszeitensummen hinzu
+            add_to_year_data(year_data, year, month, datatype, value, 1)
         except Exception as e:
             print(f"Skipping entry due to error: {e}, entry: {entry}")
 
-    result = []
-    for year, values in sorted(year_data.items()):
-        yearly_tmax = round(sum(values["tmax"]) / len(values["tmax"]) / 10, 1) if values["tmax"] else None
-        yearly_tmin = round(sum(values["tmin"]) / len(values["tmin"]) / 10, 1) if values["tmin"] else None
-        season_averages = {}
-        for season, temps in values["seasons"].items():
-            season_averages[f"{season}_tmax"] = (round(sum(temps["tmax"]) / len(temps["tmax"]) / 10, 1) if temps["tmax"] else None)
-            season_averages[f"{season}_tmin"] = (round(sum(temps["tmin"]) / len(temps["tmin"]) / 10, 1) if temps["tmin"] else None)
-
-        result.append({"year": year, "tmax": yearly_tmax, "tmin": yearly_tmin, **season_averages})
-    result.pop()  # Entferne letztes Jahr, da es unvollständige Daten enthält
-
-    return result
+    return format_averages(year_data)
@@ -0,0 +1,96 @@
+import asyncio
+import business
+from external_async import fetch_station_data
+from aggregates import MonthlyAggregates
+from station_archive import station_archive
+from metrics import stage
+from single_flight import AsyncSingleFlight
+
+station_flight = AsyncSingleFlight()
+
+# Stationen im Umkreis asynchron suchen
+async def get_stations_within_radius(lat, lon, radius, limit, start_year, end_year):
+    """
+    Asynchronous version of business.get_stations_within_radius.
+
+    The search runs in a worker thread, so a catalog reload does not block
+    the event loop.
+
+    Args:
+        lat (float): Latitude of the central point.
+        lon (float): Longitude of the central point.
+        radius (float): Maximum distance in kilometers.
+        limit (int): Maximum number of stations to return.
+        start_year (int): Minimum start year of station data, or None for no year filter.
+        end_year (int): Maximum end year of station data, or None for no year filter.
+
+    Returns:
+        tuple: (List of stations sorted by distance, HTTP status code 200)
+    """
+    return await asyncio.to_thread(business.get_stations_within_radius, lat, lon, radius, limit, start_year, end_year)
+
+# Stationsdaten asynchron abrufen und verarbeiten
+async def get_station_data(station_id, start_year, end_year):
+    """
+    Asynchronous version of business.get_station_data.
+
+    Args:
+        station_id (str): Unique identifier of the weather station.
+        start_year (int): Start year for data retrieval.
+        end_year (int): End year for data retrieval.
+
+    Returns:
+        tuple: (Processed weather data, HTTP status code 200)
+    """
+    # Gleichzeitige Anfragen derselben Station teilen sich Download und Archivierung
+    await station_flight.do(station_id, lambda: update_station_archive(station_id))
+    with stage("aggregate"):
+        aggregates = await asyncio.to_thread(lambda: MonthlyAggregates.from_columns(station_archive.read(station_id, start_year - 1, end_year)))
+        return aggregates.averages(start_year, end_year), 200
+
+# Archiv einer Station asynchron aktualisieren
+async def update_station_archive(station_id):
+    """
+    Asynchronous version of business.update_station_archive.
+    Parsing and writing the archive run in a worker thread.
+
+    Args:
+        station_id (str): Unique identifier of the weather station.
+
+    Returns:
+        dict: Description of the archived data (see StationArchive.meta).
+    """
+    try:
+        with stage("fetch"):
+            response = await fetch_response(lambda: fetch_station_data(station_id))
+    except Exception:
+        meta = station_archive.meta(station_id)
+        if meta is None:
+            raise
+        return meta  # Quelle nicht erreichbar: archivierte Daten verwenden
+
+    try:
+        with stage("parse"):
+            meta = await asyncio.to_thread(station_archive.update, station_id, response)
+    finally:
+        response.close()
+    if meta is None:
+        raise Exception(f"Invalid station ID: {station_id}")
+    return meta
+
+# Daten asynchron abrufen
+async def fetch_response(fetch_func):
+    """
+    Fetches data using the given coroutine function and raises an exception on errors.
+
+    Args:
+        fetch_func (function): Coroutine function to fetch the data.
+
+    Returns:
+        Response object of the fetch function.
+    """
+    response = await fetch_func()
+    if isinstance(response, tuple):
+        error, status = response
+        raise Exception(f"{error['message']} (Status: {status})")
+    return response
@@ -0,0 +1,249 @@
+import os
+import threading
+import time
+import numpy as np
+from external import read_data, read_catalog, write_catalog, JSON_FILE, CATALOG_FILE, CATALOG_COLUMNS
+from spatial import StationGrid
+
+CATALOG_RETRY_SECONDS = int(os.environ.get("CATALOG_RETRY_SECONDS", 60))  # Höchste Wartezeit bis zum nächsten Ladeversuch nach einem Fehlschlag
+
+# Datensatz einer Station mit fester Breite (Felder wie in parse_stations_data)
+STATION_DTYPE = np.dtype([
+    ("id", "S11"),
+    ("latitude", np.float64),
+    ("longitude", np.float64),
+    ("elevation", np.float64),
+    ("state", "S2"),
+    ("name", "S30"),
+    ("mindate", np.int16),
+    ("maxdate", np.int16),
+])
+
+# Stationsliste in Datensätze fester Breite umwandeln
+def to_records(stations):
+    """
+    Converts a list of station dictionaries into a read-only structured array.
+
+    Missing coordinates and elevations are stored as NaN, missing states as an
+    empty string and missing first/last years as 0.
+
+    Args:
+        stations (list): List of station dictionaries.
+
+    Returns:
+        numpy.ndarray: Read-only array with dtype STATION_DTYPE.
+    """
+    records = np.zeros(len(stations), dtype=STATION_DTYPE)
+    for field, missing in (("latitude", np.nan), ("longitude", np.nan), ("elevation", np.nan), ("mindate", 0), ("maxdate", 0)):
+        records[field] = [missing if station.get(field) is None else station[field] for station in stations]
+    for field in ("id", "state", "name"):
+        records[field] = [(station.get(field) or "").encode("ascii", "replace") for station in stations]
+    records.flags.writeable = False
+    return records
+
+# Datensatz in das JSON-Format der API umwandeln
+def record_to_dict(record, distance):
+    """
+    Converts a station record into the dictionary returned by the API.
+
+    Args:
+        record (numpy.void): Station record with dtype STATION_DTYPE.
+        distance (float): Distance to the central point in kilometers.
+
+    Returns:
+        dict: Station dictionary including the distance.
+    """
+    station_id, latitude, longitude, elevation, state, name, mindate, maxdate = record.item()
+    return {
+        "id": station_id.decode("ascii"),
+        "latitude": latitude,
+        "longitude": longitude,
+        "elevation": None if elevation != elevation else elevation,  # NaN steht für fehlende Höhe
+        "state": state.decode("ascii") or None,
+        "name": name.decode("ascii"),
+        "mindate": mindate or None,
+        "maxdate": maxdate or None,
+        "distance": distance,
+    }
+
+# Spaltenweise Ablage der Stationsdaten
+class StationColumns:
+    """
+    Contiguous NumPy columns of the station fields used by queries.
+
+    Columns read from the catalog file are memory-mapped and shared by all
+    processes; otherwise they are copied out of the records.
+
+    Attributes:
+        ids (numpy.ndarray): Fixed-width station IDs.
+        latitudes (numpy.ndarray): Latitudes as float64 (NaN if missing).
+        longitudes (numpy.ndarray): Longitudes as float64 (NaN if missing).
+        mindates (numpy.ndarray): First year with TMAX/TMIN data as int16 (0 if missing).
+        maxdates (numpy.ndarray): Last year with TMAX/TMIN data as int16 (0 if missing).
+    """
+    __slots__ = ("ids", "latitudes", "longitudes", "mindates", "maxdates")
+
+    def __init__(self, records, columns=None):
+        """
+        Args:
+            records (numpy.ndarray): Station records with dtype STATION_DTYPE.
+            columns (dict): Contiguous columns by field name as returned by read_catalog, or None to copy them from the records.
+        """
+        columns = columns or {field: np.ascontiguousarray(records[field]) for field in CATALOG_COLUMNS}
+        self.ids = columns["id"]
+        self.latitudes = columns["latitude"]
+        self.longitudes = columns["longitude"]
+        self.mindates = columns["mindate"]
+        self.maxdates = columns["maxdate"]
+        for column in (self.ids, self.latitudes, self.longitudes, self.mindates, self.maxdates):
+            column.flags.writeable = False
+
+
+# Momentaufnahme des Stationskatalogs
+class CatalogSnapshot:
+    """
+    Immutable view of the station catalog at one point in time.
+
+    All arrays are read-only, so a snapshot can be shared by concurrent
+    requests without locking.
+
+    Attributes:
+        records (numpy.ndarray): Station records with dtype STATION_DTYPE.
+        columns (StationColumns): Columns of the fields used by queries.
+        grid (StationGrid): Spatial index over the stations.
+        last_update (str): Date of the last station list update ("%Y-%m-%d") or None.
+        mtime (int): Modification time of the source file in nanoseconds, or None.
+        generation (int): Number of times the catalog has been (re)loaded.
+    """
+    __slots__ = ("records", "columns", "grid", "last_update", "mtime", "generation")
+
+    def __init__(self, records, last_update, mtime, generation, columns=None):
+        self.records = records
+        self.columns = StationColumns(records, columns)
+        self.grid = StationGrid(self.columns.latitudes, self.columns.longitudes)
+        self.last_update = last_update
+        self.mtime = mtime
+        self.generation = generation
+
+    def __len__(self):
+        return len(self.records)
+
+    def station(self, index, distance=None):
+        """
+        Returns a station of the snapshot as an API dictionary.
+
+        Args:
+            index (int): Index of the station in the catalog.
+            distance (float): Distance to the central point in kilometers.
+
+        Returns:
+            dict: Station dictionary including the distance.
+        """
+        return record_to_dict(self.records[index], distance)
+
+
+# Prozessweiter Stationskatalog
+class StationCatalog:
+    """
+    Process-wide station catalog that is loaded once and shared by all requests.
+
+    The catalog memory-maps the binary station file and checks its modification
+    time on access, reloading it when the file has been replaced. The new
+    snapshot is built off to the side and swapped in with a single assignment,
+    so readers never observe a partially loaded catalog. An existing JSON
+    station file is migrated to the binary format once, on first load. If
+    the file is missing or invalid, snapshot() keeps the previous snapshot
+    and waits with exponential backoff, up to retry_seconds, before it
+    tries again.
+    """
+
+    def __init__(self, path=CATALOG_FILE, json_path=JSON_FILE, retry_seconds=CATALOG_RETRY_SECONDS):
+        """
+        Args:
+            path (str): Path to the binary catalog file.
+            json_path (str): Path to the legacy JSON station file.
+            retry_seconds (float): Maximum wait before loading a missing or invalid catalog again.
+        """
+        self.path = path
+        self.json_path = json_path
+        self.retry_seconds = retry_seconds
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._snapshot = CatalogSnapshot(to_records([]), None, None, 0)
+
+    def snapshot(self):
+        """
+        Returns the current catalog snapshot, reloading it if the station file changed.
+
+        Returns:
+            CatalogSnapshot: Current snapshot of the catalog.
+        """
+        snapshot = self._snapshot
+        if time.monotonic() < self._retry_at:
+            return snapshot  # Letzter Ladeversuch fehlgeschlagen
+        if snapshot.mtime is None or self._file_mtime() != snapshot.mtime:
+            return self.reload()
+        return snapshot
+
+    def reload(self):
+        """
+        Loads the station file and atomically replaces the current snapshot.
+        If the file is missing or cannot be read, the previous snapshot is
+        kept and snapshot() does not try again until the backoff has passed.
+
+        Returns:
+            CatalogSnapshot: The snapshot that is in effect after the reload.
+        """
+        with self._lock:
+            mtime = self._file_mtime()
+            if mtime is None and self._migrate():
+                mtime = self._file_mtime()
+
+            current = self._snapshot
+            if mtime is not None and mtime == current.mtime:
+                return current  # Ein anderer Thread hat bereits neu geladen
+
+            catalog = read_catalog(self.path)
+            if catalog is None:
+                self._retry_at = time.monotonic() + min(2 ** self._failures, self.retry_seconds)
+                self._failures += 1
+                return current
+            self._failures = 0
+            self._retry_at = 0.0
+
+            records, last_update, columns = catalog
+            self._snapshot = CatalogSnapshot(records, last_update, mtime, current.generation + 1, columns)
+            return self._snapshot
+
+    def _migrate(self):
+        """
+        Converts the legacy JSON station file into the binary catalog format.
+
+        Returns:
+            bool: True if a binary catalog was written.
+        """
+        data = read_data(self.json_path)
+        if "stations" not in data:
+            return False
+        write_catalog(to_records(data["stations"]), data.get("last_update"), self.path)
+        return True
+
+    @property
+    def last_update(self):
+        """str: Date of the last station list update, or None."""
+        return self.snapshot().last_update
+
+    @property
+    def generation(self):
+        """int: Generation counter of the current snapshot."""
+        return self.snapshot().generation
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+
+station_catalog = StationCatalog()
@@ -1,5 +1,20 @@
-from flask import render_template, jsonify
-from business import get_stations_within_radius, get_station_data, update_stations
+import json
+import os
+import threading
+import time
+from flask import render_template, jsonify, make_response, request, Response, stream_with_context, g
+from business import (
+    get_stations_within_radius, get_station_data, get_stations_data, iter_stations_data, update_stations, MAX_BATCH_STATIONS
+)
+from catalog import station_catalog
+from response_cache import response_cache
+from prewarm import station_popularity, prewarmer
+from metrics import request_metrics, slow_request_profiler, start_request, stage, server_timing, SERVER_TIMING
+from external import http_client
+from regional import get_region_data_within_radius, get_region_data_in_box, REGION_COLUMNS, REGION_CELL_SIZE
+from response_format import FORMATS, AVERAGE_COLUMNS, MIN_COMPRESS_BYTES, negotiate_format, negotiate_encoding, serialize, encode, to_columnar, compress
+
+CATALOG_CHECK_SECONDS = int(os.environ.get("CATALOG_CHECK_SECONDS", 3600))  # Abstand der Prüfungen auf eine fällige Aktualisierung
 
 def init_routes(app):
     """
@@ -9,6 +24,26 @@ def init_routes(app):
         app (Flask): The Flask application instance.
     """
 
+    @app.before_request
+    def start_timing():
+        g.request_start = time.perf_counter()
+        g.request_timings = start_request()
+        g.profile = slow_request_profiler.start()
+
+    @app.after_request
+    def record_timing(response):
+        # Dauer bis zur fertigen Antwort; gestreamte Antworten ohne Übertragungszeit
+        seconds = time.perf_counter() - g.request_start
+        request_metrics.observe_request(request.url_rule.rule if request.url_rule else "unmatched", response.status_code, seconds)
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = server_timing(g.request_timings, seconds)
+        return response
+
+    @app.teardown_request
+    def finish_profile(error):
+        if "profile" in g:
+            slow_request_profiler.finish(g.pop("profile"), time.perf_counter() - g.request_start, request.path)
+
     @app.route("/")
     def index():
         """
@@ -36,8 +71,10 @@ def init_routes(app):
             Response: JSON response containing station data or an error message.
         """
         try:
-            result = get_stations_within_radius(latitude, longitude, radius, limit, start_year, end_year)
-            return result
+            return cached_json(
+                ("stations-within-radius", latitude, longitude, radius, limit, start_year, end_year),
+                lambda: get_stations_within_radius(latitude, longitude, radius, limit, start_year, end_year),
+            )
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -55,19 +92,298 @@ def init_routes(app):
             Response: JSON response containing station data or an error message.
         """
         try:
-            result = get_station_data(station_id, start_year, end_year)
-            return result
+            response = cached_json(
+                ("station-data", station_id, start_year, end_year),
+                lambda: get_station_data(station_id, start_year, end_year),
+                AVERAGE_COLUMNS,
+            )
+            if response.status_code in (200, 304):
+                station_popularity.record(station_id)  # Nur gefundene Stationen zählen
+            return response
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/region-data/radius/<float(signed=True):latitude>/<float(signed=True):longitude>/<int:radius>/<int:start_year>/<int:end_year>", methods=["GET"])
+    def region_data_within_radius(latitude, longitude, radius, start_year, end_year):
+        """
+        Retrieves area-weighted regional averages of all stations within a radius.
+
+        The grid cell size in degrees can be set with "?cell_size=".
+
+        Args:
+            latitude (float): Latitude of the central point.
+            longitude (float): Longitude of the central point.
+            radius (int): Radius in kilometers.
+            start_year (int): First year of the series.
+            end_year (int): Last year of the series.
+
+        Returns:
+            Response: JSON response containing the regional averages per year or an error message.
+        """
+        return region_response(
+            ("region-data-radius", latitude, longitude, radius, start_year, end_year),
+            lambda cell_size: get_region_data_within_radius(latitude, longitude, radius, start_year, end_year, cell_size),
+        )
+
+    @app.route("/region-data/box/<float(signed=True):south>/<float(signed=True):west>/<float(signed=True):north>/<float(signed=True):east>/<int:start_year>/<int:end_year>", methods=["GET"])
+    def region_data_in_box(south, west, north, east, start_year, end_year):
+        """
+        Retrieves area-weighted regional averages of all stations in a latitude/longitude box.
+
+        The grid cell size in degrees can be set with "?cell_size=".
+
+        Args:
+            south (float): Southern latitude of the box.
+            west (float): Western longitude of the box.
+            north (float): Northern latitude of the box.
+            east (float): Eastern longitude of the box.
+            start_year (int): First year of the series.
+            end_year (int): Last year of the series.
+
+        Returns:
+            Response: JSON response containing the regional averages per year or an error message.
+        """
+        return region_response(
+            ("region-data-box", south, west, north, east, start_year, end_year),
+            lambda cell_size: get_region_data_in_box(south, west, north, east, start_year, end_year, cell_size),
+        )
+
+    @app.route("/station-data/batch", methods=["POST"])
+    def station_data_batch():
+        """
+        Retrieves data for several weather stations in one request.
+
+        The JSON body contains "start_year" and "end_year" and either a list of
+        "station_ids" or a radius query ("latitude", "longitude", "radius",
+        "limit"). With "?format=ndjson" or "Accept: application/x-ndjson" one
+        JSON line per station is streamed as soon as the station is done.
+        The columnar formats of the single station route are available as
+        well; they convert the "data" of every entry into columns.
+
+        Returns:
+            Response: JSON list of {"id", "data"} / {"id", "error"} entries, or an NDJSON stream of them.
+        """
+        try:
+            params = request.get_json(silent=True) or {}
+            start_year, end_year = int(params["start_year"]), int(params["end_year"])
+            if "station_ids" in params:
+                if not isinstance(params["station_ids"], list):
+                    raise ValueError("station_ids must be a list")
+                station_ids = [str(station_id) for station_id in params["station_ids"]]
+            else:
+                stations, _ = get_stations_within_radius(
+                    float(params["latitude"]), float(params["longitude"]), float(params["radius"]),
+                    int(params["limit"]), start_year, end_year
+                )
+                station_ids = [station["id"] for station in stations]
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid batch request: {e}"}), 400
+        if len(station_ids) > MAX_BATCH_STATIONS:
+            return jsonify({"error": f"At most {MAX_BATCH_STATIONS} stations per batch request"}), 400
+
+        try:
+            if request.args.get("format") == "ndjson" or request.accept_mimetypes.best == "application/x-ndjson":
+                lines = (json.dumps(record_found(entry)) + "\n" for entry in iter_stations_data(station_ids, start_year, end_year))
+                return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+            response_format = negotiate_format(request.args.get("format"), request.headers.get("Accept"))
+            if response_format is None:
+                return jsonify({"error": f"Unsupported format: {request.args.get('format')}"}), 406
+            entries, status = get_stations_data(station_ids, start_year, end_year)
+            for entry in entries:
+                record_found(entry)
+            with stage("serialize"):
+                if response_format == "json":
+                    response = make_response((entries, status))
+                else:
+                    columns = [{**entry, "data": to_columnar(entry["data"], AVERAGE_COLUMNS)} if "data" in entry else entry for entry in entries]
+                    response = make_response(encode(columns, response_format), status)
+                    response.mimetype = FORMATS[response_format]
+            return compressed(response)
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
-def update_inventory():
+    @app.route("/cache-stats", methods=["GET"])
+    def cache_stats():
+        """
+        Returns the hit and miss counters of the response cache.
+
+        Returns:
+            Response: JSON response containing the cache counters.
+        """
+        return jsonify(response_cache.stats())
+
+    @app.route("/prewarm-status", methods=["GET"])
+    def prewarm_status():
+        """
+        Returns the progress of the current or last prewarm run.
+
+        Returns:
+            Response: JSON response containing the prewarm progress.
+        """
+        return jsonify(prewarmer.progress())
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """
+        Returns the request, stage, cache and upstream metrics in the Prometheus text format.
+
+        Returns:
+            Response: Plain text metrics.
+        """
+        cache = response_cache.stats()
+        upstream = http_client.stats()
+        extra = [
+            ("response_cache_hits_total", "counter", "Responses served from the response cache.", cache["hits"]),
+            ("response_cache_misses_total", "counter", "Responses computed because they were not cached.", cache["misses"]),
+            ("response_cache_bytes", "gauge", "Size of the cached responses in bytes.", cache["bytes"]),
+            ("upstream_requests_total", "counter", "Requests to the NOAA source.", upstream["requests"]),
+            ("upstream_failures_total", "counter", "Failed requests to the NOAA source.", upstream["failures"]),
+            ("upstream_seconds_total", "counter", "Total duration of the requests to the NOAA source.", upstream["total_seconds"]),
+        ]
+        return Response(request_metrics.render(extra), mimetype="text/plain; version=0.0.4")
+
+# Antwort aus dem Cache liefern oder berechnen
+def cached_json(key, compute, columns=None):
+    """
+    Serves a JSON response from the response cache or computes and stores it.
+
+    The response format is negotiated with the "format" query parameter or
+    the Accept header: the default JSON list of rows, columnar JSON or
+    MessagePack (see response_format). Every format is cached on its own; the
+    body is compressed with brotli or gzip if the client accepts it.
+
+    Successful responses carry an ETag and a Cache-Control max-age matching the
+    remaining lifetime of the cache entry; requests with a matching
+    If-None-Match header are answered with 304 Not Modified.
+
+    Args:
+        key (tuple): Normalized route parameters.
+        compute (callable): Function returning a (result, status code) tuple.
+        columns (list): Field names of the columnar formats; by default the keys of the first row.
+
+    Returns:
+        Response: The JSON response.
+    """
+    response_format = negotiate_format(request.args.get("format"), request.headers.get("Accept"))
+    if response_format is None:
+        return make_response(jsonify({"error": f"Unsupported format: {request.args.get('format')}"}), 406)
+    if response_format != "json":
+        key = (*key, response_format)
+
+    version = station_catalog.generation
+    entry = response_cache.get(key, version)
+    if entry is None:
+        result = compute()
+        with stage("serialize"):
+            if response_format != "json" and result[1] == 200:
+                response = make_response(serialize(result[0], response_format, columns))
+            else:
+                response = make_response(result)
+        if response.status_code != 200:
+            return response
+        entry = response_cache.put(key, version, response.get_data())
+
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding")) if len(entry.body) >= MIN_COMPRESS_BYTES else None
+    response = make_response(response_cache.encoded(key, entry, encoding) if encoding else entry.body)
+    response.mimetype = FORMATS[response_format]
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.update(("Accept", "Accept-Encoding"))
+    response.set_etag(entry.encoded_etag(encoding))
+    response.cache_control.public = True
+    response.cache_control.max_age = entry.max_age()
+    return response.make_conditional(request)
+
+# Regionale Mittel aus dem Cache liefern oder berechnen
+def region_response(key, compute):
+    """
+    Serves regional averages with the cell size of the "cell_size" query parameter.
+
+    Args:
+        key (tuple): Normalized route parameters without the cell size.
+        compute (callable): Function of the cell size returning a (result, status code) tuple.
+
+    Returns:
+        Response: The JSON response, or an error message with status 400 or 500.
+    """
+    try:
+        cell_size = float(request.args.get("cell_size", REGION_CELL_SIZE))
+        return cached_json((*key, cell_size), lambda: compute(cell_size), REGION_COLUMNS)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid region request: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Abruf einer gefundenen Station für das Vorwärmen zählen
+def record_found(entry):
+    """
+    Counts a batch entry for the popularity list if it holds station data.
+
+    Args:
+        entry (dict): {"id", "data"} or {"id", "error"} entry of a batch response.
+
+    Returns:
+        dict: The unchanged entry.
+    """
+    if "data" in entry:
+        station_popularity.record(entry["id"])
+    return entry
+
+# Antwort komprimieren, falls der Client es akzeptiert
+def compressed(response):
+    """
+    Compresses an uncached response with brotli or gzip as negotiated with the Accept-Encoding header.
+
+    Args:
+        response (Response): Response with a complete body.
+
+    Returns:
+        Response: The same response, compressed if accepted and large enough.
+    """
+    response.vary.update(("Accept", "Accept-Encoding"))
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    if encoding and response.content_length >= MIN_COMPRESS_BYTES:
+        response.set_data(compress(response.get_data(), encoding))
+        response.content_encoding = encoding
+    return response
+
+def update_inventory(refresh_days=None, force=False):
     """
     Updates station inventory.
 
+    Args:
+        refresh_days (int): Minimum age of the station list in days.
+        force (bool): Update regardless of the age of the station list.
+
     Returns:
-        Response: Result of the update operation.
+        bool: True if the station list was updated, False if it was up to date, None on errors.
     """
     try:
-        return update_stations()
+        return update_stations(refresh_days, force)
     except Exception as e:
         print(f"Unexpected error in update_inventory: {str(e)}")
+
+# Stationsliste im Hintergrund aktualisieren
+def start_inventory_updates(check_seconds=CATALOG_CHECK_SECONDS, on_update=None):
+    """
+    Starts a daemon thread that updates the station inventory whenever it is due,
+    so the server can answer requests during the update.
+
+    Args:
+        check_seconds (int): Interval between two checks in seconds.
+        on_update (callable): Function without arguments called after the station list was updated.
+
+    Returns:
+        threading.Event: Event that stops the thread when set.
+    """
+    stop = threading.Event()
+
+    def run():
+        while True:
+            if update_inventory() and on_update is not None:
+                on_update()
+            if stop.wait(check_seconds):
+                return
+
+    threading.Thread(target=run, name="inventory-update", daemon=True).start()
+    return stop
@@ -1,14 +1,27 @@
 import json
+import os
+import tempfile
+import numpy as np
 import requests
+from file_cache import StationFileCache
+from http_client import HttpClient
+from local_mirror import local_mirror
 
 JSON_FILE = "stations.json"
+CATALOG_FILE = "stations.npy"
+CATALOG_COLUMNS = ("id", "latitude", "longitude", "mindate", "maxdate")  # Hinter den Datensätzen abgelegte Spalten
+
+CACHE_DIR = os.environ.get("STATION_CACHE_DIR", "cache")
+CACHE_MAX_BYTES = int(os.environ.get("STATION_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CACHE_FULL_DOWNLOAD_SECONDS = int(os.environ.get("STATION_CACHE_FULL_DOWNLOAD_SECONDS", 7 * 86400))  # Danach wird eine ergänzte Datei wieder vollständig geladen
+STREAM_CHUNK_SIZE = 64 * 1024
 
 DATA_URL_AWS = "http://noaa-ghcn-pds.s3.amazonaws.com/csv/by_station"
 STATIONS_URL_AWS = "http://noaa-ghcn-pds.s3.amazonaws.com/ghcnd-stations.txt"
 INVENTORY_URL_AWS = "http://noaa-ghcn-pds.s3.amazonaws.com/ghcnd-inventory.txt"
 
 # Daten aus der JSON-Datei lesen
-def read_data():
+def read_data(file_path=JSON_FILE):
     """Read data from a JSON file.
 
     Args:
@@ -17,68 +30,225 @@ def read_data():
         dict: Data read from the file, or an empty dictionary if file not found or invalid.
     """
     try:
-        with open(JSON_FILE, "r") as file:
+        with open(file_path, "r") as file:
             return json.load(file)
     except (FileNotFoundError, json.JSONDecodeError):
         return {}
 
 # Daten in die JSON-Datei schreiben
-def write_data(data):
+def write_data(data, file_path=JSON_FILE):
     """Write data to a JSON file.
 
     Args:
-        file_path (str): Path to the JSON file.
         data (dict): Data to write.
+        file_path (str): Path to the JSON file.
     """
-    with open(JSON_FILE, "w") as file:
+    with open(file_path, "w") as file:
         json.dump(data, file, indent=4)
 
+# Binären Stationskatalog lesen
+def read_catalog(file_path=CATALOG_FILE):
+    """Read the binary station catalog by memory-mapping it.
+
+    The records and the contiguous query columns stored behind them stay on
+    disk and are paged in on access, so several processes reading the same
+    file share its physical pages. Catalogs written before the columns were
+    added contain only the records.
+
+    Args:
+        file_path (str): Path to the .npy catalog file.
+    Returns:
+        tuple: (read-only record array, last update date, dict of read-only columns by field or None)
+            or None if the catalog is missing or invalid.
+    """
+    try:
+        with open(catalog_meta_path(file_path), "r") as file:
+            meta = json.load(file)
+        with open(file_path, "rb") as file:
+            arrays = _map_arrays(file)
+    except (OSError, ValueError, KeyError):
+        return None
+    if not arrays or arrays[0].dtype.names is None:
+        return None
+    columns = dict(zip(CATALOG_COLUMNS, arrays[1:])) if len(arrays) == len(CATALOG_COLUMNS) + 1 else None
+    return arrays[0], meta.get("last_update"), columns
+
+# Nacheinander gespeicherte Arrays einer .npy-Datei abbilden
+def _map_arrays(file):
+    size = os.fstat(file.fileno()).st_size
+    read_header = {(1, 0): np.lib.format.read_array_header_1_0, (2, 0): np.lib.format.read_array_header_2_0}
+    arrays = []
+    while file.tell() < size:
+        shape, fortran_order, dtype = read_header[np.lib.format.read_magic(file)](file)
+        if dtype.hasobject:
+            raise ValueError("Object arrays are not supported")
+        offset = file.tell()
+        arrays.append(np.memmap(file, dtype=dtype, mode="r", shape=shape, order="F" if fortran_order else "C", offset=offset))
+        file.seek(offset + arrays[-1].nbytes)
+    return arrays
+
+# Binären Stationskatalog schreiben
+def write_catalog(records, last_update, file_path=CATALOG_FILE):
+    """Write the binary station catalog.
+
+    Both files are written to temporary files and renamed into place, so
+    readers see either the old or the new catalog. The metadata is replaced
+    first because readers detect changes through the .npy file. The .npy
+    file holds the records followed by one contiguous array per field of
+    CATALOG_COLUMNS, so queries can map the columns instead of copying them.
+
+    Args:
+        records (numpy.ndarray): Station records as a structured array.
+        last_update (str): Date of the station list update ("%Y-%m-%d").
+        file_path (str): Path to the .npy catalog file.
+    """
+    _replace_file(catalog_meta_path(file_path), lambda file: file.write(json.dumps({"last_update": last_update}).encode()))
+    def write_arrays(file):
+        np.save(file, records, allow_pickle=False)
+        for field in CATALOG_COLUMNS:
+            np.save(file, np.ascontiguousarray(records[field]), allow_pickle=False)
+
+    _replace_file(file_path, write_arrays)
+
+def catalog_meta_path(file_path=CATALOG_FILE):
+    """Return the path of the metadata file belonging to a catalog file."""
+    return os.path.splitext(file_path)[0] + ".meta.json"
+
+# Datei atomar ersetzen
+def _replace_file(file_path, write):
+    directory = os.path.dirname(os.path.abspath(file_path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            write(file)
+        os.chmod(temp_path, 0o644)  # mkstemp legt die Datei nur für den Eigentümer lesbar an
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
 
 # Alle Stationen abrufen
-def fetch_stations():
+def fetch_stations(stream=False):
     """Fetch all station data from the NOAA dataset.
 
+    Args:
+        stream (bool): Whether to defer downloading the response body.
+
     Returns:
         requests.Response: Response object containing station data or an error message.
     """
-    return fetch_url(STATIONS_URL_AWS, "stations data")
+    if local_mirror.enabled:
+        return local_mirror.stations() or ({"message": "Stations data not found in the local mirror"}, 500)
+    return fetch_url(STATIONS_URL_AWS, "stations data", stream=stream)
 
 # Inventardaten für alle Stationen abrufen
-def fetch_inventory_data():
+def fetch_inventory_data(stream=False):
     """Fetch inventory data for all stations.
 
+    Args:
+        stream (bool): Whether to defer downloading the response body.
+
     Returns:
         requests.Response: Response object containing inventory data or an error message.
     """
-    return fetch_url(INVENTORY_URL_AWS, "inventory data")
+    if local_mirror.enabled:
+        return local_mirror.inventory() or ({"message": "Inventory data not found in the local mirror"}, 500)
+    return fetch_url(INVENTORY_URL_AWS, "inventory data", stream=stream)
 
-# Inventardaten für alle Stationen abrufen
+# Daten einer Station abrufen
 def fetch_station_data(station_id):
     """Fetch weather data for a specific station.
 
+    The CSV file is streamed into the local station file cache and revalidated
+    with If-None-Match/If-Modified-Since, so an unchanged file costs a 304
+    response. A changed file is requested from shortly before the end of the
+    cached copy; if it was only extended, just the new bytes are transferred
+    and appended, otherwise it is downloaded again. Once the last full
+    download is older than CACHE_FULL_DOWNLOAD_SECONDS, the whole file is
+    requested again. If the upstream server cannot be reached or answers
+    with a server error, the cached copy is served; other errors such as
+    404 are returned. Files that are not cached are returned as a streaming
+    response. With a local mirror (see local_mirror) the station file is
+    read from the mirror instead and no request is sent.
+
     Args:
         station_id (str): The station ID to fetch data for.
 
     Returns:
-        requests.Response: Response object containing station data or an error message.
+        requests.Response or CachedResponse: Response object containing station data or an error message.
     """
+    if local_mirror.enabled:
+        return local_mirror.station_data(station_id) or ({"message": f"Station data not found in the local mirror: {station_id}"}, 404)
+
     url = f"{DATA_URL_AWS}/{station_id}.csv"
-    return fetch_url(url, "station data")
+    cached = station_file_cache.get(station_id)
+    if cached is None:
+        response = fetch_url(url, "station data", stream=True)
+    else:
+        try:
+            response = http_client.get(url, headers=station_file_cache.range_headers(cached), stream=True)
+        except requests.RequestException:
+            return cached  # Quelle nicht erreichbar
+        if response.status_code == 304 or response.status_code >= 500:
+            response.close()
+            return cached  # Unverändert oder vorübergehender Fehler der Quelle
+        if response.status_code >= 400:
+            response.close()
+            cached.close()
+            return {"message": f"Error fetching station data: {response.status_code} {response.reason}"}, 500
+        if response.status_code == 206:
+            # Nur die neuen Bytes übertragen, wenn die Datei lediglich ergänzt wurde
+            try:
+                appended = station_file_cache.append(station_id, cached, response.iter_content(STREAM_CHUNK_SIZE), response.headers)
+            except requests.RequestException as e:
+                return {"message": f"Error fetching station data: {e}"}, 500
+            finally:
+                response.close()
+                cached.close()
+            if appended is not None:
+                return appended
+            response = fetch_url(url, "station data", stream=True)
+        else:
+            cached.close()
+    if isinstance(response, tuple):
+        return response
+
+    if not station_file_cache.accepts(station_id, response.headers):
+        return response  # Nicht zwischengespeichert, Antwort wird direkt gestreamt
+
+    # Antwort blockweise in den Cache schreiben, ohne sie vollständig im Speicher zu halten
+    try:
+        stored = station_file_cache.put(station_id, response.iter_content(STREAM_CHUNK_SIZE), response.headers)
+    except requests.RequestException as e:
+        return {"message": f"Error fetching station data: {e}"}, 500
+    finally:
+        response.close()
+    if stored is None:
+        # Größer als der Cache und bereits teilweise gelesen: erneut ungespeichert abrufen
+        return fetch_url(url, "station data", stream=True)
+    return stored
 
 # URL abrufen    
-def fetch_url(url, description):
+def fetch_url(url, description, headers=None, stream=False):
     """Fetch data from a given URL.
 
     Args:
         url (str): The URL to fetch data from.
         description (str): Description of the data being fetched (for error messages).
+        headers (dict): Additional request headers.
+        stream (bool): Whether to defer downloading the response body.
 
     Returns:
         requests.Response or dict: Response object if successful, or error message dictionary with status code.
     """
     try:
-        response = requests.get(url)
+        response = http_client.get(url, headers=headers, stream=stream)
         response.raise_for_status()
         return response
     except requests.RequestException as e:
         return {"message": f"Error fetching {description}: {e}"}, 500
+
+
+station_file_cache = StationFileCache(CACHE_DIR, CACHE_MAX_BYTES, CACHE_FULL_DOWNLOAD_SECONDS)
+http_client = HttpClient()
@@ -0,0 +1,219 @@
+import asyncio
+import tempfile
+import time
+import httpx
+import external
+from file_cache import CachedResponse, iter_from_loop
+from http_client import (
+    RequestCounters, HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_RETRIES, HTTP_BACKOFF, RETRY_STATUSES
+)
+
+HTTP_MAX_CONNECTIONS = 256  # Gleichzeitige Verbindungen aller asynchronen Abrufe
+
+# Asynchrone HTTP-Verbindungen zur NOAA-Quelle
+class AsyncHttpClient(RequestCounters):
+    """
+    Asynchronous counterpart of HttpClient based on httpx.
+
+    All coroutines share one connection pool with a limit on concurrent and
+    kept-alive connections, so hundreds of slow downloads can wait on the
+    event loop without a thread each. Connection errors and 5xx responses
+    are retried with exponential backoff. The underlying httpx client is
+    created lazily in the running event loop.
+    """
+
+    def __init__(self, max_connections=HTTP_MAX_CONNECTIONS, pool_size=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF):
+        """
+        Args:
+            max_connections (int): Maximum number of concurrent connections.
+            pool_size (int): Maximum number of kept-alive connections.
+            connect_timeout (float): Timeout for establishing a connection in seconds.
+            read_timeout (float): Timeout between two received bytes in seconds.
+            retries (int): Maximum number of retries per request.
+            backoff (float): Backoff factor between retries in seconds.
+        """
+        super().__init__()
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=pool_size)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self._client = None
+
+    @property
+    def client(self):
+        """httpx.AsyncClient: Shared client, created on first use."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, headers={"Accept-Encoding": "gzip, deflate"})
+        return self._client
+
+    async def get(self, url, headers=None, stream=False):
+        """
+        Sends a GET request over the shared connection pool.
+
+        Args:
+            url (str): The URL to fetch.
+            headers (dict): Additional request headers.
+            stream (bool): Whether to defer downloading the response body.
+
+        Returns:
+            httpx.Response: The response, including error statuses. Streaming responses must be closed with aclose().
+
+        Raises:
+            httpx.HTTPError: If no response could be received after all retries.
+        """
+        start = time.perf_counter()
+        failed = True
+        try:
+            for attempt in range(self.retries + 1):
+                last_attempt = attempt == self.retries
+                try:
+                    request = self.client.build_request("GET", url, headers=headers)
+                    response = await self.client.send(request, stream=stream)
+                except httpx.TransportError:
+                    if last_attempt:
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUSES or last_attempt:
+                        failed = response.status_code >= 400
+                        return response
+                    await response.aclose()
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        finally:
+            self._record(time.perf_counter() - start, failed)
+
+    async def aclose(self):
+        """Closes all pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Alle Stationsdaten asynchron abrufen
+async def fetch_stations():
+    """Fetch all station data from the NOAA dataset.
+
+    Returns:
+        httpx.Response: Response object containing station data or an error message.
+    """
+    return await fetch_url(external.STATIONS_URL_AWS, "stations data")
+
+# Inventardaten für alle Stationen asynchron abrufen
+async def fetch_inventory_data():
+    """Fetch inventory data for all stations.
+
+    Returns:
+        httpx.Response: Response object containing inventory data or an error message.
+    """
+    return await fetch_url(external.INVENTORY_URL_AWS, "inventory data")
+
+# Daten einer Station asynchron abrufen
+async def fetch_station_data(station_id):
+    """Fetch weather data for a specific station.
+
+    Uses the same file cache, revalidation and range requests as external.fetch_station_data.
+    The body is streamed into the cache, or into a temporary file if it is
+    not cached, so it is never held in memory as a whole. With a local
+    mirror the station file is read from the mirror and no request is sent. All file access
+    runs in worker threads, so the event loop never waits for the disk.
+
+    Args:
+        station_id (str): The station ID to fetch data for.
+
+    Returns:
+        CachedResponse: Response object containing station data or an error message.
+    """
+    if external.local_mirror.enabled:
+        mirrored = await asyncio.to_thread(external.local_mirror.station_data, station_id)
+        return mirrored or ({"message": f"Station data not found in the local mirror: {station_id}"}, 404)
+
+    cache = external.station_file_cache
+    url = f"{external.DATA_URL_AWS}/{station_id}.csv"
+    cached = await asyncio.to_thread(cache.get, station_id)
+    if cached is None:
+        response = await fetch_url(url, "station data", stream=True)
+    else:
+        try:
+            response = await async_http_client.get(url, headers=cache.range_headers(cached), stream=True)
+        except httpx.HTTPError:
+            return cached  # Quelle nicht erreichbar
+        if response.status_code == 304 or response.status_code >= 500:
+            await response.aclose()
+            return cached  # Unverändert oder vorübergehender Fehler der Quelle
+        if response.status_code >= 400:
+            await response.aclose()
+            cached.close()
+            return {"message": f"Error fetching station data: {response.status_code} {response.reason_phrase}"}, 500
+        if response.status_code == 206:
+            # Nur die neuen Bytes übertragen, wenn die Datei lediglich ergänzt wurde
+            try:
+                appended = await cache.append_async(station_id, cached, response.aiter_bytes(external.STREAM_CHUNK_SIZE), response.headers)
+            except httpx.HTTPError as e:
+                return {"message": f"Error fetching station data: {e}"}, 500
+            finally:
+                await response.aclose()
+                cached.close()
+            if appended is not None:
+                return appended
+            response = await fetch_url(url, "station data", stream=True)
+        else:
+            cached.close()
+    if isinstance(response, tuple):
+        return response
+
+    try:
+        if not cache.accepts(station_id, response.headers):
+            return await _spool(response)  # Nicht zwischengespeichert
+        stored = await cache.put_async(station_id, response.aiter_bytes(external.STREAM_CHUNK_SIZE), response.headers)
+        if stored is None:
+            # Größer als der Cache und bereits teilweise gelesen: erneut ungespeichert abrufen
+            await response.aclose()
+            response = await fetch_url(url, "station data", stream=True)
+            if isinstance(response, tuple):
+                return response
+            stored = await _spool(response)
+    except httpx.HTTPError as e:
+        return {"message": f"Error fetching station data: {e}"}, 500
+    finally:
+        if not isinstance(response, tuple):
+            await response.aclose()
+    return stored
+
+async def _spool(response):
+    return await asyncio.to_thread(_spool_chunks, iter_from_loop(response.aiter_bytes(external.STREAM_CHUNK_SIZE), asyncio.get_running_loop()), response.headers)
+
+def _spool_chunks(chunks, headers):
+    file = tempfile.TemporaryFile()
+    try:
+        for chunk in chunks:
+            file.write(chunk)
+    except BaseException:
+        file.close()
+        raise
+    file.seek(0)
+    return CachedResponse(file, {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")})
+
+# URL asynchron abrufen
+async def fetch_url(url, description, headers=None, stream=False):
+    """Fetch data from a given URL.
+
+    Args:
+        url (str): The URL to fetch data from.
+        description (str): Description of the data being fetched (for error messages).
+        headers (dict): Additional request headers.
+        stream (bool): Whether to defer downloading the response body.
+
+    Returns:
+        httpx.Response or dict: Response object if successful, or error message dictionary with status code.
+    """
+    try:
+        response = await async_http_client.get(url, headers=headers, stream=stream)
+        if response.is_error:
+            await response.aclose()
+            response.raise_for_status()  # Anders als bei requests würde httpx auch 3xx-Antworten als Fehler melden
+        return response
+    except httpx.HTTPError as e:
+        return {"message": f"Error fetching {description}: {e}"}, 500
+
+
+async_http_client = AsyncHttpClient()
@@ -0,0 +1,420 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+TAIL_BYTES = 4096  # Überlappung, an der eine ergänzte Datei erkannt wird
+COPY_CHUNK_SIZE = 64 * 1024
+FULL_DOWNLOAD_SECONDS = 7 * 86400  # Höchstalter der letzten vollständigen Prüfung für Range-Abrufe
+
+# Antwort aus dem lokalen Cache
+class CachedResponse:
+    """
+    Minimal response object for data served from the local file cache.
+
+    The cached file is opened on creation, so the data stays readable even if
+    the entry is evicted before it is consumed. An already open binary file
+    (e.g. a temporary file) can be passed instead of a path.
+
+    Attributes:
+        headers (dict): ETag and Last-Modified headers of the cached response.
+        status_code (int): Always 200.
+        appended_from (int): Size of the previous version if the entry was extended by a range request, otherwise None.
+        encoding (str): Always None; readers decode the content as UTF-8.
+        verified (float): Time the whole file was last downloaded or verified by checksum, or None if unknown.
+    """
+
+    def __init__(self, path, validators=None, appended_from=None):
+        self._file = open(path, "rb") if isinstance(path, (str, os.PathLike)) else path
+        validators = validators or {}
+        self.headers = {"ETag": validators.get("etag"), "Last-Modified": validators.get("last_modified")}
+        self.status_code = 200
+        self.appended_from = appended_from
+        self.encoding = None
+        self.verified = validators.get("verified")
+
+    @property
+    def size(self):
+        """int: Size of the cached file in bytes."""
+        return os.fstat(self._file.fileno()).st_size
+
+    def tail(self, length):
+        """
+        Reads the last bytes of the cached file without consuming it.
+
+        Args:
+            length (int): Number of bytes.
+
+        Returns:
+            bytes: The last length bytes (or the whole file if it is shorter).
+        """
+        self._file.seek(max(self.size - length, 0))
+        data = self._file.read(length)
+        self._file.seek(0)
+        return data
+
+    @property
+    def validators(self):
+        """dict: Validators of the cached entry."""
+        return {"etag": self.headers["ETag"], "last_modified": self.headers["Last-Modified"]}
+
+    @property
+    def content(self):
+        """bytes: Complete cached file content."""
+        with self._file:
+            return self._file.read()
+
+    @property
+    def text(self):
+        """str: Cached file content decoded as UTF-8."""
+        return self.content.decode("utf-8")
+
+    def iter_content(self, chunk_size, offset=0):
+        """
+        Reads the cached file in chunks.
+
+        Args:
+            chunk_size (int): Size of the chunks in bytes.
+            offset (int): Position in the file to start reading from.
+
+        Yields:
+            bytes: Chunks of the file.
+        """
+        with self._file:
+            self._file.seek(offset)
+            while chunk := self._file.read(chunk_size):
+                yield chunk
+
+    def iter_lines(self):
+        """
+        Reads the cached file line by line.
+
+        Yields:
+            bytes: Lines without line terminators.
+        """
+        with self._file:
+            for line in self._file:
+                yield line.rstrip(b"\r\n")
+
+    def close(self):
+        """Closes the cached file."""
+        self._file.close()
+
+
+# Dateicache für Stationsdaten
+class StationFileCache:
+    """
+    Size-bounded disk cache for per-station CSV files with LRU eviction.
+
+    Every entry consists of the file content and a small JSON file with the
+    ETag and Last-Modified headers of the upstream response, used for
+    conditional revalidation. The modification time of an entry is refreshed
+    on every hit, so the least recently used entries are evicted first once
+    the total size exceeds the limit.
+    """
+
+    def __init__(self, directory, max_bytes, full_download_seconds=FULL_DOWNLOAD_SECONDS):
+        """
+        Args:
+            directory (str): Directory holding the cached files.
+            max_bytes (int): Maximum total size of the cached files. 0 disables the cache.
+            full_download_seconds (int): Maximum age of the last full download before an entry is downloaded in full again instead of appended to.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.full_download_seconds = full_download_seconds
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """bool: Whether the cache stores any files."""
+        return self.max_bytes > 0
+
+    def get(self, key):
+        """
+        Opens a cached entry and marks it as recently used.
+
+        Args:
+            key (str): Alphanumeric cache key, e.g. the station ID.
+
+        Returns:
+            CachedResponse: Open cached entry, or None if not cached.
+        """
+        if not self.enabled or not key.isalnum():
+            return None
+        cached = None
+        try:
+            with open(self._meta_path(key), "r") as file:
+                validators = json.load(file)
+            cached = CachedResponse(self._data_path(key), validators)
+            os.utime(self._data_path(key))
+        except (OSError, ValueError):
+            if cached is not None:
+                cached.close()
+            return None
+        return cached
+
+    def conditional_headers(self, validators):
+        """
+        Builds the request headers for revalidating a cached entry.
+
+        Args:
+            validators (dict): Validators stored with the entry.
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since headers.
+        """
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    def range_headers(self, cached):
+        """
+        Builds the request headers for revalidating a cached entry and fetching only its new bytes.
+
+        Besides the validators, a Range header requests the file from
+        TAIL_BYTES before the end of the cached copy. If the upstream file was
+        only extended, the overlapping bytes match and the response can be
+        appended with append(). Only the overlap is compared, so a correction
+        earlier in the file would go unnoticed: the Range header is therefore
+        only sent while the whole file was downloaded or verified within
+        full_download_seconds, otherwise the file is requested in full.
+
+        Args:
+            cached (CachedResponse): The cached entry.
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since and Range headers.
+        """
+        headers = self.conditional_headers(cached.validators)
+        if cached.verified is not None and time.time() - cached.verified < self.full_download_seconds:
+            headers["Range"] = f"bytes={max(cached.size - TAIL_BYTES, 0)}-"
+        return headers
+
+    def append(self, key, cached, chunks, headers):
+        """
+        Appends the content of a range response to a cached entry.
+
+        The response must start at the offset requested by range_headers and
+        its first bytes must equal the end of the cached file; otherwise the
+        upstream file was changed in place and None is returned. If the ETag
+        is the MD5 checksum of the file (as for S3 objects uploaded in one
+        part), the whole extended file must match it. None is also returned
+        if the extended file would exceed the size limit of the cache.
+
+        Args:
+            key (str): Alphanumeric cache key, e.g. the station ID.
+            cached (CachedResponse): The cached entry the range was requested for. It is closed.
+            chunks (iterable): Content of the range response as chunks of bytes.
+            headers (dict): Response headers containing Content-Range, ETag and Last-Modified.
+
+        Returns:
+            CachedResponse: The extended entry, or None if it could not be appended.
+        """
+        size = cached.size
+        overlap = self._overlap(cached, headers)
+        if overlap is None:
+            cached.close()
+            return None
+
+        chunks = iter(chunks)
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= len(overlap):
+                break
+        if head[:len(overlap)] != overlap:
+            cached.close()
+            return None  # Datei wurde nicht nur ergänzt
+
+        md5 = _etag_md5(headers.get("ETag"))
+        if not self._write(self._data_path(key), itertools.chain(cached.iter_content(COPY_CHUNK_SIZE), [head[len(overlap):]], chunks), self.max_bytes, md5):
+            return None  # Zu groß oder Prüfsumme stimmt nicht
+        return self._commit(key, headers, size, time.time() if md5 else cached.verified)
+
+    async def append_async(self, key, cached, chunks, headers):
+        """
+        Like append, but reads the range response from an asynchronous iterator.
+
+        The file is written in a worker thread that fetches the chunks from
+        the event loop, so no disk I/O blocks the loop.
+
+        Args:
+            key (str): Alphanumeric cache key, e.g. the station ID.
+            cached (CachedResponse): The cached entry the range was requested for. It is closed.
+            chunks (async iterable): Content of the range response as chunks of bytes.
+            headers (dict): Response headers containing Content-Range, ETag and Last-Modified.
+
+        Returns:
+            CachedResponse: The extended entry, or None if it could not be appended.
+        """
+        return await asyncio.to_thread(self.append, key, cached, iter_from_loop(chunks, asyncio.get_running_loop()), headers)
+
+    def accepts(self, key, headers):
+        """
+        Checks before reading a response whether put may store it.
+
+        Args:
+            key (str): Cache key, e.g. the station ID.
+            headers (dict): Response headers, possibly containing Content-Length.
+
+        Returns:
+            bool: False if the cache is disabled, the key is invalid or the announced size exceeds the limit.
+        """
+        size = headers.get("Content-Length")
+        return self.enabled and key.isalnum() and (size is None or int(size) <= self.max_bytes)
+
+    def put(self, key, chunks, headers):
+        """
+        Streams an entry to disk and evicts the least recently used entries if necessary.
+
+        A body without Content-Length is stored until it exceeds the size
+        limit; then the partial file is discarded and None is returned, so an
+        oversized download never evicts the other entries. In that case the
+        chunks have already been partly consumed.
+
+        Args:
+            key (str): Alphanumeric cache key, e.g. the station ID.
+            chunks (iterable): File content as chunks of bytes.
+            headers (dict): Response headers containing ETag and Last-Modified.
+
+        Returns:
+            CachedResponse: The stored entry, or None if it was not cached.
+        """
+        if not self.accepts(key, headers):
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        if not self._write(self._data_path(key), chunks, self.max_bytes):
+            return None  # Größer als der gesamte Cache
+        return self._commit(key, headers, None, time.time())
+
+    async def put_async(self, key, chunks, headers):
+        """
+        Like put, but reads the file content from an asynchronous iterator.
+
+        The file is written in a worker thread that fetches the chunks from
+        the event loop, so no disk I/O blocks the loop.
+
+        Args:
+            key (str): Alphanumeric cache key, e.g. the station ID.
+            chunks (async iterable): File content as chunks of bytes.
+            headers (dict): Response headers containing ETag and Last-Modified.
+
+        Returns:
+            CachedResponse: The stored entry, or None if it was not cached.
+        """
+        return await asyncio.to_thread(self.put, key, iter_from_loop(chunks, asyncio.get_running_loop()), headers)
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits its size limit.
+        """
+        with self._lock:
+            entries = []
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                return
+            for name in names:
+                if not name.endswith(".csv"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue  # Bereits von einem anderen Prozess entfernt
+                entries.append((stat.st_mtime_ns, stat.st_size, name[:-len(".csv")]))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, key in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for path in (self._data_path(key), self._meta_path(key)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+
+    def _overlap(self, cached, headers):
+        # Überlappende Bytes, falls die Antwort am angefragten Offset beginnt
+        offset = max(cached.size - TAIL_BYTES, 0)
+        match = re.match(r"bytes (\d+)-", headers.get("Content-Range") or "")
+        if match is None or int(match.group(1)) != offset:
+            return None
+        return cached.tail(cached.size - offset)
+
+    def _commit(self, key, headers, appended_from, verified):
+        validators = {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified"), "verified": verified}
+        self._write(self._meta_path(key), [json.dumps(validators).encode()])
+        cached = CachedResponse(self._data_path(key), validators, appended_from)
+        self.evict()
+        return cached
+
+    def _data_path(self, key):
+        return os.path.join(self.directory, f"{key}.csv")
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _write(self, path, chunks, max_bytes=None, md5=None):
+        # Schreibt atomar; gibt False zurück, sobald max_bytes überschritten ist oder die MD5-Prüfsumme nicht stimmt
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            size = 0
+            digest = hashlib.md5()
+            with os.fdopen(handle, "wb") as file:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        break
+                    if md5 is not None:
+                        digest.update(chunk)
+                    file.write(chunk)
+            if (max_bytes is not None and size > max_bytes) or (md5 is not None and digest.hexdigest() != md5):
+                os.unlink(temp_path)
+                return False
+            os.replace(temp_path, path)
+            return True
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+# MD5-Prüfsumme aus einem ETag, wie ihn S3 für nicht in Teilen hochgeladene Objekte liefert
+def _etag_md5(etag):
+    match = re.fullmatch(r'"?([0-9a-f]{32})"?', etag or "")
+    return match.group(1) if match else None
+
+# Asynchrones Iterable aus einem Thread lesen, Block für Block über die Ereignisschleife
+def iter_from_loop(chunks, loop):
+    """
+    Turns an asynchronous iterable into an iterator that can be consumed in a worker thread.
+
+    Every chunk is awaited on the event loop, so the thread can stop at any
+    time without leaving a producer blocked.
+
+    Args:
+        chunks (async iterable): Chunks produced on the event loop.
+        loop (asyncio.AbstractEventLoop): The running event loop; it must not be the calling thread's.
+
+    Yields:
+        bytes: The chunks in order.
+    """
+    iterator = aiter(chunks)
+
+    async def next_chunk():
+        return await anext(iterator)
+
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(next_chunk(), loop).result()
+        except StopAsyncIteration:
+            return
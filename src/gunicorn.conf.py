@@ -0,0 +1,146 @@
+# Produktionsbetrieb mit mehreren Prozessen: "gunicorn -c gunicorn.conf.py main:app"
+#
+# Der Master lädt die Anwendung und den Stationskatalog einmal vor dem Forken
+# (preload_app), die Worker teilen sich die Seiten per Copy-on-Write. Ein
+# separater Hintergrundprozess aktualisiert die Stationsliste und wärmt die
+# Stationsarchive vor; nach einer Aktualisierung startet er die Worker über
+# SIGHUP geordnet neu, nachdem der Master den neuen Katalog geladen hat.
+# Endet der Hintergrundprozess unerwartet, startet ihn der Master neu.
+import gc
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count()))  # Anzahl der Worker-Prozesse
+threads = int(os.environ.get("WEB_THREADS", 4))  # Threads pro Worker-Prozess
+worker_class = "gthread"
+preload_app = True
+timeout = int(os.environ.get("WEB_TIMEOUT", 120))  # Stationsdateien können groß sein
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))  # Zeit für laufende Anfragen beim Neustart
+accesslog = "-"
+BACKGROUND_RESTART_SECONDS = int(os.environ.get("BACKGROUND_RESTART_SECONDS", 10))  # Mindestabstand zweier Starts des Hintergrundprozesses
+
+# Vom Master geerbte Signalbehandlung, die im Hintergrundprozess zurückgesetzt wird
+MASTER_SIGNALS = [signal.SIGHUP, signal.SIGQUIT, signal.SIGINT, signal.SIGTERM, signal.SIGTTIN, signal.SIGTTOU, signal.SIGUSR1, signal.SIGUSR2, signal.SIGWINCH, signal.SIGCHLD]
+# Signale, mit denen der Hintergrundprozess absichtlich beendet wird; danach kein Neustart
+STOP_SIGNALS = [signal.SIGTERM, signal.SIGINT, signal.SIGQUIT]
+
+# Katalog im Master laden, bevor die Worker geforkt werden
+def when_ready(server):
+    from catalog import station_catalog
+
+    station_catalog.snapshot()
+    gc.freeze()  # Objekte des Masters nicht von der Speicherbereinigung der Worker anfassen lassen
+    start_background_process(server)
+    supervise_background_process(server)
+
+# Neuen Katalog im Master laden, bevor neue Worker geforkt werden
+def on_reload(server):
+    from catalog import station_catalog
+
+    station_catalog.reload()  # Auch während der Wartezeit nach einem fehlgeschlagenen Laden
+    gc.freeze()
+
+# Abrufzähler jedes Workers regelmäßig sichern, Prozesse der regionalen Mittel aufteilen
+def post_fork(server, worker):
+    from prewarm import start_popularity_saves
+    from regional import share_processes
+
+    start_popularity_saves()
+    share_processes(server.cfg.workers)
+
+# Restliche Abrufzähler beim Beenden eines Workers sichern
+def worker_exit(server, worker):
+    from prewarm import station_popularity
+
+    try:
+        station_popularity.save()
+    except OSError as e:
+        print(f"Error saving station popularity: {str(e)}")
+
+# Hintergrundprozess mit dem Master beenden
+def on_exit(server):
+    background_pid = getattr(server, "background_pid", None)
+    if background_pid:
+        try:
+            os.kill(background_pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+# Hintergrundprozess aus dem Master forken
+def start_background_process(server, delay=0):
+    """
+    Forks the process running the background jobs and stores its PID on the server.
+
+    Args:
+        server (gunicorn.arbiter.Arbiter): The gunicorn master.
+        delay (float): Seconds the new process waits before it starts the jobs.
+    """
+    master_pid = os.getpid()
+    server.background_started = time.monotonic()
+    server.background_pid = os.fork()
+    if server.background_pid == 0:
+        try:
+            time.sleep(delay)
+            run_background_jobs(master_pid)
+        except BaseException as e:
+            print(f"Error in background jobs: {str(e)}")
+        finally:
+            os._exit(1)  # Die Aufträge laufen unbegrenzt; jedes Ende ist ein Fehler
+
+# Hintergrundprozess überwachen
+def supervise_background_process(server):
+    """
+    Restarts the background process when it exits unexpectedly.
+
+    The master reaps all child processes with waitpid(-1) when it receives
+    SIGCHLD and ignores the ones that are not workers. The server's
+    reap_workers is therefore wrapped so the background process is reaped
+    first. If it was not stopped with one of STOP_SIGNALS, the exit is
+    logged and a new process is forked. Restarts are at least
+    BACKGROUND_RESTART_SECONDS apart.
+
+    Args:
+        server (gunicorn.arbiter.Arbiter): The gunicorn master.
+    """
+    reap_workers = server.reap_workers
+
+    def reap_background_and_workers(*args, **kwargs):
+        pid = 0
+        if server.background_pid:
+            try:
+                pid, status = os.waitpid(server.background_pid, os.WNOHANG)
+            except ChildProcessError:
+                server.background_pid = None
+        if pid:
+            if os.WIFSIGNALED(status) and os.WTERMSIG(status) in STOP_SIGNALS:
+                server.background_pid = None  # Absichtlich beendet, z. B. beim Herunterfahren
+            else:
+                delay = max(BACKGROUND_RESTART_SECONDS - (time.monotonic() - server.background_started), 0)
+                server.log.error("Background jobs exited with status %s, restarting in %.0f s", status, delay)
+                start_background_process(server, delay)
+        return reap_workers(*args, **kwargs)
+
+    server.reap_workers = reap_background_and_workers
+
+# Aktualisierung der Stationsliste und Vorwärmen außerhalb der Worker
+def run_background_jobs(master_pid):
+    """
+    Runs the inventory updates and the prewarming in a process of their own,
+    so they run once per server instead of once per worker.
+
+    Args:
+        master_pid (int): Process ID of the gunicorn master, reloaded with SIGHUP after an update.
+    """
+    from controller import start_inventory_updates
+    from prewarm import start_prewarm
+
+    for signal_number in MASTER_SIGNALS:
+        signal.signal(signal_number, signal.SIG_DFL)
+
+    start_inventory_updates(on_update=lambda: os.kill(master_pid, signal.SIGHUP))
+    start_prewarm()
+    threading.Event().wait()
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 16))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))  # Sekunden
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 30))  # Sekunden
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", 3))
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", 0.5))  # Basis der Wartezeit zwischen Wiederholungen
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Zähler für Anfragen an die NOAA-Quelle
+class RequestCounters:
+    """
+    Thread-safe request, failure and latency counters of an HTTP client.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """
+        Returns the request counters for monitoring.
+
+        Returns:
+            dict: Number of requests and failures, total and maximum latency in seconds.
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "failures": self.failures,
+                "total_seconds": self.total_seconds,
+                "max_seconds": self.max_seconds,
+            }
+
+    def _record(self, seconds, failed):
+        with self._lock:
+            self.requests += 1
+            self.failures += failed
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+
+# Gemeinsame HTTP-Verbindungen zur NOAA-Quelle
+class HttpClient(RequestCounters):
+    """
+    Shared HTTP session with connection pooling, timeouts and retries.
+
+    Connections are kept alive and reused across requests and threads.
+    Connection errors and 5xx responses of GET requests are retried with
+    exponential backoff. Responses are requested with gzip encoding and
+    decoded transparently by requests. Latency and failures of every request
+    are counted for monitoring.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF):
+        """
+        Args:
+            pool_size (int): Maximum number of kept-alive connections per host.
+            connect_timeout (float): Timeout for establishing a connection in seconds.
+            read_timeout (float): Timeout between two received bytes in seconds.
+            retries (int): Maximum number of retries per request.
+            backoff (float): Backoff factor between retries in seconds.
+        """
+        super().__init__()
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=retries, connect=retries, read=retries, status=retries,
+            backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD"]), raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, headers=None, stream=False):
+        """
+        Sends a GET request over the shared session.
+
+        The latency is measured until the response headers have been received
+        (for streaming requests the body is read later by the caller).
+
+        Args:
+            url (str): The URL to fetch.
+            headers (dict): Additional request headers.
+            stream (bool): Whether to defer downloading the response body.
+
+        Returns:
+            requests.Response: The response, including error statuses.
+
+        Raises:
+            requests.RequestException: If no response could be received after all retries.
+        """
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self.session.get(url, headers=headers, stream=stream, timeout=self.timeout)
+            failed = response.status_code >= 400
+            return response
+        finally:
+            self._record(time.perf_counter() - start, failed)
+
+    def close(self):
+        """Closes all pooled connections."""
+        self.session.close()
@@ -0,0 +1,112 @@
+import gzip
+import os
+from file_cache import CachedResponse
+
+GHCN_MIRROR_DIR = os.environ.get("GHCN_MIRROR_DIR", "")  # Lokale Kopie von GHCN-Daily; leer: Abruf von NOAA
+STATIONS_FILE = "ghcnd-stations.txt"
+INVENTORY_FILE = "ghcnd-inventory.txt"
+# Verzeichnisse der Stationsdateien, wie im S3-Bucket oder direkt unter der Wurzel
+STATION_DIRS = (os.path.join("csv", "by_station"), os.path.join("csv.gz", "by_station"), "by_station")
+STATION_SUFFIXES = (".csv", ".csv.gz")
+
+# Lokale Kopie des GHCN-Daily-Datensatzes
+class LocalMirror:
+    """
+    Locally mirrored GHCN-Daily tree used instead of the NOAA server.
+
+    The mirror holds ghcnd-stations.txt and ghcnd-inventory.txt at its root
+    and the by_station CSVs, plain or gzip-compressed, in one of STATION_DIRS.
+    Files are returned as CachedResponse objects whose version is derived
+    from the modification time and size of the file, so unchanged files are
+    not archived twice.
+    """
+
+    def __init__(self, directory=GHCN_MIRROR_DIR):
+        """
+        Args:
+            directory (str): Root of the mirror. An empty string disables the mirror.
+        """
+        self.directory = directory
+
+    @property
+    def enabled(self):
+        """bool: Whether a mirror directory is configured."""
+        return bool(self.directory)
+
+    def stations(self):
+        """
+        Opens the station list of the mirror.
+
+        Returns:
+            CachedResponse: The station list, or None if the file is missing.
+        """
+        return open_local_file(os.path.join(self.directory, STATIONS_FILE))
+
+    def inventory(self):
+        """
+        Opens the inventory of the mirror.
+
+        Returns:
+            CachedResponse: The inventory, or None if the file is missing.
+        """
+        return open_local_file(os.path.join(self.directory, INVENTORY_FILE))
+
+    def station_data(self, station_id):
+        """
+        Opens the CSV file of a station; compressed files are decompressed while reading.
+
+        Args:
+            station_id (str): Unique identifier of the weather station.
+
+        Returns:
+            CachedResponse: The station file, or None if the mirror has no file for the station.
+        """
+        if not station_id.isalnum():
+            return None
+        for station_dir in STATION_DIRS:
+            for suffix in STATION_SUFFIXES:
+                response = open_local_file(os.path.join(self.directory, station_dir, station_id + suffix))
+                if response is not None:
+                    return response
+        return None
+
+    def station_files(self):
+        """
+        Lists the station CSVs of the mirror. If a station has several files, the first of STATION_DIRS wins.
+
+        Returns:
+            list: (station ID, path) pairs sorted by station ID.
+        """
+        files = {}
+        for station_dir in STATION_DIRS:
+            try:
+                names = os.listdir(os.path.join(self.directory, station_dir))
+            except OSError:
+                continue
+            for name in names:
+                suffix = next((suffix for suffix in STATION_SUFFIXES if name.endswith(suffix)), None)
+                station_id = name[:-len(suffix)] if suffix else ""
+                if station_id.isalnum():
+                    files.setdefault(station_id, os.path.join(self.directory, station_dir, name))
+        return sorted(files.items())
+
+# Lokale Datei als Antwort öffnen
+def open_local_file(path):
+    """
+    Opens a local file like a cached station response.
+
+    Args:
+        path (str): Path of the file; files ending with ".gz" are decompressed while reading.
+
+    Returns:
+        CachedResponse: The opened file with an ETag from its modification time and size, or None if it is missing.
+    """
+    try:
+        stat = os.stat(path)
+        file = gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+    except OSError:
+        return None
+    return CachedResponse(file, {"etag": f'"local-{stat.st_mtime_ns:x}-{stat.st_size:x}"'})
+
+
+local_mirror = LocalMirror()
@@ -1,10 +1,12 @@
 from flask import Flask
-from controller import init_routes, update_inventory
+from controller import init_routes, start_inventory_updates
+from prewarm import start_prewarm
 
 app = Flask(__name__)
 
 init_routes(app)
 
 if __name__ == "__main__":
-    update_inventory()
+    start_inventory_updates()
+    start_prewarm()  # Läuft im Hintergrund, app.run startet sofort
     app.run(debug=False, host="0.0.0.0", port=5000)
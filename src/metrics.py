@@ -0,0 +1,290 @@
+import contextvars
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # Sekunden
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"  # Server-Timing-Header an Antworten anhängen
+PROFILE_SLOW_SECONDS = float(os.environ.get("PROFILE_SLOW_SECONDS", 0))  # Profil langsamer Anfragen speichern; 0 schaltet ab
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0.1))  # Anteil der profilierten Anfragen
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+# Zeiten der laufenden Anfrage nach Verarbeitungsschritt
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+# Histogramm im Prometheus-Format
+class Histogram:
+    """
+    Cumulative histogram of observed values with fixed bucket bounds.
+    """
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        """
+        Args:
+            buckets (tuple): Upper bounds of the buckets in ascending order.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Letzter Eintrag: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Adds a value to the histogram; not thread-safe, see RequestMetrics.
+
+        Args:
+            value (float): Observed value.
+        """
+        position = next((index for index, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[position] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        """
+        Renders the histogram as Prometheus text lines.
+
+        Args:
+            name (str): Metric name without suffix.
+            labels (str): Rendered labels without braces, e.g. 'stage="fetch"'.
+
+        Returns:
+            list: Lines of the _bucket, _sum and _count series.
+        """
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+# Laufzeitmessungen des Servers
+class RequestMetrics:
+    """
+    Process-wide timings of the request stages and whole requests.
+
+    Stages are the steps of a station data request: "fetch" (upstream
+    download or revalidation), "parse" (archiving the station file),
+    "aggregate" (monthly sums and averages) and "serialize" (JSON encoding).
+    With several server processes every process keeps its own metrics.
+    """
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        """
+        Args:
+            buckets (tuple): Upper bounds of the histogram buckets in seconds.
+        """
+        self.buckets = buckets
+        self._stages = {}
+        self._requests = {}
+        self._responses = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def observe_stage(self, stage, seconds):
+        """
+        Records the duration of a stage.
+
+        Args:
+            stage (str): Name of the stage.
+            seconds (float): Duration in seconds.
+        """
+        with self._lock:
+            self._stages.setdefault(stage, Histogram(self.buckets)).observe(seconds)
+
+    def observe_request(self, route, status, seconds):
+        """
+        Records a finished request.
+
+        Args:
+            route (str): Route pattern, e.g. "/station-data/<string:station_id>/<int:start_year>/<int:end_year>".
+            status (int): HTTP status code.
+            seconds (float): Duration in seconds.
+        """
+        with self._lock:
+            self._requests.setdefault(route, Histogram(self.buckets)).observe(seconds)
+            self._responses[(route, status)] = self._responses.get((route, status), 0) + 1
+
+    def add_bytes(self, count):
+        """
+        Records bytes of new or changed station data.
+
+        Args:
+            count (int): Number of bytes.
+        """
+        with self._lock:
+            self._bytes += count
+
+    def render(self, extra=()):
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Args:
+            extra (iterable): Additional (name, type, help, value) counters or gauges.
+
+        Returns:
+            str: Metrics text.
+        """
+        with self._lock:
+            lines = [
+                "# HELP station_stage_seconds Duration of the processing stages of station requests.",
+                "# TYPE station_stage_seconds histogram",
+            ]
+            for stage, histogram in sorted(self._stages.items()):
+                lines += histogram.samples("station_stage_seconds", f'stage="{stage}"')
+            lines += ["# HELP http_request_seconds Duration of HTTP requests.", "# TYPE http_request_seconds histogram"]
+            for route, histogram in sorted(self._requests.items()):
+                lines += histogram.samples("http_request_seconds", f'route="{_escape(route)}"')
+            lines += ["# HELP http_responses_total HTTP responses by route and status.", "# TYPE http_responses_total counter"]
+            for (route, status), count in sorted(self._responses.items()):
+                lines.append(f'http_responses_total{{route="{_escape(route)}",status="{status}"}} {count}')
+            lines += [
+                "# HELP station_bytes_received_total Bytes of new or changed station data received and archived.",
+                "# TYPE station_bytes_received_total counter",
+                f"station_bytes_received_total {self._bytes}",
+            ]
+        for name, kind, description, value in extra:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+# Stichprobenartiges Profilieren langsamer Anfragen
+class SlowRequestProfiler:
+    """
+    Profiles a sample of requests with cProfile and keeps the profiles of
+    requests slower than a threshold.
+
+    Profiles are written as pstats files ("<time>-<name>.prof"), which can be
+    inspected with pstats or turned into a flame graph, e.g. with snakeviz or
+    flameprof. Only one request is profiled at a time.
+    """
+
+    def __init__(self, slow_seconds=PROFILE_SLOW_SECONDS, sample_rate=PROFILE_SAMPLE_RATE, directory=PROFILE_DIR):
+        """
+        Args:
+            slow_seconds (float): Minimum duration of a kept profile; 0 disables profiling.
+            sample_rate (float): Fraction of requests that are profiled.
+            directory (str): Directory the profiles are written to.
+        """
+        self.slow_seconds = slow_seconds
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts profiling the current request if it is sampled.
+
+        Returns:
+            cProfile.Profile: Running profiler, or None if the request is not profiled.
+        """
+        if self.slow_seconds <= 0 or random.random() >= self.sample_rate or not self._lock.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            self._lock.release()  # Anderer Profiler aktiv
+            return None
+        return profile
+
+    def finish(self, profile, seconds, name):
+        """
+        Stops a profiler and writes its profile if the request was slow.
+
+        Args:
+            profile (cProfile.Profile): Profiler returned by start, or None.
+            seconds (float): Duration of the request.
+            name (str): Name of the request, used in the file name.
+
+        Returns:
+            str: Path of the written profile, or None.
+        """
+        if profile is None:
+            return None
+        profile.disable()
+        self._lock.release()
+        if seconds < self.slow_seconds:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(seconds * 1000)}ms-{_file_name(name)}.prof")
+        profile.dump_stats(path)
+        return path
+
+# Zeitmessung einer Anfrage beginnen
+def start_request():
+    """
+    Starts collecting the stage timings of the current request.
+
+    Returns:
+        dict: Timings of the request, filled by stage() and add_bytes().
+    """
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+# Verarbeitungsschritt messen
+@contextmanager
+def stage(name):
+    """
+    Measures a processing stage, records it in the metrics and in the
+    timings of the current request.
+
+    Args:
+        name (str): Name of the stage, e.g. "fetch".
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        request_metrics.observe_stage(name, seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + seconds
+
+def add_bytes(count):
+    """
+    Records bytes of new or changed station data in the metrics and the current request.
+
+    Args:
+        count (int): Number of bytes.
+    """
+    request_metrics.add_bytes(count)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings["bytes"] = timings.get("bytes", 0) + count
+
+def server_timing(timings, total_seconds):
+    """
+    Formats request timings as a Server-Timing header value.
+
+    Args:
+        timings (dict): Stage durations in seconds and the "bytes" count, as collected by start_request.
+        total_seconds (float): Duration of the whole request.
+
+    Returns:
+        str: Header value, e.g. 'fetch;dur=12.5, parse;dur=3.1, total;dur=16.0'.
+    """
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items() if name != "bytes"]
+    if "bytes" in timings:
+        entries.append(f'bytes;desc="{timings["bytes"]}"')
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+def _file_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")[:80] or "request"
+
+
+request_metrics = RequestMetrics()
+slow_request_profiler = SlowRequestProfiler()
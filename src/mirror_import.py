@@ -0,0 +1,226 @@
+import argparse
+import datetime
+import multiprocessing
+import os
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from external import write_catalog, STREAM_CHUNK_SIZE
+from catalog import station_catalog
+from station_archive import StationArchive, station_archive
+from station_columns import iter_line_blocks, parse_dly_block
+from station_list import parse_stations, join_inventory
+from local_mirror import LocalMirror, open_local_file, GHCN_MIRROR_DIR
+
+IMPORT_PROCESSES = int(os.environ.get("IMPORT_PROCESSES", os.cpu_count() or 1))  # Prozesse des Imports; 0 importiert im eigenen Prozess
+IMPORT_CHUNK_SIZE = 16  # Stationen pro Auftrag an einen Prozess
+IMPORT_PROGRESS_STEP = 1000  # Fortschrittsmeldung alle n Stationen
+TARBALL_NAMES = ("ghcnd_all.tar.gz", "ghcnd_all.tar")
+
+# Stationskatalog aus der lokalen Kopie schreiben
+def import_catalog(mirror, catalog_path):
+    """
+    Builds the station catalog from the station list and inventory of the mirror.
+
+    Args:
+        mirror (LocalMirror): Local GHCN-Daily mirror.
+        catalog_path (str): Path of the binary catalog file.
+
+    Returns:
+        int: Number of stations in the catalog.
+
+    Raises:
+        FileNotFoundError: If the station list or the inventory is missing.
+    """
+    stations_file, inventory_file = mirror.stations(), mirror.inventory()
+    if stations_file is None or inventory_file is None:
+        for response in (stations_file, inventory_file):
+            if response is not None:
+                response.close()
+        raise FileNotFoundError(f"ghcnd-stations.txt and ghcnd-inventory.txt are required in {mirror.directory}")
+    try:
+        stations = parse_stations(stations_file.iter_content(STREAM_CHUNK_SIZE))
+        records = join_inventory(stations, inventory_file.iter_content(STREAM_CHUNK_SIZE))
+    finally:
+        stations_file.close()
+        inventory_file.close()
+    write_catalog(records, datetime.datetime.now().strftime("%Y-%m-%d"), catalog_path)
+    return len(records)
+
+# Stationsdateien archivieren; läuft in einem Prozess des Pools
+def import_station_files(directory, files):
+    """
+    Archives by_station CSV files. Files whose version is already archived are skipped.
+
+    Args:
+        directory (str): Directory of the station archive.
+        files (list): (station ID, path) pairs.
+
+    Returns:
+        tuple: Numbers of (imported, skipped, failed) stations.
+    """
+    archive = StationArchive(directory)
+    imported = skipped = failed = 0
+    for station_id, path in files:
+        response = open_local_file(path)
+        if response is None:
+            failed += 1
+            continue
+        try:
+            meta = archive.meta(station_id)
+            if meta is not None and meta["version"] == response.headers["ETag"]:
+                skipped += 1
+            elif archive.update(station_id, response) is not None:
+                imported += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"Error importing {path}: {e}")
+            failed += 1
+        finally:
+            response.close()
+    return imported, skipped, failed
+
+# .dly-Dateien archivieren; läuft in einem Prozess des Pools
+def import_dly_files(directory, files):
+    """
+    Archives the contents of .dly files read from the ghcnd_all tarball.
+
+    Args:
+        directory (str): Directory of the station archive.
+        files (list): (station ID, content, version) tuples.
+
+    Returns:
+        tuple: Numbers of (imported, skipped, failed) stations.
+    """
+    archive = StationArchive(directory)
+    imported = failed = 0
+    for station_id, content, version in files:
+        try:
+            columns = [parse_dly_block(block) for block in iter_line_blocks([content])]
+            if archive.replace(station_id, columns, version) is not None:
+                imported += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"Error importing {station_id}.dly: {e}")
+            failed += 1
+    return imported, 0, failed
+
+# .dly-Dateien des Archivs ghcnd_all lesen
+def iter_tarball(path, archive):
+    """
+    Reads the .dly members of a ghcnd_all tarball in archive order.
+
+    Members whose version (modification time and size of the member) is
+    already archived are not read, so an interrupted import resumes where it
+    stopped; a compressed tarball is still decompressed up to that point.
+
+    Args:
+        path (str): Path of ghcnd_all.tar.gz or ghcnd_all.tar.
+        archive (StationArchive): Archive used to detect imported stations.
+
+    Yields:
+        tuple: (station ID, content or None if already archived, version)
+    """
+    with tarfile.open(path, "r:*") as tar:
+        for member in tar:
+            name = os.path.basename(member.name)
+            station_id = name[:-len(".dly")]
+            if not member.isfile() or not name.endswith(".dly") or not station_id.isalnum():
+                continue
+            version = f'"dly-{member.mtime:x}-{member.size:x}"'
+            meta = archive.meta(station_id)
+            if meta is not None and meta["version"] == version:
+                yield station_id, None, version
+                continue
+            with tar.extractfile(member) as file:
+                yield station_id, file.read(), version
+
+# Gesamte lokale Kopie importieren
+def import_mirror(mirror, archive=station_archive, catalog_path=None, processes=IMPORT_PROCESSES, tarball=None):
+    """
+    Imports a local GHCN-Daily mirror: the station catalog and the archives of all stations.
+
+    Station files are archived in chunks on a process pool; at most two
+    chunks per process are in flight, so large tarballs are read with bounded
+    memory. Every station is archived atomically and stations that are
+    already archived in the same version are skipped, so an interrupted
+    import can simply be started again.
+
+    Args:
+        mirror (LocalMirror): Local GHCN-Daily mirror.
+        archive (StationArchive): Archive the stations are written to.
+        catalog_path (str): Path of the binary catalog file (default: the path of the station catalog).
+        processes (int): Number of processes; 0 imports in the calling process.
+        tarball (str): Path of a ghcnd_all tarball; by default one of TARBALL_NAMES in the mirror is used if present.
+
+    Returns:
+        dict: Number of catalog "stations" and the numbers of "imported", "skipped" and "failed" station files.
+    """
+    result = {"stations": import_catalog(mirror, catalog_path or station_catalog.path), "imported": 0, "skipped": 0, "failed": 0}
+    if tarball is None:
+        tarball = next((path for path in (os.path.join(mirror.directory, name) for name in TARBALL_NAMES) if os.path.exists(path)), None)
+
+    start = time.monotonic()
+    pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) if processes > 0 else None
+    pending = deque()
+
+    def collect(counts):
+        done = result["imported"] + result["skipped"] + result["failed"]
+        for key, count in zip(("imported", "skipped", "failed"), counts):
+            result[key] += count
+        if (done + sum(counts)) // IMPORT_PROGRESS_STEP > done // IMPORT_PROGRESS_STEP:
+            print(f"Imported {result['imported']}, skipped {result['skipped']}, failed {result['failed']} stations in {time.monotonic() - start:.0f} s")
+
+    def submit(function, chunk):
+        if pool is None:
+            collect(function(archive.directory, chunk))
+            return
+        pending.append(pool.submit(function, archive.directory, chunk))
+        while len(pending) > 2 * processes:
+            collect(pending.popleft().result())
+
+    try:
+        files = mirror.station_files()
+        for offset in range(0, len(files), IMPORT_CHUNK_SIZE):
+            submit(import_station_files, files[offset:offset + IMPORT_CHUNK_SIZE])
+
+        # Stationen mit CSV-Datei nicht zusätzlich aus dem Tarball übernehmen
+        csv_stations = {station_id for station_id, _ in files}
+        if tarball is not None:
+            chunk = []
+            for station_id, content, version in iter_tarball(tarball, archive):
+                if station_id in csv_stations:
+                    continue
+                if content is None:
+                    collect((0, 1, 0))
+                    continue
+                chunk.append((station_id, content, version))
+                if len(chunk) == IMPORT_CHUNK_SIZE:
+                    submit(import_dly_files, chunk)
+                    chunk = []
+            if chunk:
+                submit(import_dly_files, chunk)
+
+        while pending:
+            collect(pending.popleft().result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return result
+
+
+# Lokale Kopie als eigenständiger Befehl importieren, z. B. vor dem Betrieb ohne Netzwerk
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Imports a local GHCN-Daily mirror into the station catalog and the station archive.")
+    parser.add_argument("mirror", nargs="?", default=GHCN_MIRROR_DIR, help="root of the mirror with ghcnd-stations.txt, ghcnd-inventory.txt and csv/by_station (default GHCN_MIRROR_DIR)")
+    parser.add_argument("--tarball", help="path of a ghcnd_all tarball with .dly files")
+    parser.add_argument("--processes", type=int, default=IMPORT_PROCESSES, help="number of import processes")
+    args = parser.parse_args()
+    if not args.mirror:
+        parser.error("no mirror directory given and GHCN_MIRROR_DIR is not set")
+
+    result = import_mirror(LocalMirror(args.mirror), processes=args.processes, tarball=args.tarball)
+    print(f"Catalog with {result['stations']} stations written; imported {result['imported']}, skipped {result['skipped']}, failed {result['failed']} station files.")
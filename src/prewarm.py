@@ -0,0 +1,322 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: Dateisperre entfällt, ein Serverprozess
+from business import get_stations_within_radius, update_station_archive, station_flight
+
+POPULARITY_PATH = os.environ.get("POPULARITY_PATH", "popularity.json")
+POPULARITY_SAVE_SECONDS = int(os.environ.get("POPULARITY_SAVE_SECONDS", 300))  # Abstand der Sicherungen der Abrufzähler
+POPULARITY_MAX_STATIONS = int(os.environ.get("POPULARITY_MAX_STATIONS", 10000))  # Höchstzahl gezählter Stationen
+PREWARM_TOP_STATIONS = int(os.environ.get("PREWARM_TOP_STATIONS", 100))  # Anzahl der meistabgerufenen Stationen pro Vorwärmen
+PREWARM_WORKERS = int(os.environ.get("PREWARM_WORKERS", 4))  # Parallele Abrufe beim Vorwärmen
+PREWARM_INTERVAL_SECONDS = int(os.environ.get("PREWARM_INTERVAL_SECONDS", 6 * 3600))  # Abstand zweier Vorwärmläufe
+# Interessante Regionen als "Breite,Länge,Radius;...", z. B. "48.05,8.49,100"
+PREWARM_REGIONS = os.environ.get("PREWARM_REGIONS", "")
+PREWARM_REGION_LIMIT = int(os.environ.get("PREWARM_REGION_LIMIT", 500))  # Maximale Anzahl Stationen pro Region
+PREWARM_STATUS_PATH = os.environ.get("PREWARM_STATUS_PATH", "prewarm-status.json")
+PREWARM_STATUS_STEP = 10  # Fortschritt nach jeweils so vielen Stationen veröffentlichen
+
+# Abrufhäufigkeit der Stationen
+class StationPopularity:
+    """
+    Counts the requests per station ID and persists the counts as JSON.
+
+    Requests are counted in memory and added to the file on save(), so
+    several server processes can share one popularity list. The file is
+    updated under an exclusive lock (where fcntl is available) and written
+    to a temporary file that is renamed, so a crash never leaves a
+    truncated list behind. At most max_stations stations are kept, both in
+    memory and in the file, so the list cannot grow without bound.
+    """
+
+    def __init__(self, path=POPULARITY_PATH, max_stations=POPULARITY_MAX_STATIONS):
+        """
+        Args:
+            path (str): JSON file holding the counts.
+            max_stations (int): Maximum number of stations counted.
+        """
+        self.path = path
+        self.max_stations = max_stations
+        self._pending = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, station_id):
+        """
+        Counts one successful request for a station.
+
+        New stations are ignored once max_stations stations are pending;
+        they are counted again after the next save.
+
+        Args:
+            station_id (str): Unique identifier of the weather station.
+        """
+        with self._lock:
+            if station_id in self._pending or len(self._pending) < self.max_stations:
+                self._pending[station_id] += 1
+
+    def top(self, n):
+        """
+        Returns the most requested stations of all processes, as far as they have been saved.
+
+        Args:
+            n (int): Maximum number of stations.
+
+        Returns:
+            list: Station IDs, most requested first.
+        """
+        counts = self._read()
+        with self._lock:
+            counts.update(self._pending)
+        return [station_id for station_id, _ in counts.most_common(n)]
+
+    def save(self):
+        """
+        Adds the counts recorded since the last save to the JSON file.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        try:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            with open(f"{self.path}.lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)  # Andere Serverprozesse warten
+                counts = self._read()
+                counts = Counter(dict((counts + pending).most_common(self.max_stations)))
+                handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".popularity-")
+                with os.fdopen(handle, "w") as file:
+                    json.dump(counts, file)
+                os.replace(temp_path, self.path)
+        except OSError:
+            with self._lock:
+                self._pending.update(pending)  # Beim nächsten Speichern erneut versuchen
+            raise
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as file:
+                return Counter({str(key): int(value) for key, value in json.load(file).items()})
+        except (OSError, ValueError, AttributeError):
+            return Counter()
+
+
+# Vorwärmen der Stationsarchive
+class Prewarmer:
+    """
+    Fetches and archives the most requested stations and all stations of the
+    configured regions before users ask for them.
+
+    Stations are processed on a bounded thread pool through the same
+    single-flight group as get_station_data, so a user request for a station
+    that is being warmed waits for that download instead of starting another.
+    The progress is also written to a JSON file, so server processes that do
+    not run the prewarming themselves can report it.
+    """
+
+    def __init__(self, popularity, top_stations=PREWARM_TOP_STATIONS, regions=PREWARM_REGIONS, workers=PREWARM_WORKERS, status_path=PREWARM_STATUS_PATH):
+        """
+        Args:
+            popularity (StationPopularity): Request counts of the stations.
+            top_stations (int): Number of most requested stations to warm.
+            regions (str): Regions of interest as "latitude,longitude,radius;...".
+            workers (int): Number of parallel downloads.
+            status_path (str): JSON file the progress is published to.
+        """
+        self.popularity = popularity
+        self.top_stations = top_stations
+        self.regions = parse_regions(regions)
+        self.workers = workers
+        self.status_path = status_path
+        self._run_lock = threading.Lock()
+        self._progress_lock = threading.Lock()
+        self._progress = self.progress_default()
+
+    def progress(self):
+        """
+        Returns the progress of the current or last run.
+
+        Returns:
+            dict: "running", "total", "done", "failed" and the "started"/"finished" timestamps.
+        """
+        with self._progress_lock:
+            if self._progress["started"] is not None:
+                return dict(self._progress)
+        try:
+            with open(self.status_path, "r") as file:
+                return json.load(file)  # Vorwärmen läuft in einem anderen Prozess
+        except (OSError, ValueError):
+            return self.progress_default()
+
+    def progress_default(self):
+        """
+        Returns the progress before the first run.
+
+        Returns:
+            dict: Progress without any stations.
+        """
+        return {"running": False, "total": 0, "done": 0, "failed": 0, "started": None, "finished": None}
+
+    def station_ids(self):
+        """
+        Collects the stations to warm: the most requested ones first, then the regions of interest.
+
+        Returns:
+            list: Unique station IDs.
+        """
+        station_ids = self.popularity.top(self.top_stations)
+        for latitude, longitude, radius in self.regions:
+            try:
+                # Ohne Jahresfilter: jede Station mit Temperaturdaten
+                stations, _ = get_stations_within_radius(latitude, longitude, radius, PREWARM_REGION_LIMIT, None, None)
+            except Exception as e:
+                print(f"Error finding prewarm stations around {latitude},{longitude}: {str(e)}")
+                continue
+            station_ids += [station["id"] for station in stations]
+        return list(dict.fromkeys(station_ids))
+
+    def run(self):
+        """
+        Warms the archives of all selected stations. A run is skipped while another one is in progress.
+
+        Returns:
+            dict: Progress after the run, or None if another run was in progress.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        try:
+            station_ids = self.station_ids()
+            with self._progress_lock:
+                self._progress = {"running": True, "total": len(station_ids), "done": 0, "failed": 0, "started": time.time(), "finished": None}
+                self._publish()
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prewarm") as executor:
+                futures = {
+                    executor.submit(station_flight.do, station_id, lambda station_id=station_id: update_station_archive(station_id)): station_id
+                    for station_id in station_ids
+                }
+                for future in as_completed(futures):
+                    failed = future.exception() is not None
+                    if failed:
+                        print(f"Error prewarming station {futures[future]}: {str(future.exception())}")
+                    with self._progress_lock:
+                        self._progress["done"] += 1
+                        self._progress["failed"] += failed
+                        if self._progress["done"] % PREWARM_STATUS_STEP == 0:
+                            self._publish()
+
+            with self._progress_lock:
+                self._progress["running"] = False
+                self._progress["finished"] = time.time()
+                self._publish()
+                progress = dict(self._progress)
+            print(f"Prewarmed {progress['done'] - progress['failed']} of {progress['total']} stations in {progress['finished'] - progress['started']:.1f} s")
+            return progress
+        finally:
+            self._run_lock.release()
+
+    def _publish(self):
+        # Aufruf unter _progress_lock
+        try:
+            directory = os.path.dirname(self.status_path) or "."
+            handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".prewarm-")
+            with os.fdopen(handle, "w") as file:
+                json.dump(self._progress, file)
+            os.replace(temp_path, self.status_path)
+        except OSError as e:
+            print(f"Error writing prewarm status: {str(e)}")
+
+# Regionen aus der Konfiguration lesen
+def parse_regions(regions):
+    """
+    Parses regions of interest.
+
+    Args:
+        regions (str): Regions as "latitude,longitude,radius" separated by semicolons.
+
+    Returns:
+        list: (latitude, longitude, radius in kilometers) tuples.
+
+    Raises:
+        ValueError: If a region does not consist of three numbers.
+    """
+    result = []
+    for region in regions.split(";"):
+        if region.strip():
+            latitude, longitude, radius = (float(value) for value in region.split(","))
+            result.append((latitude, longitude, radius))
+    return result
+
+# Vorwärmen im Hintergrund starten
+def start_prewarm(interval_seconds=PREWARM_INTERVAL_SECONDS, save_seconds=POPULARITY_SAVE_SECONDS):
+    """
+    Starts a daemon thread that warms the station archives right away and
+    then every interval, and saves the popularity counts in between. The
+    caller is never blocked.
+
+    Args:
+        interval_seconds (int): Interval between two runs in seconds.
+        save_seconds (int): Interval between two saves of the popularity counts in seconds.
+
+    Returns:
+        threading.Event: Event that stops the thread when set.
+    """
+    stop = threading.Event()
+
+    def run():
+        next_run = time.monotonic()
+        while True:
+            if time.monotonic() >= next_run:
+                try:
+                    prewarmer.run()
+                except Exception as e:
+                    print(f"Unexpected error in prewarm: {str(e)}")
+                next_run = time.monotonic() + interval_seconds
+            if stop.wait(max(min(save_seconds, next_run - time.monotonic()), 0)):
+                _save_popularity()
+                return
+            _save_popularity()
+
+    threading.Thread(target=run, name="prewarm", daemon=True).start()
+    return stop
+
+# Abrufzähler eines Serverprozesses regelmäßig sichern
+def start_popularity_saves(save_seconds=POPULARITY_SAVE_SECONDS):
+    """
+    Starts a daemon thread that adds the request counts of this process to
+    the popularity file in regular intervals. Used by server processes that
+    do not run the prewarming themselves.
+
+    Args:
+        save_seconds (int): Interval between two saves in seconds.
+
+    Returns:
+        threading.Event: Event that stops the thread when set.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(save_seconds):
+            _save_popularity()
+        _save_popularity()
+
+    threading.Thread(target=run, name="popularity-save", daemon=True).start()
+    return stop
+
+def _save_popularity():
+    try:
+        station_popularity.save()
+    except OSError as e:
+        print(f"Error saving station popularity: {str(e)}")
+
+
+station_popularity = StationPopularity()
+prewarmer = Prewarmer(station_popularity)
@@ -0,0 +1,363 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import numpy as np
+from business import get_stations_within_radius, update_station_archive, station_flight
+from catalog import station_catalog
+from aggregates import MonthlyAggregates
+from station_archive import StationArchive, station_archive
+from response_format import AVERAGE_COLUMNS
+
+REGION_CELL_SIZE = float(os.environ.get("REGION_CELL_SIZE", 2.5))  # Kantenlänge der Gitterzellen in Grad
+MAX_REGION_STATIONS = int(os.environ.get("MAX_REGION_STATIONS", 5000))  # Maximale Anzahl Stationen pro Region
+REGION_FETCH_WORKERS = int(os.environ.get("REGION_FETCH_WORKERS", 8))  # Parallele Abrufe der Stationsdateien
+# Höchstzahl nicht archivierter Stationen, die eine Anfrage selbst abruft; weitere werden im Hintergrund geladen
+REGION_MAX_COLD_FETCHES = int(os.environ.get("REGION_MAX_COLD_FETCHES", 50))
+REGION_RETRY_SECONDS = int(os.environ.get("REGION_RETRY_SECONDS", 3600))  # Stationen ohne Daten erst danach erneut abrufen
+REGION_PROCESSES = int(os.environ.get("REGION_PROCESSES", os.cpu_count() or 1))  # Prozesse für die Mittelung je Server; 0 rechnet im Anfrage-Thread
+REGION_CHUNK_SIZE = 32  # Stationen pro Auftrag an einen Prozess
+FIELDS = AVERAGE_COLUMNS[1:]  # Gemittelte Felder ohne "year"
+# Spalten der regionalen Reihen: Mittelwerte und Anzahl beteiligter Stationen und Zellen
+REGION_COLUMNS = AVERAGE_COLUMNS + ["stations", "cells"]
+
+region_executor = ThreadPoolExecutor(max_workers=REGION_FETCH_WORKERS, thread_name_prefix="region-fetch")
+backfill_executor = ThreadPoolExecutor(max_workers=REGION_FETCH_WORKERS, thread_name_prefix="region-backfill")
+_backfilling = set()  # Im Hintergrund angeforderte Stationen
+_fetch_failures = {}  # Station -> Zeitpunkt des letzten fehlgeschlagenen Abrufs
+_backfill_lock = threading.Lock()
+_worker_processes = REGION_PROCESSES  # Anteil dieses Prozesses an REGION_PROCESSES
+_process_pools = {}  # Anzahl Prozesse -> Pool
+_process_pool_lock = threading.Lock()
+
+# Summen der Stationsmittel je Gitterzelle
+class CellAccumulator:
+    """
+    Sums of station means per grid cell, year and field.
+
+    A cell mean is the plain mean of the yearly and seasonal means of the
+    stations in the cell, so densely covered areas do not dominate the
+    regional mean. The memory use depends on the number of cells and years,
+    not on the number of stations. Accumulators of parts of a region are
+    combined with merge.
+
+    Attributes:
+        start_year (int): First year of the series.
+        end_year (int): Last year of the series.
+        cell_size (float): Edge length of a grid cell in degrees.
+        cells (dict): (latitude cell, longitude cell) -> (sums, counts) arrays of shape (years, fields).
+        stations (numpy.ndarray): Number of stations with data per year.
+    """
+
+    def __init__(self, start_year, end_year, cell_size=REGION_CELL_SIZE):
+        self.start_year = start_year
+        self.end_year = end_year
+        self.cell_size = cell_size
+        self.cells = {}
+        self.stations = np.zeros(max(end_year - start_year + 1, 0), dtype=np.int64)
+
+    def cell(self, latitude, longitude):
+        """
+        Returns the grid cell containing a coordinate.
+
+        Args:
+            latitude (float): Latitude in degrees.
+            longitude (float): Longitude in degrees.
+
+        Returns:
+            tuple: (latitude cell, longitude cell)
+        """
+        lat_cell = min(int(math.floor((latitude + 90) / self.cell_size)), int(math.ceil(180 / self.cell_size)) - 1)
+        return lat_cell, int(math.floor((longitude + 180) / self.cell_size)) % int(math.ceil(360 / self.cell_size))
+
+    def add(self, cell, rows):
+        """
+        Adds the averages of one station to its cell.
+
+        Args:
+            cell (tuple): Grid cell of the station, see cell.
+            rows (list): Yearly averages of the station as returned by MonthlyAggregates.averages.
+        """
+        means = np.full((len(self.stations), len(FIELDS)), np.nan)
+        for row in rows:
+            offset = row["year"] - self.start_year
+            if 0 <= offset < len(means):
+                means[offset] = [np.nan if row.get(field) is None else row[field] for field in FIELDS]
+        present = ~np.isnan(means)
+        if not present.any():
+            return
+
+        sums, counts = self.cells.setdefault(cell, (np.zeros(means.shape), np.zeros(means.shape, dtype=np.int64)))
+        sums += np.where(present, means, 0)
+        counts += present
+        self.stations += present.any(axis=1)
+
+    def merge(self, other):
+        """
+        Adds the sums of another accumulator with the same years and cell size.
+
+        Args:
+            other (CellAccumulator): Accumulator of other stations.
+        """
+        for cell, (other_sums, other_counts) in other.cells.items():
+            sums, counts = self.cells.setdefault(cell, (np.zeros(other_sums.shape), np.zeros(other_counts.shape, dtype=np.int64)))
+            sums += other_sums
+            counts += other_counts
+        self.stations += other.stations
+
+    def averages(self):
+        """
+        Computes the area-weighted regional series from the cell means.
+
+        Every cell with data is weighted with its area, which is proportional
+        to the difference of the sines of its bounding latitudes times its
+        longitude span. The last row and column of the grid are narrower if
+        the cell size does not divide 180 or 360 degrees. Cells without a
+        value for a year and field are left out of that mean.
+
+        Returns:
+            list: Dictionaries with "year", the fields of AVERAGE_COLUMNS, "stations" and "cells" per year.
+        """
+        years = len(self.stations)
+        totals = np.zeros((years, len(FIELDS)))
+        weights = np.zeros((years, len(FIELDS)))
+        cells = np.zeros(years, dtype=np.int64)
+        for (lat_cell, lon_cell), (sums, counts) in self.cells.items():
+            south = -90 + lat_cell * self.cell_size
+            north = min(south + self.cell_size, 90)
+            west = -180 + lon_cell * self.cell_size
+            east = min(west + self.cell_size, 180)
+            area = (math.sin(math.radians(north)) - math.sin(math.radians(south))) * math.radians(east - west)
+            present = counts > 0
+            totals += np.where(present, sums / np.maximum(counts, 1) * area, 0)
+            weights += present * area
+            cells += present.any(axis=1)
+
+        means = np.divide(totals, weights, out=np.full(totals.shape, np.nan), where=weights > 0)
+        result = []
+        for offset in np.flatnonzero(self.stations).tolist():
+            row = {"year": self.start_year + offset}
+            for position, field in enumerate(FIELDS):
+                value = means[offset, position]
+                row[field] = None if np.isnan(value) else round(float(value), 1)
+            row["stations"] = int(self.stations[offset])
+            row["cells"] = int(cells[offset])
+            result.append(row)
+        return result
+
+# Stationen eines Auftrags mitteln; läuft in einem Prozess des Pools
+def aggregate_stations(directory, stations, start_year, end_year, cell_size):
+    """
+    Averages archived stations and adds them to a new accumulator.
+
+    Only the archive is read, so the function can run in another process.
+
+    Args:
+        directory (str): Directory of the station archive.
+        stations (list): (station ID, grid cell) pairs.
+        start_year (int): First year of the series.
+        end_year (int): Last year of the series.
+        cell_size (float): Edge length of a grid cell in degrees.
+
+    Returns:
+        CellAccumulator: Sums of the stations' means per cell.
+    """
+    archive = StationArchive(directory)
+    accumulator = CellAccumulator(start_year, end_year, cell_size)
+    for station_id, cell in stations:
+        aggregates = MonthlyAggregates.from_columns(archive.read(station_id, start_year - 1, end_year))
+        accumulator.add(cell, aggregates.averages(start_year, end_year))
+    return accumulator
+
+# Regionale Mittel im Umkreis berechnen
+def get_region_data_within_radius(lat, lon, radius, start_year, end_year, cell_size=REGION_CELL_SIZE):
+    """
+    Computes regional yearly and seasonal averages of all stations within a radius.
+
+    Args:
+        lat (float): Latitude of the central point.
+        lon (float): Longitude of the central point.
+        radius (float): Maximum distance in kilometers.
+        start_year (int): First year of the series.
+        end_year (int): Last year of the series.
+        cell_size (float): Edge length of a grid cell in degrees.
+
+    Returns:
+        tuple: (List of regional averages per year, HTTP status code 200), or a message with status 202, see get_region_data.
+    """
+    stations, _ = get_stations_within_radius(lat, lon, radius, MAX_REGION_STATIONS + 1, start_year, end_year)
+    return get_region_data(stations, start_year, end_year, cell_size)
+
+# Regionale Mittel in einem Rechteck berechnen
+def get_region_data_in_box(south, west, north, east, start_year, end_year, cell_size=REGION_CELL_SIZE):
+    """
+    Computes regional yearly and seasonal averages of all stations in a latitude/longitude box.
+
+    Stations are selected like in get_stations_within_radius: their data has to
+    cover start_year .. end_year. A box with west > east crosses the 180th meridian.
+
+    Args:
+        south (float): Southern latitude of the box.
+        west (float): Western longitude of the box.
+        north (float): Northern latitude of the box.
+        east (float): Eastern longitude of the box.
+        start_year (int): First year of the series.
+        end_year (int): Last year of the series.
+        cell_size (float): Edge length of a grid cell in degrees.
+
+    Returns:
+        tuple: (List of regional averages per year, HTTP status code 200), or a message with status 202, see get_region_data.
+    """
+    snapshot = station_catalog.snapshot()
+    columns = snapshot.columns
+    latitudes, longitudes = columns.latitudes, columns.longitudes
+    if west <= east:
+        in_longitude = (longitudes >= west) & (longitudes <= east)
+    else:
+        in_longitude = (longitudes >= west) | (longitudes <= east)
+    mask = (
+        (latitudes >= south) & (latitudes <= north) & in_longitude
+        & (columns.mindates > 0) & (columns.maxdates > 0) & (columns.mindates <= start_year) & (columns.maxdates >= end_year)
+    )
+    indices = np.flatnonzero(mask)[:MAX_REGION_STATIONS + 1]
+    return get_region_data([snapshot.station(int(index)) for index in indices], start_year, end_year, cell_size)
+
+# Regionale Mittel einer Stationsliste berechnen
+def get_region_data(stations, start_year, end_year, cell_size=REGION_CELL_SIZE, processes=None):
+    """
+    Computes area-weighted regional yearly and seasonal averages of several stations.
+
+    Archived stations are averaged as they are and brought up to date in
+    the background afterwards. Stations that are not archived yet are
+    fetched and archived on a thread pool. The stations are averaged in
+    chunks on a process pool, so the CPU-bound part uses all cores. At most
+    two chunks per process are in flight and only the per-cell sums are
+    kept, so the memory use does not grow with the number of stations.
+    Stations whose data cannot be fetched are left out.
+
+    A request downloads at most REGION_MAX_COLD_FETCHES stations that are not
+    archived yet. If the region has more, nothing is computed: the missing
+    stations are fetched in the background and a message with status 202 is
+    returned, so the client can retry once they are archived. Stations
+    whose download failed are not fetched again for REGION_RETRY_SECONDS.
+
+    Args:
+        stations (list): Station dictionaries with "id", "latitude" and "longitude".
+        start_year (int): First year of the series.
+        end_year (int): Last year of the series.
+        cell_size (float): Edge length of a grid cell in degrees.
+        processes (int): Number of processes (default: this process's share of REGION_PROCESSES); 0 averages in the calling thread.
+
+    Returns:
+        tuple: (List of regional averages per year, HTTP status code 200), or ({"message", "pending"}, 202) while stations are fetched in the background.
+
+    Raises:
+        ValueError: If the region contains more than MAX_REGION_STATIONS stations or the cell size is invalid.
+    """
+    if len(stations) > MAX_REGION_STATIONS:
+        raise ValueError(f"At most {MAX_REGION_STATIONS} stations per region")
+    if not 0 < cell_size <= 90:
+        raise ValueError("cell_size must be between 0 and 90 degrees")
+    processes = _worker_processes if processes is None else processes
+
+    now = time.monotonic()
+    with _backfill_lock:
+        for station_id in [station_id for station_id, failed in _fetch_failures.items() if now - failed >= REGION_RETRY_SECONDS]:
+            del _fetch_failures[station_id]  # Wartezeit abgelaufen
+        skipped = set(_fetch_failures)
+    cold = {station["id"] for station in stations if station["id"] not in skipped and station_archive.meta(station["id"]) is None}
+    if len(cold) > REGION_MAX_COLD_FETCHES:
+        _backfill(sorted(cold))
+        return {"message": f"{len(cold)} stations of the region are being fetched, please retry later", "pending": len(cold)}, 202
+    # Archivierte Stationen im Hintergrund aktualisieren, nicht in der Anfrage
+    _backfill([station["id"] for station in stations if station["id"] not in skipped and station["id"] not in cold])
+
+    accumulator = CellAccumulator(start_year, end_year, cell_size)
+    pool = _get_process_pool(processes) if processes > 0 else None
+    pending = deque()
+
+    def submit(chunk):
+        if pool is None:
+            accumulator.merge(aggregate_stations(station_archive.directory, chunk, start_year, end_year, cell_size))
+            return
+        pending.append(pool.submit(aggregate_stations, station_archive.directory, chunk, start_year, end_year, cell_size))
+        while len(pending) > 2 * processes:
+            accumulator.merge(pending.popleft().result())
+
+    def add(station):
+        nonlocal chunk
+        chunk.append((station["id"], accumulator.cell(station["latitude"], station["longitude"])))
+        if len(chunk) == REGION_CHUNK_SIZE:
+            submit(chunk)
+            chunk = []
+
+    futures = {region_executor.submit(_fetch_station, station["id"]): station for station in stations if station["id"] in cold}
+    try:
+        chunk = []
+        for station in stations:
+            if station["id"] not in skipped and station["id"] not in cold:
+                add(station)
+        for future in as_completed(futures):
+            if future.exception() is not None:
+                continue  # Station ohne Daten auslassen
+            add(futures[future])
+        if chunk:
+            submit(chunk)
+        while pending:
+            accumulator.merge(pending.popleft().result())
+    finally:
+        for future in futures:
+            future.cancel()
+    return accumulator.averages(), 200
+
+# Prozessbudget des Servers auf die Worker-Prozesse verteilen
+def share_processes(workers):
+    """
+    Limits the averaging processes of this server process to its share of REGION_PROCESSES.
+
+    Called in every worker of a pre-forking server, so that all workers
+    together start at most REGION_PROCESSES processes instead of that many
+    each. With fewer processes than workers, the workers average in the
+    request thread.
+
+    Args:
+        workers (int): Number of worker processes of the server.
+    """
+    global _worker_processes
+    _worker_processes = REGION_PROCESSES // max(workers, 1)
+
+# Station archivieren und Fehlschläge vermerken
+def _fetch_station(station_id):
+    try:
+        return station_flight.do(station_id, lambda: update_station_archive(station_id))
+    except Exception:
+        with _backfill_lock:
+            _fetch_failures[station_id] = time.monotonic()
+        raise
+
+# Stationen im Hintergrund archivieren, jede höchstens einmal gleichzeitig
+def _backfill(station_ids):
+    with _backfill_lock:
+        new = [station_id for station_id in station_ids if station_id not in _backfilling]
+        _backfilling.update(new)
+    for station_id in new:
+        backfill_executor.submit(_backfill_station, station_id)
+
+def _backfill_station(station_id):
+    try:
+        _fetch_station(station_id)
+    except Exception as e:
+        print(f"Error fetching station {station_id} for a region: {str(e)}")
+    finally:
+        with _backfill_lock:
+            _backfilling.discard(station_id)
+
+def _get_process_pool(processes):
+    with _process_pool_lock:
+        if processes not in _process_pools:
+            # "spawn" statt fork: der Serverprozess hat bereits laufende Threads
+            _process_pools[processes] = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+        return _process_pools[processes]
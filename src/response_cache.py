@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from response_format import compress
+
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 3600))  # Sekunden
+
+# Eintrag im Antwortcache
+class CachedBody:
+    """
+    Serialized response body stored in the response cache.
+
+    Attributes:
+        body (bytes): Serialized body (JSON, columnar JSON or MessagePack).
+        etag (str): Strong ETag derived from the body.
+        version (int): Catalog generation the body was computed for.
+        expires (float): time.monotonic() value after which the entry is stale.
+        encodings (dict): Compressed bodies by content encoding, filled on demand.
+    """
+    __slots__ = ("body", "etag", "version", "expires", "encodings")
+
+    def __init__(self, body, version, expires):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.version = version
+        self.expires = expires
+        self.encodings = {}
+
+    def encoded_etag(self, encoding):
+        """str: ETag of the body compressed with an encoding, or the plain ETag for None."""
+        return f"{self.etag}-{encoding}" if encoding else self.etag
+
+    def size(self):
+        """int: Size of the body and its compressed variants in bytes."""
+        return len(self.body) + sum(len(body) for body in self.encodings.values())
+
+    def max_age(self):
+        """int: Remaining lifetime of the entry in whole seconds."""
+        return max(int(self.expires - time.monotonic()), 0)
+
+
+# Antwortcache für die API-Routen
+class ResponseCache:
+    """
+    In-process LRU cache for serialized API responses.
+
+    Entries are keyed on the normalized route parameters and tagged with the
+    catalog generation. An entry is served until its TTL runs out or the
+    catalog is reloaded (e.g. after a new last_update), whichever comes
+    first. The total size of the stored bodies is bounded; the least recently
+    used entries are evicted first.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL):
+        """
+        Args:
+            max_bytes (int): Maximum total size of the stored bodies. 0 disables the cache.
+            ttl (int): Lifetime of an entry in seconds.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """
+        Returns a fresh entry and marks it as recently used.
+
+        Args:
+            key (tuple): Normalized route parameters.
+            version (int): Current catalog generation.
+
+        Returns:
+            CachedBody: The cached entry, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.version != version or entry.expires <= time.monotonic()):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body):
+        """
+        Stores a response body, evicting the least recently used entries if necessary.
+
+        Args:
+            key (tuple): Normalized route parameters.
+            version (int): Catalog generation the body was computed for.
+            body (bytes): Serialized body.
+
+        Returns:
+            CachedBody: The new entry (also returned if the body is too large to be stored).
+        """
+        entry = CachedBody(body, version, time.monotonic() + self.ttl)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def encoded(self, key, entry, encoding):
+        """
+        Returns the body of an entry compressed with a content encoding.
+
+        Every encoding is compressed once per entry; the compressed bodies
+        count towards the size of the cache.
+
+        Args:
+            key (tuple): Key the entry is stored under.
+            entry (CachedBody): Entry returned by get or put.
+            encoding (str): "br" or "gzip".
+
+        Returns:
+            bytes: Compressed body.
+        """
+        body = entry.encodings.get(encoding)
+        if body is not None:
+            return body
+        body = compress(entry.body, encoding)
+        with self._lock:
+            if encoding in entry.encodings:
+                return entry.encodings[encoding]
+            entry.encodings[encoding] = body
+            if self._entries.get(key) is entry:
+                self._size += len(body)
+                while self._size > self.max_bytes:
+                    self._remove(next(iter(self._entries)))
+        return body
+
+    def clear(self):
+        """Removes all entries and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Returns the counters of the cache for monitoring.
+
+        Returns:
+            dict: Hits, misses, number of entries and total size in bytes.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._size}
+
+    def _remove(self, key):
+        self._size -= self._entries.pop(key).size()
+
+
+response_cache = ResponseCache()
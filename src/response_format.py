@@ -0,0 +1,135 @@
+import gzip
+import json
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+from aggregates import SEASONAL_MONTHS
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # Ohne msgpack steht nur JSON zur Verfügung
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Ohne brotli wird nur gzip angeboten
+
+# Antwortformate mit Medientyp; "json" ist das bisherige Format mit einem Objekt pro Zeile
+FORMATS = {
+    "json": "application/json",
+    "columnar": "application/vnd.columnar+json",
+    "msgpack": "application/msgpack",
+}
+# Spalten der Jahresmittel in der Reihenfolge von format_averages
+AVERAGE_COLUMNS = ["year", "tmax", "tmin"] + [f"{season}_{element}" for season in SEASONAL_MONTHS for element in ("tmax", "tmin")]
+MIN_COMPRESS_BYTES = 512  # Kleinere Antworten werden nicht komprimiert
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Schnell genug für Antworten, die nicht im Cache liegen
+
+def available_formats():
+    """
+    Returns the response formats supported with the installed packages.
+
+    Returns:
+        list: Format names, "json" first.
+    """
+    return [name for name in FORMATS if name != "msgpack" or msgpack is not None]
+
+# Antwortformat aushandeln
+def negotiate_format(format_param, accept):
+    """
+    Selects the response format from the "format" query parameter or the Accept header.
+
+    The query parameter takes precedence. Without a matching Accept entry
+    the JSON format is used, so existing clients keep their response shape.
+
+    Args:
+        format_param (str): Value of the "format" query parameter, or None.
+        accept (str): Value of the Accept header, or None.
+
+    Returns:
+        str: Format name, or None if the requested format is not supported.
+    """
+    formats = available_formats()
+    if format_param:
+        return format_param if format_param in formats else None
+    media_type = parse_accept_header(accept, MIMEAccept).best_match([FORMATS[name] for name in formats])
+    return next((name for name in formats if FORMATS[name] == media_type), "json")
+
+# Kompression aushandeln
+def negotiate_encoding(accept_encoding):
+    """
+    Selects the content encoding from the Accept-Encoding header; brotli is preferred over gzip.
+
+    Args:
+        accept_encoding (str): Value of the Accept-Encoding header, or None.
+
+    Returns:
+        str: "br", "gzip" or None for an uncompressed response.
+    """
+    accepted = parse_accept_header(accept_encoding)
+    if brotli is not None and accepted.quality("br") > 0:
+        return "br"
+    if accepted.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+# Zeilen in Spalten umwandeln
+def to_columnar(rows, columns=None):
+    """
+    Converts a list of row dictionaries into one list per field.
+
+    Args:
+        rows (list): Dictionaries with the same keys, e.g. the result of calculate_averages.
+        columns (list): Field names; by default the keys of the first row.
+
+    Returns:
+        dict: Field name -> list of values in row order.
+    """
+    if columns is None:
+        columns = list(rows[0]) if rows else []
+    return {column: [row.get(column) for row in rows] for column in columns}
+
+# Zeilen im gewählten Spaltenformat serialisieren
+def serialize(rows, response_format, columns=None):
+    """
+    Serializes a list of row dictionaries in one of the columnar formats.
+
+    Args:
+        rows (list): Dictionaries with the same keys.
+        response_format (str): "columnar" or "msgpack".
+        columns (list): Field names, see to_columnar.
+
+    Returns:
+        bytes: Serialized body.
+    """
+    return encode(to_columnar(rows, columns), response_format)
+
+def encode(data, response_format):
+    """
+    Encodes already converted data as compact JSON or MessagePack.
+
+    Args:
+        data: JSON-compatible data.
+        response_format (str): "columnar" or "msgpack".
+
+    Returns:
+        bytes: Serialized body.
+    """
+    if response_format == "msgpack":
+        return msgpack.packb(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+# Antwort komprimieren
+def compress(body, encoding):
+    """
+    Compresses a response body.
+
+    Args:
+        body (bytes): Uncompressed body.
+        encoding (str): "br" or "gzip".
+
+    Returns:
+        bytes: Compressed body.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL)
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+# Laufender Aufruf, auf den weitere Threads warten
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+# Zusammenfassen gleichzeitiger Aufrufe
+class SingleFlight:
+    """
+    Deduplicates concurrent calls with the same key.
+
+    The first thread calling do() for a key runs the function; threads that
+    call do() with the same key while it is running wait for it and receive
+    the same result (or exception). Once the call has finished, the next
+    call for the key runs the function again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        """
+        Runs the function once for all concurrent callers with the same key.
+
+        Args:
+            key (hashable): Key identifying the call, e.g. the station ID.
+            function (callable): Function without arguments computing the result.
+
+        Returns:
+            The result of the function.
+
+        Raises:
+            Exception: Any exception raised by the function, in every waiting caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if leader:
+            try:
+                call.result = function()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self, key):
+        """
+        Returns the number of callers waiting for a running call.
+
+        Args:
+            key (hashable): Key identifying the call.
+
+        Returns:
+            int: Number of waiting callers, or None if no call is running.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            return None if call is None else call.waiters
+
+
+# Zusammenfassen gleichzeitiger Coroutinen
+class AsyncSingleFlight:
+    """
+    Asynchronous counterpart of SingleFlight for coroutines of one event loop.
+
+    The first caller starts the coroutine as a task; callers with the same
+    key await the same task. A cancelled caller does not cancel the shared
+    task for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, function):
+        """
+        Runs the coroutine function once for all concurrent callers with the same key.
+
+        Args:
+            key (hashable): Key identifying the call, e.g. the station ID.
+            function (callable): Coroutine function without arguments computing the result.
+
+        Returns:
+            The result of the coroutine.
+
+        Raises:
+            Exception: Any exception raised by the coroutine, in every waiting caller.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(function())
+            task.add_done_callback(lambda done: self._calls.pop(key) if self._calls.get(key) is done else None)
+        return await asyncio.shield(task)
+
+    def in_flight(self, key):
+        """
+        Returns whether a call with the given key is running.
+
+        Args:
+            key (hashable): Key identifying the call.
+
+        Returns:
+            bool: True if a call is running.
+        """
+        return key in self._calls
@@ -0,0 +1,174 @@
+import math
+import numpy as np
+
+EARTH_RADIUS = 6371  # Radius of Earth in km, identisch zu business.haversine
+CELL_SIZE = 1.0  # Kantenlänge einer Gitterzelle in Grad
+EPSILON = 1e-9  # Sicherheitsabstand gegen Rundungsfehler in Grad
+MAX_CELL_GROUP = 256  # Maximale Anzahl Zellen pro Gruppe der k-nächste-Nachbarn-Suche
+DISTANCE_TOLERANCE = 1e-6  # Toleranz in km zwischen vektorisierter und skalarer Haversine-Formel
+
+# Räumlicher Index über Breiten-/Längengrad
+class StationGrid:
+    """
+    Regular latitude/longitude grid over the station catalog.
+
+    Every station is assigned to the cell containing its coordinates. Radius
+    queries only visit the cells intersecting the bounding box of the search
+    circle; the caller performs the exact distance check on the candidates.
+    Station indices are kept in one array sorted by cell, so each grid row of
+    a query is answered with a binary search instead of per-cell lookups.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_size=CELL_SIZE):
+        """
+        Args:
+            latitudes (numpy.ndarray): Station latitudes (NaN for stations without coordinates).
+            longitudes (numpy.ndarray): Station longitudes (NaN for stations without coordinates).
+            cell_size (float): Edge length of a grid cell in degrees.
+        """
+        self.cell_size = cell_size
+        self.lat_cells = int(math.ceil(180 / cell_size))
+        self.lon_cells = int(math.ceil(360 / cell_size))
+
+        valid = np.flatnonzero(~(np.isnan(latitudes) | np.isnan(longitudes)))  # Überspringe Stationen ohne Koordinaten
+        lat_cells = np.clip(np.floor((latitudes[valid] + 90) / cell_size), 0, self.lat_cells - 1).astype(np.int64)
+        lon_cells = np.floor((longitudes[valid] + 180) / cell_size).astype(np.int64) % self.lon_cells
+        keys = lat_cells * self.lon_cells + lon_cells
+
+        order = np.argsort(keys, kind="stable")
+        self.indices = valid[order]
+        # Nicht-leere Zellen mit Start-/Endposition ihrer Stationen in self.indices
+        self.cell_keys, cell_starts = np.unique(keys[order], return_index=True)
+        self.cell_offsets = np.append(cell_starts, len(self.indices))
+
+    def cells_by_distance(self, lat, lon, radius):
+        """
+        Yields the stations of the non-empty cells that may lie within the radius, nearest cells first.
+
+        The lower bound of a cell is the larger of its latitude gap and its
+        cross-track distance to the nearer edge meridian. No station in a cell
+        is closer to the central point than the cell's lower bound, so a
+        k-nearest search can stop as soon as the bound exceeds its k-th distance.
+        Cells are grouped in batches of growing size, each group starting with
+        the lowest remaining bound.
+
+        Args:
+            lat (float): Latitude of the central point.
+            lon (float): Longitude of the central point.
+            radius (float): Maximum distance in kilometers.
+
+        Yields:
+            tuple: (lower bound of the distance in kilometers for the group, station indices of the group)
+        """
+        cells = self._cells_in_range(lat, lon, radius)
+        keys = self.cell_keys[cells]
+
+        south = (keys // self.lon_cells) * self.cell_size - 90
+        dlat = np.maximum(0, np.maximum(south - lat, lat - (south + self.cell_size)))
+
+        west = (keys % self.lon_cells) * self.cell_size - 180
+        inside = (lon - west) % 360 < self.cell_size
+        dlon = np.where(inside, 0, np.minimum((west - lon) % 360, (lon - west - self.cell_size) % 360))
+        # Abstand zum Großkreis des nächsten Randmeridians ist nur bis 90° eine untere Schranke
+        cross_track = np.where(dlon <= 90, np.arcsin(np.abs(np.sin(np.radians(dlon))) * math.cos(math.radians(lat))), 0)
+
+        bounds = EARTH_RADIUS * np.maximum(np.radians(dlat), cross_track)
+        order = np.argsort(bounds, kind="stable")
+
+        # Zellen in Gruppen doppelter Größe liefern, um den Aufwand pro Zelle gering zu halten
+        start, size = 0, 1
+        while start < len(order) and bounds[order[start]] <= radius + DISTANCE_TOLERANCE:
+            group = cells[order[start:start + size]]
+            yield bounds[order[start]], np.concatenate([self._cell_indices(cell) for cell in group])
+            start += size
+            size = min(size * 2, MAX_CELL_GROUP)
+
+    def _cells_in_range(self, lat, lon, radius):
+        """
+        Returns the positions of the non-empty cells intersecting the bounding box of a search circle.
+
+        Args:
+            lat (float): Latitude of the central point.
+            lon (float): Longitude of the central point.
+            radius (float): Maximum distance in kilometers.
+
+        Returns:
+            numpy.ndarray: Positions in self.cell_keys.
+        """
+        if radius < 0:
+            return np.empty(0, dtype=np.int64)
+
+        lat_rows, lon_ranges = self._cell_ranges(lat, lon, radius)
+        parts = []
+        for lat_cell in lat_rows:
+            for first, last in lon_ranges:
+                start, end = np.searchsorted(self.cell_keys, [lat_cell * self.lon_cells + first, lat_cell * self.lon_cells + last + 1])
+                if start < end:
+                    parts.append(np.arange(start, end))
+
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(parts)
+
+    def _cell_indices(self, cell):
+        return self.indices[self.cell_offsets[cell]:self.cell_offsets[cell + 1]]
+
+    def _cell_ranges(self, lat, lon, radius):
+        """
+        Computes the grid rows and columns covering the bounding box of a search circle.
+
+        Args:
+            lat (float): Latitude of the central point.
+            lon (float): Longitude of the central point.
+            radius (float): Maximum distance in kilometers.
+
+        Returns:
+            tuple: (range of latitude cells, list of inclusive (first, last) longitude cell ranges)
+        """
+        all_columns = [(0, self.lon_cells - 1)]
+        angular_radius = radius / EARTH_RADIUS
+        lat_span = math.degrees(angular_radius) + EPSILON
+        min_lat = lat - lat_span
+        max_lat = lat + lat_span
+        lat_rows = range(self._lat_cell(max(min_lat, -90)), self._lat_cell(min(max_lat, 90)) + 1)
+
+        # Enthält der Suchkreis einen Pol, kommen alle Längengrade in Frage
+        if min_lat <= -90 or max_lat >= 90 or math.sin(angular_radius) >= math.cos(math.radians(lat)):
+            return lat_rows, all_columns
+
+        lon_span = math.degrees(math.asin(math.sin(angular_radius) / math.cos(math.radians(lat)))) + EPSILON
+        first = math.floor((lon - lon_span + 180) / self.cell_size)
+        last = math.floor((lon + lon_span + 180) / self.cell_size)
+        if last - first + 1 >= self.lon_cells:
+            return lat_rows, all_columns
+
+        # Bereiche über die Datumsgrenze hinweg aufteilen
+        first %= self.lon_cells
+        last %= self.lon_cells
+        if first <= last:
+            return lat_rows, [(first, last)]
+        return lat_rows, [(first, self.lon_cells - 1), (0, last)]
+
+    def _lat_cell(self, lat):
+        return min(max(math.floor((lat + 90) / self.cell_size), 0), self.lat_cells - 1)
+
+
+# Vektorisierte Haversine-Formel
+def haversine_vector(lat, lon, latitudes, longitudes):
+    """
+    Computes the Haversine distances from one location to many locations in a single pass.
+
+    Args:
+        lat (float): Latitude of the central point.
+        lon (float): Longitude of the central point.
+        latitudes (numpy.ndarray): Latitudes of the other locations.
+        longitudes (numpy.ndarray): Longitudes of the other locations.
+
+    Returns:
+        numpy.ndarray: Distances in kilometers.
+    """
+    dlat = np.radians(latitudes - lat)
+    dlon = np.radians(longitudes - lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(math.radians(lat)) * np.cos(np.radians(latitudes)) * np.sin(dlon / 2) ** 2
+    a = np.minimum(a, 1.0)  # Rundungsfehler bei antipodalen Punkten abfangen
+    return EARTH_RADIUS * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
@@ -0,0 +1,339 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+import numpy as np
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: Dateisperre entfällt, ein Serverprozess
+from station_columns import iter_station_columns
+from metrics import add_bytes
+
+ARCHIVE_DIR = os.environ.get("STATION_ARCHIVE_DIR", "archive")
+ARCHIVE_MAX_BYTES = int(os.environ.get("STATION_ARCHIVE_MAX_BYTES", 8 * 1024 * 1024 * 1024))  # Größe des Archivs; 0 = unbegrenzt
+ARCHIVE_EVICT_RATIO = 0.9  # Belegter Anteil nach dem Verdrängen, damit nicht jede Aktualisierung das Archiv durchsucht
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+ARCHIVE_FILE_MODE = 0o644  # Archivdateien auch für andere Benutzer lesbar
+
+# Jahresbereich für die vollständige Auswertung einer Stationsdatei
+MIN_YEAR = 0
+MAX_YEAR = 9999
+DECADE = 10  # Jahre pro Partition
+READ_ATTEMPTS = 5  # Leseversuche, falls Partitionen währenddessen ersetzt werden
+
+# Zeile des Archivs: Datum als YYYYMMDD, Element als Index in ELEMENTS, Wert
+ARCHIVE_DTYPE = np.dtype([("date", np.int32), ("element", np.int8), ("value", np.int32)])
+
+# Zählt die gelesenen Bytes eines Datenstroms
+class _ByteCounter:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.size = 0
+        self.last = b""
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if chunk:
+                self.size += len(chunk)
+                self.last = chunk[-1:]
+            yield chunk
+
+
+# Spaltenarchiv der Stationsdaten
+class StationArchive:
+    """
+    Persistent per-station archive of the parsed TMAX/TMIN series.
+
+    Every station has a directory with one NumPy file per decade (rows of
+    ARCHIVE_DTYPE) and a JSON file naming the current partition files, the
+    version (ETag or Last-Modified) and the number of bytes of the source
+    CSV that have been archived. When the cached CSV was only extended, just
+    the appended bytes are parsed and added to the affected decades.
+    Partition files are never overwritten: new files are written first and
+    the JSON file is replaced atomically, so readers always see a complete
+    set. Reads memory-map only the decades covering the requested years
+    and start over with the new description if a partition was removed in
+    the meantime. Updates of a station are serialized with a lock file, also
+    across server processes.
+
+    The total size is bounded: reads refresh the modification time of the
+    JSON file, and once an update pushes the archive over its limit, the
+    least recently used stations are removed. Each process only tracks the
+    bytes it wrote since its last scan, so with several processes the limit
+    can be exceeded until one of them scans again. A full mirror import
+    needs a limit above the size of the whole mirror, or none.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, max_bytes=ARCHIVE_MAX_BYTES):
+        """
+        Args:
+            directory (str): Directory holding one subdirectory per station.
+            max_bytes (int): Maximum total size of the archive. 0 disables the limit.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._bytes = None  # Geschätzte Größe; None bis zur ersten Durchsuchung
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+
+    def meta(self, station_id):
+        """
+        Returns the description of the archived data of a station.
+
+        Args:
+            station_id (str): Unique identifier of the weather station.
+
+        Returns:
+            dict: "version", "size", "complete" and "files" (decade -> file name), or None if not archived.
+        """
+        if not station_id.isalnum():
+            return None
+        try:
+            with open(self._meta_path(station_id), "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def read(self, station_id, start_year, end_year):
+        """
+        Reads the archived rows of the decades overlapping a year range.
+
+        Args:
+            station_id (str): Unique identifier of the weather station.
+            start_year (int): First year needed.
+            end_year (int): Last year needed.
+
+        Yields:
+            tuple: (dates, element codes, values) arrays per decade, as yielded by iter_station_columns.
+        """
+        for attempt in range(READ_ATTEMPTS):
+            meta = self.meta(station_id)
+            if meta is None:
+                return
+            try:
+                # Alle Partitionen vor der Ausgabe abbilden; danach stört ihr Entfernen nicht mehr
+                parts = [
+                    np.load(os.path.join(self._station_dir(station_id), name), mmap_mode="r")
+                    for decade, name in sorted(meta["files"].items(), key=lambda item: int(item[0]))
+                    if int(decade) <= end_year and int(decade) + DECADE - 1 >= start_year
+                ]
+            except (OSError, ValueError):
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+                continue  # Zwischenzeitlich ersetzt: Beschreibung erneut lesen
+            try:
+                os.utime(self._meta_path(station_id))  # Als zuletzt verwendet markieren
+            except OSError:
+                pass
+            for part in parts:
+                yield part["date"], part["element"], part["value"]
+            return
+
+    def update(self, station_id, response):
+        """
+        Brings the archive of a station up to date with a station data response.
+
+        Nothing is parsed if the archive already holds the response's
+        version. If the response is a cached file that was extended from
+        exactly the archived size, only the appended bytes are parsed;
+        otherwise the whole file is parsed and replaces the archive. The
+        station is locked while it is updated, so concurrent updates from
+        several processes are applied one after the other.
+
+        Args:
+            station_id (str): Unique identifier of the weather station.
+            response (requests.Response or CachedResponse): Station data response; not closed.
+
+        Returns:
+            dict: Description of the archived data, or None if the station ID cannot be archived.
+        """
+        if not station_id.isalnum():
+            return None
+        with self._locked(station_id):
+            meta = self._update(station_id, response)
+        self._evict_if_full()
+        return meta
+
+    def replace(self, station_id, columns, version):
+        """
+        Replaces the archive of a station with rows parsed from another source, e.g. a .dly file.
+
+        The archive is marked as incomplete with no CSV bytes, so the next
+        CSV response of the station is archived in full.
+
+        Args:
+            station_id (str): Unique identifier of the weather station.
+            columns (list): (dates, element codes, values) blocks.
+            version (str): Version of the source.
+
+        Returns:
+            dict: Description of the archived data, or None if the station ID cannot be archived.
+        """
+        if not station_id.isalnum():
+            return None
+        with self._locked(station_id):
+            meta = self._store(station_id, self.meta(station_id), columns, version, 0, False, append=False)
+        self._evict_if_full()
+        return meta
+
+    def evict(self):
+        """
+        Removes the least recently used stations until the archive fits its size limit.
+
+        The archive is shrunk to ARCHIVE_EVICT_RATIO of the limit. Every
+        station is removed under its lock; readers that already mapped its
+        partitions keep reading them. Does nothing while another thread of
+        the process is evicting.
+        """
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                return
+            for station_id in names:
+                if not station_id.isalnum():
+                    continue
+                try:
+                    used = os.stat(self._meta_path(station_id)).st_mtime_ns
+                    size = sum(entry.stat().st_size for entry in os.scandir(self._station_dir(station_id)) if entry.is_file())
+                except OSError:
+                    continue  # Nicht archiviert oder bereits von einem anderen Prozess entfernt
+                entries.append((used, size, station_id))
+
+            total = sum(size for _, size, _ in entries)
+            if self.max_bytes > 0 and total > self.max_bytes:
+                for _, size, station_id in sorted(entries):
+                    if total <= self.max_bytes * ARCHIVE_EVICT_RATIO:
+                        break
+                    with self._locked(station_id):
+                        self._remove(station_id)
+                    total -= size
+            with self._lock:
+                self._bytes = total
+        finally:
+            self._evict_lock.release()
+
+    def _update(self, station_id, response):
+        # Aktualisiert das Archiv einer Station; der Aufrufer hält ihre Sperre
+        version = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        meta = self.meta(station_id)
+        if meta is not None and version is not None and meta["version"] == version:
+            return meta
+
+        appended_from = getattr(response, "appended_from", None)
+        if meta is not None and meta["complete"] and appended_from is not None and appended_from == meta["size"]:
+            counter = _ByteCounter(response.iter_content(ARCHIVE_CHUNK_SIZE, appended_from))
+            columns = list(iter_station_columns(counter, MIN_YEAR, MAX_YEAR, skip_header=False))
+            add_bytes(counter.size)
+            return self._store(station_id, meta, columns, version, appended_from + counter.size, counter.last in (b"", b"\n"), append=True)
+
+        counter = _ByteCounter(response.iter_content(ARCHIVE_CHUNK_SIZE))
+        columns = list(iter_station_columns(counter, MIN_YEAR, MAX_YEAR))
+        add_bytes(counter.size)
+        return self._store(station_id, meta, columns, version, counter.size, counter.last == b"\n", append=False)
+
+    def _store(self, station_id, meta, columns, version, size, complete, append):
+        """
+        Writes new partition files and replaces the description of the archive.
+        The caller holds the lock of the station.
+
+        Args:
+            station_id (str): Unique identifier of the weather station.
+            meta (dict): Current description of the archive, or None.
+            columns (list): (dates, element codes, values) blocks to store.
+            version (str): Version of the source file.
+            size (int): Number of archived bytes of the source file.
+            complete (bool): Whether the archived bytes end with a complete line.
+            append (bool): Whether the rows extend the current archive instead of replacing it.
+
+        Returns:
+            dict: The new description of the archive.
+        """
+        station_dir = self._station_dir(station_id)
+        rows = np.zeros(sum(len(dates) for dates, _, _ in columns), dtype=ARCHIVE_DTYPE)
+        offset = 0
+        for dates, elements, values in columns:
+            part = rows[offset:offset + len(dates)]
+            part["date"], part["element"], part["value"] = dates, elements, values
+            offset += len(dates)
+
+        files = dict(meta["files"]) if append else {}
+        written = 0
+        decades = rows["date"] // (DECADE * 10000) * DECADE
+        for decade in np.unique(decades).tolist():
+            part = rows[decades == decade]
+            if str(decade) in files:
+                part = np.concatenate((np.load(os.path.join(station_dir, files[str(decade)])), part))
+            files[str(decade)] = self._write_partition(station_dir, decade, part)
+            written += os.path.getsize(os.path.join(station_dir, files[str(decade)]))
+
+        new_meta = {"version": version, "size": size, "complete": complete, "files": files}
+        handle, temp_path = tempfile.mkstemp(dir=station_dir, prefix=".tmp-")
+        with os.fdopen(handle, "w") as file:
+            json.dump(new_meta, file)
+        os.chmod(temp_path, ARCHIVE_FILE_MODE)
+        os.replace(temp_path, self._meta_path(station_id))
+
+        # Nicht mehr benötigte Partitionen entfernen
+        for name in set((meta or {}).get("files", {}).values()) - set(files.values()):
+            try:
+                path = os.path.join(station_dir, name)
+                size = os.path.getsize(path)
+                os.remove(path)
+                written -= size
+            except OSError:
+                pass
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += written
+        return new_meta
+
+    def _remove(self, station_id):
+        # Entfernt die archivierten Daten einer Station, zuerst die Beschreibung; die Sperrdatei bleibt
+        station_dir = self._station_dir(station_id)
+        try:
+            os.remove(self._meta_path(station_id))
+        except OSError:
+            pass
+        for entry in os.scandir(station_dir):
+            if entry.name != ".lock":
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _evict_if_full(self):
+        # Durchsucht das Archiv beim ersten Schreiben und sobald die geschätzte Größe das Limit überschreitet
+        if self.max_bytes > 0 and (self._bytes is None or self._bytes > self.max_bytes):
+            self.evict()
+
+    @contextmanager
+    def _locked(self, station_id):
+        # Exklusive Sperre einer Station, auch über Serverprozesse hinweg
+        station_dir = self._station_dir(station_id)
+        os.makedirs(station_dir, exist_ok=True)
+        with open(os.path.join(station_dir, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _write_partition(self, station_dir, decade, rows):
+        handle, temp_path = tempfile.mkstemp(dir=station_dir, prefix=f"{decade}-", suffix=".npy")
+        with os.fdopen(handle, "wb") as file:
+            np.save(file, rows)
+        os.chmod(temp_path, ARCHIVE_FILE_MODE)  # mkstemp legt Dateien nur für den Besitzer lesbar an
+        return os.path.basename(temp_path)
+
+    def _station_dir(self, station_id):
+        return os.path.join(self.directory, station_id)
+
+    def _meta_path(self, station_id):
+        return os.path.join(self._station_dir(station_id), "meta.json")
+
+
+station_archive = StationArchive()
@@ -0,0 +1,276 @@
+import datetime
+import numpy as np
+
+ELEMENTS = ("TMAX", "TMIN")
+ELEMENT_BYTES = np.frombuffer(b"TMAXTMIN", dtype=np.uint8).reshape(len(ELEMENTS), 4)
+
+NEWLINE = ord("\n")
+COMMA = ord(",")
+MINUS = ord("-")
+ZERO = ord("0")
+DATE_OFFSET = 12  # Position des Datums hinter der 11-stelligen Stations-ID
+ELEMENT_OFFSET = 21
+VALUE_OFFSET = 26
+MAX_VALUE_WIDTH = 7  # Vorzeichen und bis zu 6 Ziffern
+DLY_LINE_WIDTH = 269  # Monatszeile der .dly-Dateien: ID, Jahr, Monat, Element und 31 Tage
+DLY_DAY_OFFSET = 21
+DLY_DAY_WIDTH = 8  # Wert (5) und drei Kennzeichen
+DLY_DAYS = 31
+DLY_MISSING = -9999
+
+BLOCK_SIZE = 1024 * 1024
+
+# Einzelne Zeile der Stationsdaten parsen
+def parse_station_line(line, start_year, end_year):
+    """
+    Parses one line of the station CSV.
+
+    Args:
+        line (str or bytes): Line of the station CSV.
+        start_year (int): Start year for filtering data.
+        end_year (int): End year for filtering data.
+
+    Returns:
+        dict: Parsed entry with "date", "datatype" and "value", or None if the line is skipped.
+    """
+    try:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line:
+            return None  # Überspringe leere Zeilen
+
+        parts = line.split(",")
+
+        date = parts[1].strip()
+        datatype = parts[2].strip()
+        value = parts[3].strip()
+
+        # Parse Jahr aus Datum
+        try:
+            year = int(date[:4])
+        except ValueError:
+            print(f"Invalid date format: {date}")
+            return None
+
+        if start_year <= year <= end_year and datatype in {"TMAX", "TMIN"}:
+            return {
+                "date": date,
+                "datatype": datatype,
+                "value": int(value) if value != "NA" else None,
+            }
+
+    except Exception as e:
+        print(f"Skipping line due to error: {e}, line: {line}")
+    return None
+
+# Stationsdaten blockweise in Spalten einlesen
+def iter_station_columns(chunks, start_year, end_year, block_size=BLOCK_SIZE, skip_header=True):
+    """
+    Reads the station CSV into typed column arrays, one block of lines at a time.
+
+    The header line is skipped unless skip_header is False (e.g. for bytes
+    appended to a file that was already parsed). Rows outside the year range, elements other
+    than TMAX/TMIN and "NA" values are dropped.
+
+    Args:
+        chunks (iterable): Raw CSV content as chunks of bytes.
+        start_year (int): Start year for filtering data.
+        end_year (int): End year for filtering data.
+        block_size (int): Minimum number of bytes parsed at once.
+        skip_header (bool): Whether the first line is a header.
+
+    Yields:
+        tuple: (dates as int32 YYYYMMDD, element codes as int8 indices into ELEMENTS, values as int32)
+    """
+    header_skipped = not skip_header
+    for block in iter_line_blocks(chunks, block_size):
+        if not header_skipped:
+            block, header_skipped = _skip_header(block), True
+        if block:
+            yield parse_station_block(block, start_year, end_year)
+
+def _skip_header(block):
+    newline = block.find(b"\n")
+    return b"" if newline < 0 else block[newline + 1:]
+
+# Datenstrom in Blöcke vollständiger Zeilen aufteilen
+def iter_line_blocks(chunks, block_size=BLOCK_SIZE):
+    """
+    Regroups a stream of byte chunks into blocks of complete lines.
+
+    Small chunks are joined until a block holds at least block_size bytes;
+    large chunks (e.g. a whole file or a memory map) are cut into pieces of
+    block_size bytes first, so a block never grows much beyond block_size
+    plus one line.
+
+    Args:
+        chunks (iterable): Content as chunks of bytes (bytes, memoryview or mmap objects).
+        block_size (int): Minimum number of bytes per block.
+
+    Yields:
+        bytes: Blocks ending with a newline; the last block may lack it.
+    """
+    parts = []
+    size = 0
+
+    for chunk in chunks:
+        for offset in range(0, len(chunk), block_size):
+            piece = bytes(chunk[offset:offset + block_size])
+            parts.append(piece)
+            size += len(piece)
+            if size < block_size:
+                continue
+            pending = b"".join(parts)
+            cut = pending.rfind(b"\n") + 1
+            if cut == 0:
+                parts = [pending]
+                continue
+            yield pending[:cut]
+            parts = [pending[cut:]]
+            size = len(parts[0])
+
+    pending = b"".join(parts)
+    if pending:
+        yield pending
+
+# Block vollständiger Zeilen vektorisiert parsen
+def parse_station_block(block, start_year, end_year):
+    """
+    Parses a block of complete CSV lines with vectorized byte scanning.
+
+    Lines in the fixed GHCN layout (11-character ID, 8-digit date, 4-character
+    element) are decoded with NumPy: the element is checked first and only
+    TMAX/TMIN rows have their date and value decoded. All other lines are
+    passed to parse_station_line, so the result is the same as parsing every
+    line on its own.
+
+    Args:
+        block (bytes): Complete lines of the station CSV without header.
+        start_year (int): Start year for filtering data.
+        end_year (int): End year for filtering data.
+
+    Returns:
+        tuple: (dates as int32 YYYYMMDD, element codes as int8 indices into ELEMENTS, values as int32)
+    """
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    newlines = np.flatnonzero(buffer == NEWLINE)
+    line_starts = np.concatenate(([0], newlines + 1))
+    line_ends = np.concatenate((newlines, [len(buffer)]))
+
+    # Feste Spaltenpositionen: ID(11),DATE(8),ELEMENT(4),DATA_VALUE,...
+    fixed = line_ends - line_starts >= VALUE_OFFSET + 1
+    fixed[fixed] = (
+        (buffer[line_starts[fixed] + DATE_OFFSET - 1] == COMMA)
+        & (buffer[line_starts[fixed] + ELEMENT_OFFSET - 1] == COMMA)
+        & (buffer[line_starts[fixed] + VALUE_OFFSET - 1] == COMMA)
+    )
+    starts = line_starts[fixed]
+
+    # Element zuerst prüfen; andere Elemente als TMAX/TMIN werden verworfen
+    element_bytes = _gather(buffer, starts + ELEMENT_OFFSET, 4)
+    element_codes = np.full(len(starts), -1, dtype=np.int8)
+    for code, expected in enumerate(ELEMENT_BYTES):
+        element_codes[(element_bytes == expected).all(axis=1)] = code
+    other_element = (element_codes < 0) & _is_alphanumeric(element_bytes).all(axis=1)
+
+    # Datum und Wert nur für TMAX/TMIN-Zeilen dekodieren
+    rows = np.flatnonzero(element_codes >= 0)
+    row_starts = starts[rows]
+    row_ends = line_ends[fixed][rows]
+
+    date_digits = _gather(buffer, row_starts + DATE_OFFSET, 8).astype(np.int64) - ZERO
+    date_ok = ((date_digits >= 0) & (date_digits <= 9)).all(axis=1)
+    dates = date_digits @ (10 ** np.arange(7, -1, -1))
+
+    # Wert: optionales Minuszeichen und Ziffern bis zum nächsten Komma oder Zeilenende
+    positions = np.arange(MAX_VALUE_WIDTH + 1)
+    value_indices = row_starts[:, None] + VALUE_OFFSET + positions
+    value_bytes = buffer[np.minimum(value_indices, len(buffer) - 1)].astype(np.int64)
+    terminator = (value_bytes == COMMA) | (value_indices >= row_ends[:, None])
+    value_width = np.where(terminator.any(axis=1), terminator.argmax(axis=1), MAX_VALUE_WIDTH + 1)
+    negative = value_bytes[:, 0] == MINUS
+    is_digit_position = (positions < value_width[:, None]) & ~((positions == 0) & negative[:, None])
+    digits = value_bytes - ZERO
+    value_ok = (
+        (value_width <= MAX_VALUE_WIDTH) & (value_width > negative)
+        & np.where(is_digit_position, (digits >= 0) & (digits <= 9), True).all(axis=1)
+    )
+    exponents = np.clip(value_width[:, None] - 1 - positions, 0, None)
+    values = np.where(is_digit_position, digits * 10 ** exponents, 0).sum(axis=1)
+    values = np.where(negative, -values, values)
+
+    vectorized = date_ok & value_ok
+    years = dates // 10000
+    keep = vectorized & (years >= start_year) & (years <= end_year)
+
+    # Alle übrigen Zeilen zeilenweise parsen
+    handled = other_element.copy()
+    handled[rows[vectorized]] = True
+    fallback = np.ones(len(line_starts), dtype=bool)
+    fallback[np.flatnonzero(fixed)[handled]] = False
+    entries = []
+    for line in np.flatnonzero(fallback).tolist():
+        entry = parse_station_line(block[line_starts[line]:line_ends[line]], start_year, end_year)
+        if entry is not None and entry["value"] is not None:
+            entries.append(entry)
+
+    return (
+        np.concatenate((dates[keep], [_date_number(entry["date"]) for entry in entries])).astype(np.int32),
+        np.concatenate((element_codes[rows][keep], [ELEMENTS.index(entry["datatype"]) for entry in entries])).astype(np.int8),
+        np.concatenate((values[keep], [entry["value"] for entry in entries])).astype(np.int32),
+    )
+
+# Monatszeilen im .dly-Format von ghcnd_all parsen
+def parse_dly_block(block):
+    """
+    Parses the fixed-width monthly lines of a GHCN-Daily .dly file into columns.
+
+    Every line holds one month of one element: ID (11), year (4), month (2),
+    element (4) and 31 days of a 5-character value and three flags. Missing
+    days (-9999), elements other than TMAX/TMIN and malformed lines are
+    dropped; flagged values are kept like in the CSV files.
+
+    Args:
+        block (bytes): Complete lines of a .dly file.
+
+    Returns:
+        tuple: (dates as int32 YYYYMMDD, element codes as int8 indices into ELEMENTS, values as int32)
+    """
+    lines = [
+        line.ljust(DLY_LINE_WIDTH)[:DLY_LINE_WIDTH]
+        for line in block.splitlines()
+        if line[17:21] in (b"TMAX", b"TMIN") and line[11:17].isdigit()
+    ]
+    if not lines:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int8), np.empty(0, dtype=np.int32)
+
+    raw = np.frombuffer(b"".join(lines), dtype="S1").reshape(len(lines), DLY_LINE_WIDTH)
+    months = np.ascontiguousarray(raw[:, 11:17]).view("S6")[:, 0].astype(np.int32)  # JJJJMM
+    elements = (np.ascontiguousarray(raw[:, 17:21]).view("S4")[:, 0] == b"TMIN").astype(np.int8)
+    days = raw[:, DLY_DAY_OFFSET:DLY_DAY_OFFSET + DLY_DAYS * DLY_DAY_WIDTH].reshape(len(lines), DLY_DAYS, DLY_DAY_WIDTH)
+    values = np.char.strip(np.ascontiguousarray(days[:, :, :5]).view("S5")[:, :, 0])
+    valid = np.char.isdigit(np.char.lstrip(values, b"-")) & (np.char.count(values, b"-") <= 1)  # Höchstens ein Vorzeichen
+    values = np.where(valid, values, str(DLY_MISSING).encode()).astype(np.int32)
+
+    keep = values != DLY_MISSING
+    dates = months[:, None] * 100 + np.arange(1, DLY_DAYS + 1)
+    return (
+        dates[keep].astype(np.int32),
+        np.broadcast_to(elements[:, None], keep.shape)[keep],
+        values[keep],
+    )
+
+def _gather(buffer, starts, width):
+    return buffer[np.minimum(starts[:, None] + np.arange(width), len(buffer) - 1)]
+
+def _is_alphanumeric(values):
+    return ((values >= ord("A")) & (values <= ord("Z"))) | ((values >= ZERO) & (values <= ord("9")))
+
+def _date_number(date):
+    # Datum wie calculate_averages mit strptime lesen; ungültige Daten werden später verworfen
+    try:
+        date = datetime.datetime.strptime(date, "%Y%m%d")
+    except ValueError:
+        return 0
+    return date.year * 10000 + date.month * 100 + date.day
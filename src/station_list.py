@@ -0,0 +1,261 @@
+import numpy as np
+from catalog import STATION_DTYPE, to_records
+from station_columns import iter_line_blocks, NEWLINE, ZERO, BLOCK_SIZE
+
+TAB = ord("\t")
+SPACE = ord(" ")
+ELEMENT_CODES = np.frombuffer(b"TMAXTMIN", dtype=np.uint32)  # Elemente als 4-Byte-Zahlen für einen Vergleich pro Zeile
+NUMBER_BYTES = np.frombuffer(b"0123456789.+- \t", dtype=np.uint8)
+
+MIN_STATION_LINE = 85  # Kürzere Zeilen der Stationsliste werden übersprungen
+MIN_INVENTORY_LINE = 45  # Kürzere Zeilen der Inventardaten werden übersprungen
+# Spalten der Stationsliste (ghcnd-stations.txt)
+STATION_FIELDS = {"id": (0, 11), "latitude": (12, 20), "longitude": (21, 30), "elevation": (31, 37), "state": (38, 40), "name": (41, 71)}
+# Spalten der Inventardaten (ghcnd-inventory.txt)
+INVENTORY_FIELDS = {"id": (0, 11), "element": (31, 35), "first_year": (36, 40), "last_year": (41, 45)}
+
+# Einzelne Zeile der Stationsliste parsen
+def parse_station_entry(line):
+    """
+    Parses one line of ghcnd-stations.txt.
+
+    Args:
+        line (str): Line of the station list.
+
+    Returns:
+        dict: Station dictionary without first/last year, or None if the line is skipped.
+    """
+    if len(line) < MIN_STATION_LINE:
+        return None  # Überspringe unvollständige Zeilen
+
+    try:
+        return {
+            "id": line[0:11].strip(),
+            "latitude": float(line[12:20].strip()),
+            "longitude": float(line[21:30].strip()),
+            "elevation": float(line[31:37].strip()) if line[31:37].strip() != "" else None,
+            "state": line[38:40].strip() if line[38:40].strip() != "" else None,
+            "name": line[41:71].strip(),
+            "mindate": None,
+            "maxdate": None
+        }
+    except (ValueError, IndexError):
+        return None
+
+# Einzelne Zeile der Inventardaten parsen
+def parse_inventory_entry(line):
+    """
+    Parses one line of ghcnd-inventory.txt.
+
+    Args:
+        line (str): Line of the inventory data.
+
+    Returns:
+        tuple: (station ID, first year, last year) of a TMAX/TMIN line with both years, or None.
+    """
+    if len(line) < MIN_INVENTORY_LINE:
+        return None  # Überspringe unvollständige Zeilen
+
+    try:
+        station_id = line[0:11].strip()
+        element = line[31:35].strip()
+        first_year = int(line[36:40].strip()) if line[36:40].strip().isdigit() else None
+        last_year = int(line[41:45].strip()) if line[41:45].strip().isdigit() else None
+    except (ValueError, IndexError):
+        return None
+
+    if element in ["TMAX", "TMIN"] and first_year and last_year:
+        return station_id, first_year, last_year
+    return None
+
+
+# Stationsliste blockweise in Datensätze einlesen
+def parse_stations(chunks, encoding="utf-8", block_size=BLOCK_SIZE):
+    """
+    Parses ghcnd-stations.txt into station records with vectorized fixed-width decoding.
+
+    The result equals to_records of parse_stations_data: stations appear in
+    the order of their first line, a repeated ID takes the values of its
+    last line. First and last years are 0 until join_inventory is applied.
+
+    Args:
+        chunks (iterable): File content as chunks of bytes, e.g. a streaming response, [bytes] or [mmap].
+        encoding (str): Encoding used for lines that are parsed one by one.
+        block_size (int): Minimum number of bytes parsed at once.
+
+    Returns:
+        numpy.ndarray: Station records with dtype STATION_DTYPE.
+    """
+    parts = [parse_stations_block(block, encoding) for block in iter_line_blocks(chunks, block_size)]
+    records = np.concatenate(parts) if parts else np.zeros(0, dtype=STATION_DTYPE)
+
+    # Doppelte IDs wie im Dictionary: Position des ersten, Werte des letzten Vorkommens
+    _, first = np.unique(records["id"], return_index=True)
+    _, last_reversed = np.unique(records["id"][::-1], return_index=True)
+    last = len(records) - 1 - last_reversed
+    return records[last[np.argsort(first)]]
+
+# Block der Stationsliste vektorisiert parsen
+def parse_stations_block(block, encoding="utf-8"):
+    """
+    Parses a block of complete lines of ghcnd-stations.txt.
+
+    Lines containing non-numeric characters in the coordinate columns are
+    parsed one by one with parse_station_entry. Blocks with control
+    characters or non-ASCII bytes are parsed entirely line by line, so the
+    result never differs from the line parser.
+
+    Args:
+        block (bytes): Complete lines of the station list.
+        encoding (str): Encoding used for lines that are parsed one by one.
+
+    Returns:
+        numpy.ndarray: Station records with dtype STATION_DTYPE in line order.
+    """
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    if _needs_line_parser(buffer):
+        return _parse_station_lines(block.decode(encoding).splitlines())
+
+    starts, ends = _line_bounds(buffer)
+    starts = starts[ends - starts >= MIN_STATION_LINE]
+
+    numbers = np.concatenate([_gather(buffer, starts, *STATION_FIELDS[field]) for field in ("latitude", "longitude", "elevation")], axis=1)
+    regular = np.isin(numbers, NUMBER_BYTES).all(axis=1)
+
+    # Zeilen mit Buchstaben o. Ä. in den Zahlenspalten einzeln parsen
+    line_numbers = np.arange(len(starts))
+    irregular = [
+        (position, entry) for position in line_numbers[~regular].tolist()
+        if (entry := parse_station_entry(_line(block, buffer, starts[position], encoding))) is not None
+    ]
+
+    starts = starts[regular]
+    fields = {field: np.char.strip(_gather(buffer, starts, *columns).view(f"S{columns[1] - columns[0]}").ravel()) for field, columns in STATION_FIELDS.items()}
+    records = np.zeros(len(starts), dtype=STATION_DTYPE)
+    try:
+        records["latitude"] = fields["latitude"].astype(np.float64)
+        records["longitude"] = fields["longitude"].astype(np.float64)
+        missing_elevation = fields["elevation"] == b""
+        records["elevation"] = np.where(missing_elevation, b"nan", fields["elevation"]).astype(np.float64)
+    except ValueError:
+        return _parse_station_lines(block.decode(encoding).splitlines())  # Ungültige Zahl: Zeilen einzeln parsen
+    records["id"] = fields["id"]
+    records["state"] = fields["state"]
+    records["name"] = fields["name"]
+
+    if not irregular:
+        return records
+    positions = np.concatenate((line_numbers[regular], [position for position, _ in irregular]))
+    records = np.concatenate((records, to_records([entry for _, entry in irregular])))
+    return records[np.argsort(positions, kind="stable")]
+
+# Inventardaten blockweise mit den Stationen verknüpfen
+def join_inventory(records, chunks, encoding="utf-8", block_size=BLOCK_SIZE):
+    """
+    Sets the first and last TMAX/TMIN years of the stations from ghcnd-inventory.txt.
+
+    The element column is checked first; only TMAX/TMIN lines have their
+    station ID and years decoded. Lines are joined to the stations by the
+    index of their ID in a sorted ID array. Like parse_inventory_data, the
+    first year of a station is the latest first year and the last year the
+    earliest last year of its elements; stations without both are dropped.
+
+    Args:
+        records (numpy.ndarray): Station records as returned by parse_stations.
+        chunks (iterable): File content as chunks of bytes, e.g. a streaming response, [bytes] or [mmap].
+        encoding (str): Encoding used for lines that are parsed one by one.
+        block_size (int): Minimum number of bytes parsed at once.
+
+    Returns:
+        numpy.ndarray: Read-only station records with first and last year.
+    """
+    order = np.argsort(records["id"], kind="stable")
+    sorted_ids = records["id"][order]
+    first_years = np.zeros(len(records), dtype=np.int64)
+    last_years = np.full(len(records), np.iinfo(np.int64).max)
+
+    for block in iter_line_blocks(chunks, block_size):
+        ids, block_first_years, block_last_years = parse_inventory_block(block, encoding)
+        positions = np.minimum(np.searchsorted(sorted_ids, ids), max(len(sorted_ids) - 1, 0))
+        found = sorted_ids[positions] == ids if len(sorted_ids) else np.zeros(len(ids), dtype=bool)
+        indices = order[positions[found]]
+        np.maximum.at(first_years, indices, block_first_years[found])
+        np.minimum.at(last_years, indices, block_last_years[found])
+
+    has_years = (first_years > 0) & (last_years < np.iinfo(np.int64).max)
+    result = records[has_years].copy()
+    result["mindate"] = first_years[has_years]
+    result["maxdate"] = last_years[has_years]
+    result.flags.writeable = False
+    return result
+
+# Block der Inventardaten vektorisiert parsen
+def parse_inventory_block(block, encoding="utf-8"):
+    """
+    Extracts the TMAX/TMIN lines with first and last year from a block of ghcnd-inventory.txt.
+
+    Args:
+        block (bytes): Complete lines of the inventory data.
+        encoding (str): Encoding used for lines that are parsed one by one.
+
+    Returns:
+        tuple: (station IDs as S11, first years, last years) of the matching lines.
+    """
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    if _needs_line_parser(buffer):
+        return _inventory_columns([entry for line in block.decode(encoding).splitlines() if (entry := parse_inventory_entry(line))])
+
+    starts, ends = _line_bounds(buffer)
+    starts = starts[ends - starts >= MIN_INVENTORY_LINE]
+
+    # Element zuerst prüfen; alle anderen Zeilen werden nicht weiter dekodiert
+    elements = _gather(buffer, starts, *INVENTORY_FIELDS["element"]).view(np.uint32).ravel()
+    starts = starts[(elements == ELEMENT_CODES[0]) | (elements == ELEMENT_CODES[1])]
+
+    ids = _gather(buffer, starts, *INVENTORY_FIELDS["id"])
+    years = np.concatenate((_gather(buffer, starts, *INVENTORY_FIELDS["first_year"]), _gather(buffer, starts, *INVENTORY_FIELDS["last_year"])), axis=1)
+    digits = years.astype(np.int16) - ZERO
+    regular = ((ids != SPACE) & (ids != TAB)).all(axis=1) & ((digits >= 0) & (digits <= 9)).all(axis=1)
+
+    # Jahre mit Leerzeichen oder IDs mit Leerraum einzeln parsen
+    irregular = [entry for start in starts[~regular].tolist() if (entry := parse_inventory_entry(_line(block, buffer, start, encoding)))]
+
+    powers = 10 ** np.arange(3, -1, -1)
+    first_years = digits[regular, :4] @ powers
+    last_years = digits[regular, 4:] @ powers
+    valid = (first_years > 0) & (last_years > 0)
+    ids = ids[regular][valid].view("S11").ravel()
+    irregular_ids, irregular_first, irregular_last = _inventory_columns(irregular)
+    return (
+        np.concatenate((ids, irregular_ids)),
+        np.concatenate((first_years[valid], irregular_first)),
+        np.concatenate((last_years[valid], irregular_last)),
+    )
+
+
+def _parse_station_lines(lines):
+    return to_records([entry for line in lines if (entry := parse_station_entry(line)) is not None])
+
+def _inventory_columns(entries):
+    return (
+        np.array([station_id.encode("ascii", "replace") for station_id, _, _ in entries], dtype="S11"),
+        np.array([first_year for _, first_year, _ in entries], dtype=np.int64),
+        np.array([last_year for _, _, last_year in entries], dtype=np.int64),
+    )
+
+def _needs_line_parser(buffer):
+    # Steuerzeichen und Nicht-ASCII-Zeichen trennen bzw. kürzen Zeilen anders als Bytes
+    return bool(((buffer < SPACE) & (buffer != NEWLINE) & (buffer != TAB)).any() or (buffer >= 0x80).any())
+
+def _line_bounds(buffer):
+    newlines = np.flatnonzero(buffer == NEWLINE)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(buffer)]))
+    return starts, ends
+
+def _gather(buffer, starts, first, last):
+    return buffer[starts[:, None] + np.arange(first, last)]
+
+def _line(block, buffer, start, encoding):
+    end = block.find(b"\n", start)
+    return block[start:end if end >= 0 else len(block)].decode(encoding)
@@ -1,13 +1,45 @@
 from business import (
     haversine, get_stations_within_radius, parse_station_data, 
-    calculate_averages, parse_inventory_data, parse_stations_data
+    calculate_averages, parse_inventory_data, parse_stations_data,
+    get_station_data, iter_station_data, update_stations
 )
 from external import (
-    fetch_url, STATIONS_URL_AWS, read_data, write_data
+    fetch_url, STATIONS_URL_AWS, read_data, write_data, read_catalog, write_catalog, fetch_station_data
 )
+from file_cache import StationFileCache
+from aggregates import MonthlyAggregates
+from station_archive import StationArchive
+from station_columns import iter_station_columns, parse_station_block, parse_dly_block
+from station_list import parse_stations, join_inventory
+from catalog import StationCatalog, StationColumns, to_records
+from spatial import StationGrid, haversine_vector
+from response_cache import ResponseCache
+from single_flight import SingleFlight, AsyncSingleFlight
+from http_client import HttpClient
+from prewarm import StationPopularity, Prewarmer, parse_regions, PREWARM_REGION_LIMIT
+from metrics import RequestMetrics, SlowRequestProfiler
+from regional import get_region_data
+from local_mirror import LocalMirror
+from flask import Flask
+from controller import init_routes, start_inventory_updates
 import requests
+import hashlib
 import json
+import pstats
+import re
+import os
+import threading
+import datetime
+import asyncio
+import gzip
+import time
+import http.server
+import numpy as np
+import msgpack
+import brotli
+import pytest
 from unittest.mock import patch, mock_open
+from concurrent.futures import ThreadPoolExecutor
 
 def test_parse_stations_data():
     stations = """ACW00011604  17.1167  -61.7833   10.1    ST JOHNS COOLIDGE FLD                       
@@ -42,6 +74,30 @@ AEM00041194  25.2550   55.3640 TAVG 1983 2025
     assert result[0]["maxdate"] == 2025
 
 
+def test_station_list_parser_matches_line_parser():
+    stations = (
+        "GME00129634  48.0458    8.4617  720.0    VILLINGEN-SCHWENNINGEN                  10929\n"
+        "ACW00011604  17.1167  -61.7833          ST ST JOHNS COOLIDGE FLD                       \n"
+        "AE000041196  25.3330   55.5170   nan    SHARJAH INTER. AIRP            GSN     41196\n"
+        "BAD00000001  xx.0000   55.5170   34.0    INVALID LATITUDE                              \n"
+        "SHORT\n"
+        "GME00129634  48.0458    8.4617  721.0    VILLINGEN DUPLICATE                     10929\n"
+        "AEM00041194  25.2550   55.3640   10.4    DUBAI INTL                             41194\n"
+    )
+    inventory = (
+        "GME00129634  48.0458    8.4617 TMAX 1947 2025\nGME00129634  48.0458    8.4617 TMIN 1950 2020\n"
+        "ACW00011604  17.1167  -61.7833 TMAX  194 2025\nACW00011604  17.1167  -61.7833 PRCP 1900 2025\n"
+        "AE000041196  25.3330   55.5170 TMIN 0000 2025\nAEM00041194  25.2550   55.3640 TMAX 1983 2025\n"
+        "UNKNOWN0001  25.2550   55.3640 TMAX 1983 2025\n"
+    )
+    for block_size in (64, 1024):
+        for encoded in (stations.encode(), stations.replace("DUBAI", "DÜBAI").encode("latin-1")):
+            records = join_inventory(parse_stations([encoded], "latin-1", block_size), [inventory.encode()], "latin-1", block_size)
+            expected = to_records(parse_inventory_data(inventory, parse_stations_data(encoded.decode("latin-1"))))
+            assert all(np.array_equal(records[field], expected[field], equal_nan=records.dtype[field].kind == "f") for field in records.dtype.names)
+            assert [record["id"] for record in records] == [b"GME00129634", b"ACW00011604", b"AEM00041194"]
+
+
 def test_get_stations_within_radius():
     # Test: Stationen im Umkreis von Villingen-Schwenningen und korrektem Jahr
     result  = get_stations_within_radius(48.0528, 8.4858, 100, 10, 1990, 2024)
@@ -70,6 +126,50 @@ def test_get_stations_within_radius():
     assert len(get_stations_within_radius(48.0528, 8.4858, 40.030, 0, 1900, 2023)) == len(([], 200)) # Limit 0
 
 
+def test_station_grid_cells_by_distance():
+    rng = np.random.default_rng(0)
+    latitudes = rng.uniform(-90, 90, 2000)
+    longitudes = rng.uniform(-180, 180, 2000)
+    grid = StationGrid(latitudes, longitudes)
+
+    for lat, lon in [(48.0528, 8.4858), (-89.0, 170.0), (10.0, 179.9)]:
+        groups = list(grid.cells_by_distance(lat, lon, 5000))
+        bounds = [bound for bound, _ in groups]
+        assert bounds == sorted(bounds)
+        for bound, indices in groups:
+            assert bound <= haversine_vector(lat, lon, latitudes[indices], longitudes[indices]).min() + 1e-6
+
+        # Jede Station innerhalb des Radius wird genau einmal geliefert
+        visited = np.concatenate([indices for _, indices in groups])
+        within = np.flatnonzero(haversine_vector(lat, lon, latitudes, longitudes) <= 5000)
+        assert len(visited) == len(np.unique(visited))
+        assert set(within.tolist()) <= set(visited.tolist())
+
+    stations = [
+        {"id": "A", "latitude": 48.0458, "longitude": 8.4617},
+        {"id": "B", "latitude": 49.4544, "longitude": 8.41},
+        {"id": "C", "latitude": 10.0, "longitude": 179.9},
+        {"id": "D", "latitude": 10.0, "longitude": -179.9},
+        {"id": "E", "latitude": 89.9, "longitude": -120.0},
+        {"id": "F"},
+    ]
+    columns = StationColumns(to_records(stations))
+    grid = StationGrid(columns.latitudes, columns.longitudes)
+    visited = lambda lat, lon, radius: sorted(index for _, indices in grid.cells_by_distance(lat, lon, radius) for index in indices.tolist())
+    assert visited(48.0528, 8.4858, 10) == [0]
+    assert visited(48.0528, 8.4858, 200) == [0, 1]
+    assert visited(10.0, 180.0, 50) == [2, 3]  # Über die Datumsgrenze hinweg
+    assert 4 in visited(89.5, 60.0, 100)  # Suchkreis enthält den Nordpol
+    assert visited(48.0528, 8.4858, -1) == []
+
+
+def test_haversine_vector():
+    latitudes = np.array([0, 0, 51.5074, -90])
+    longitudes = np.array([0, 1, -0.1278, 0])
+    expected = [haversine(0, 0, 0, 0), haversine(0, 0, 0, 1), haversine(0, 0, 51.5074, -0.1278), haversine(0, 0, -90, 0)]
+    assert np.allclose(haversine_vector(0, 0, latitudes, longitudes), expected, rtol=0, atol=1e-6)
+
+
 def test_haversine():
     assert round(haversine(0, 0, 0, 0), 2) == 0.0
     assert round(haversine(0, 0, 0, 1), 2) == 111.19
@@ -207,6 +307,92 @@ def test_calculate_averages():
     assert result_2000_2001 == expected_result_2000_2001
     assert result_2001 == expected_result_2001
 
+# Test: Monatssummen liefern dasselbe Ergebnis wie calculate_averages()
+def test_monthly_aggregates_match_calculate_averages():
+    sample_data = {"results": [
+        {"date": f"{year}{month:02d}{day:02d}", "datatype": datatype, "value": (year - 1999) * month * day - 60 if datatype == "TMAX" else month * 7 - day}
+        for year in (1999, 2000, 2001) for month in range(1, 13) for day in (3, 17) for datatype in ("TMAX", "TMIN")
+        if not (datatype == "TMIN" and month in (7, 8, 9))  # Fehlende Werte für Jahreszeiten ohne TMIN
+    ]}
+    aggregates = MonthlyAggregates.from_results(sample_data)
+    for start_year, end_year in ((2000, 2001), (2001, 2001), (1999, 2001)):
+        assert aggregates.averages(start_year, end_year) == calculate_averages(sample_data, start_year, end_year)
+
+
+# Test StationCatalog
+def test_station_catalog_migrates_json_and_reloads(tmp_path):
+    json_path = tmp_path / "stations.json"
+    npy_path = tmp_path / "stations.npy"
+    json_path.write_text(json.dumps({"last_update": "2024-01-01", "stations": [{"id": "A", "latitude": 1.0, "longitude": 2.0}]}))
+    catalog = StationCatalog(str(npy_path), str(json_path))
+
+    first = catalog.snapshot()
+    assert npy_path.exists()  # Einmalige Migration der JSON-Datei
+    assert first.records["id"].tolist() == [b"A"]
+    assert first.last_update == "2024-01-01"
+    assert catalog.snapshot() is first  # Kein erneutes Laden ohne Änderung
+
+    write_catalog(to_records([{"id": "B"}]), "2025-01-01", str(npy_path))
+    os.utime(npy_path, ns=(first.mtime + 10**9, first.mtime + 10**9))
+    assert catalog.snapshot().records["id"].tolist() == [b"B"]
+    assert catalog.last_update == "2025-01-01"
+    assert catalog.generation == first.generation + 1
+
+def test_station_catalog_keeps_snapshot_on_invalid_file(tmp_path):
+    npy_path = tmp_path / "stations.npy"
+    write_catalog(to_records([{"id": "A"}]), "2024-01-01", str(npy_path))
+    catalog = StationCatalog(str(npy_path), str(tmp_path / "stations.json"))
+    first = catalog.snapshot()
+
+    (tmp_path / "invalid.npy").write_bytes(b"invalid")
+    os.replace(tmp_path / "invalid.npy", npy_path)  # Katalogdateien werden nur ersetzt, nie überschrieben
+    os.utime(npy_path, ns=(first.mtime + 10**9, first.mtime + 10**9))
+    assert catalog.snapshot().records["id"].tolist() == [b"A"]
+
+def test_station_catalog_backs_off_after_failed_load(tmp_path):
+    npy_path = tmp_path / "stations.npy"
+    catalog = StationCatalog(str(npy_path), str(tmp_path / "stations.json"), retry_seconds=60)
+    with patch("catalog.read_catalog", wraps=read_catalog) as read:
+        assert len(catalog.snapshot()) == 0
+        assert len(catalog.snapshot()) == 0
+        assert read.call_count == 1  # Fehlende Datei nicht bei jedem Zugriff erneut laden
+
+        write_catalog(to_records([{"id": "A"}]), "2024-01-01", str(npy_path))
+        assert len(catalog.snapshot()) == 0  # Noch in der Wartezeit
+        assert len(catalog.reload()) == 1  # Ausdrückliches Neuladen wartet nicht
+        assert catalog.snapshot().records["id"].tolist() == [b"A"]
+
+def test_catalog_snapshot_records_are_immutable(tmp_path):
+    station = {"id": "GME00129634", "latitude": 48.0458, "longitude": 8.4617, "elevation": 720.0, "state": None, "name": "VILLINGEN-SCHWENNINGEN", "mindate": 1947, "maxdate": 2025}
+    npy_path = tmp_path / "stations.npy"
+    write_catalog(to_records([station]), "2024-01-01", str(npy_path))
+    snapshot = StationCatalog(str(npy_path), str(tmp_path / "stations.json")).snapshot()
+
+    assert snapshot.station(0, 1.5) == {**station, "distance": 1.5}
+    assert not snapshot.records.flags.writeable
+    assert "distance" not in snapshot.records.dtype.names
+
+
+# Test read_catalog() / write_catalog()
+def test_write_and_read_catalog(tmp_path):
+    npy_path = tmp_path / "stations.npy"
+    records = to_records([{"id": "A", "latitude": 1.5, "longitude": -2.5, "elevation": None, "mindate": 1950, "maxdate": 2020}])
+    write_catalog(records, "2024-01-01", str(npy_path))
+
+    result, last_update, columns = read_catalog(str(npy_path))
+    assert isinstance(result, np.memmap)
+    assert isinstance(columns["latitude"], np.memmap) and columns["latitude"].flags.c_contiguous
+    assert columns["latitude"].tolist() == [1.5] and columns["id"].tolist() == [b"A"]
+    assert (npy_path.stat().st_mode & 0o777) == 0o644
+    assert result["id"].tolist() == [b"A"]
+    assert result["latitude"].tolist() == [1.5]
+    assert np.isnan(result["elevation"][0])
+    assert result["maxdate"].tolist() == [2020]
+    assert last_update == "2024-01-01"
+    assert read_catalog(str(tmp_path / "missing.npy")) is None
+
+    np.save(npy_path, records)  # Älteres Format nur mit Datensätzen
+    assert read_catalog(str(npy_path))[2] is None
 
 
 # Test read_data()
@@ -235,7 +421,7 @@ def test_write_data():
 
 
 # Test fetch_url()
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_fetch_url_success(mock_get):
     mock_response = requests.Response()
     mock_response.status_code = 200
@@ -247,13 +433,844 @@ def test_fetch_url_success(mock_get):
     assert response.status_code == 200
     assert response.content == b"mock content"
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_fetch_url_failure(mock_get):
     mock_get.side_effect = requests.RequestException("Network error")
     response = fetch_url("http://example.com", "test data")
     assert response == ({"message": "Error fetching test data: Network error"}, 500)
 
 
+# Lokaler HTTP-Server als Ersatz für den NOAA-Bucket
+STATION_CSV = b"ID,DATE,ELEMENT,DATA_VALUE,M_FLAG,Q_FLAG,S_FLAG,OBS_TIME\nIV000005555,19450101,TMAX,334,,,I,\nIV000005555,19450101,PRCP,0,,,I,\nIV000005555,19451201,TMAX,100,,,I,\n"
+
+class StationHandler(http.server.BaseHTTPRequestHandler):
+    statuses = []
+    failures = 0  # Anzahl der folgenden Anfragen, die mit 503 beantwortet werden
+    files = {}  # Weitere Dateien nach Pfad
+    appended = b""  # An STATION_CSV angehängte Zeilen (neue Version "v2")
+    not_found = False  # Stationsdateien mit 404 beantworten
+
+    def do_GET(self):
+        if StationHandler.not_found:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path in StationHandler.files:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(StationHandler.files[self.path])))
+            self.end_headers()
+            self.wfile.write(StationHandler.files[self.path])
+            return
+        if StationHandler.failures > 0:
+            StationHandler.failures -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/gzip/") and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(STATION_CSV)
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        body = STATION_CSV + StationHandler.appended
+        etag = '"v2"' if StationHandler.appended else '"v1"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        byte_range = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if byte_range:
+            start = int(byte_range.group(1))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+            body = body[start:]
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_response(self, code, message=None):
+        StationHandler.statuses.append(code)
+        super().send_response(code, message)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def station_server():
+    StationHandler.statuses = []
+    StationHandler.failures = 0
+    StationHandler.files = {}
+    StationHandler.appended = b""
+    StationHandler.not_found = False
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StationHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+# Test HttpClient gegen den lokalen Server
+def test_http_client_retries_server_errors(station_server):
+    client = HttpClient(retries=2, backoff=0)
+    StationHandler.failures = 2
+    response = client.get(f"{station_server}/IV000005555.csv")
+    assert response.status_code == 200 and response.content == STATION_CSV
+    assert StationHandler.statuses == [503, 503, 200]
+    assert client.stats()["requests"] == 1 and client.stats()["failures"] == 0
+
+    StationHandler.failures = 3
+    with patch("external.http_client", client):
+        response = fetch_url(f"{station_server}/IV000005555.csv", "test data")
+    assert response[1] == 500
+    assert client.stats()["requests"] == 2 and client.stats()["failures"] == 1
+    client.close()
+
+def test_http_client_decodes_gzip(station_server):
+    client = HttpClient(retries=0)
+    response = client.get(f"{station_server}/gzip/IV000005555.csv", stream=True)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert b"".join(response.iter_content(16)) == STATION_CSV
+    response.close()
+    client.close()
+
+# Test update_stations() mit gestreamten Stations- und Inventardateien
+def test_update_stations_streams_catalog(station_server, tmp_path):
+    StationHandler.files = {
+        "/ghcnd-stations.txt": b"GME00129634  48.0458    8.4617  720.0    VILLINGEN-SCHWENNINGEN                  10929\n"
+                                b"ACW00011604  17.1167  -61.7833   10.1    ST JOHNS COOLIDGE FLD                       \n",
+        "/ghcnd-inventory.txt": b"GME00129634  48.0458    8.4617 TMAX 1947 2025\nGME00129634  48.0458    8.4617 TMIN 1947 2025\n",
+    }
+    catalog = StationCatalog(str(tmp_path / "stations.npy"), str(tmp_path / "stations.json"))
+    with patch("external.STATIONS_URL_AWS", f"{station_server}/ghcnd-stations.txt"), patch("external.INVENTORY_URL_AWS", f"{station_server}/ghcnd-inventory.txt"):
+        with patch("business.station_catalog", catalog):
+            assert update_stations() is True
+            assert update_stations() is False  # Innerhalb des Aktualisierungsintervalls
+            assert update_stations(refresh_days=0) is True
+
+    snapshot = catalog.snapshot()
+    assert len(snapshot) == 1
+    assert snapshot.station(0)["name"] == "VILLINGEN-SCHWENNINGEN"
+    assert (snapshot.station(0)["mindate"], snapshot.station(0)["maxdate"]) == (1947, 2025)
+    assert catalog.last_update == datetime.date.today().strftime("%Y-%m-%d")
+
+    # Ohne Jahresfilter zählt jede Station mit Temperaturdaten
+    with patch("business.station_catalog", catalog):
+        assert [station["id"] for station in get_stations_within_radius(48.0528, 8.4858, 10, 5, None, None)[0]] == ["GME00129634"]
+        assert get_stations_within_radius(48.0528, 8.4858, 10, 5, 1900, None) == ([], 200)
+
+# Test fetch_station_data() mit Dateicache
+def test_fetch_station_data_revalidates_cache(station_server, tmp_path):
+    cache = StationFileCache(str(tmp_path), 1024)
+    with patch("external.DATA_URL_AWS", station_server), patch("external.station_file_cache", cache):
+        assert fetch_station_data("IV000005555").content == STATION_CSV
+        assert fetch_station_data("IV000005555").text == STATION_CSV.decode()
+
+    assert StationHandler.statuses == [200, 304]
+    assert (tmp_path / "IV000005555.csv").read_bytes() == STATION_CSV
+
+def test_fetch_station_data_serves_cache_when_offline(tmp_path):
+    cache = StationFileCache(str(tmp_path), 1024)
+    cache.put("IV000005555", [STATION_CSV], {"ETag": '"v1"'}).close()
+    with patch("external.DATA_URL_AWS", "http://127.0.0.1:9"), patch("external.http_client", HttpClient(retries=0)):
+        with patch("external.station_file_cache", cache):
+            assert fetch_station_data("IV000005555").content == STATION_CSV
+
+def test_fetch_station_data_serves_cache_only_on_transient_errors(station_server, tmp_path):
+    cache = StationFileCache(str(tmp_path), 1024)
+    cache.put("IV000005555", [STATION_CSV], {"ETag": '"v0"'}).close()
+    with patch("external.DATA_URL_AWS", station_server), patch("external.http_client", HttpClient(retries=0)):
+        with patch("external.station_file_cache", cache):
+            StationHandler.failures = 1
+            assert fetch_station_data("IV000005555").content == STATION_CSV  # Serverfehler: Kopie aus dem Cache
+
+            StationHandler.not_found = True
+            result = fetch_station_data("IV000005555")
+    assert result == ({"message": "Error fetching station data: 404 Not Found"}, 500)
+    assert StationHandler.statuses == [503, 404]
+
+@pytest.mark.parametrize("max_bytes", [0, 1024])
+def test_get_station_data_streams_station_file(station_server, tmp_path, max_bytes):
+    with patch("external.DATA_URL_AWS", station_server), patch("external.station_file_cache", StationFileCache(str(tmp_path), max_bytes)):
+        with patch("business.station_archive", StationArchive(str(tmp_path / "archive"))):
+            result = get_station_data("IV000005555", 1945, 1945)
+    assert result == ([{
+        "year": 1945, "tmax": 33.4, "tmin": None,
+        "spring_tmax": None, "spring_tmin": None, "summer_tmax": None, "summer_tmin": None,
+        "fall_tmax": None, "fall_tmin": None, "winter_tmax": 33.4, "winter_tmin": None
+    }], 200)
+
+# Test des inkrementellen Archivs: nur neue Bytes übertragen und parsen
+def test_station_archive_appends_new_days(station_server, tmp_path):
+    cache = StationFileCache(str(tmp_path), 1024)
+    archive = StationArchive(str(tmp_path / "archive"))
+    with patch("external.DATA_URL_AWS", station_server), patch("external.station_file_cache", cache), patch("business.station_archive", archive):
+        get_station_data("IV000005555", 1945, 1945)
+        first = archive.meta("IV000005555")
+
+        StationHandler.appended = b"IV000005555,19460101,TMIN,-50,,,I,\nIV000005555,19560701,TMAX,300,,,I,\n"
+        result = get_station_data("IV000005555", 1945, 1956)
+
+    assert StationHandler.statuses == [200, 206]
+    meta = archive.meta("IV000005555")
+    assert meta["version"] == '"v2"' and meta["size"] == len(STATION_CSV + StationHandler.appended)
+    assert sorted(meta["files"]) == ["1940", "1950"] and meta["files"]["1940"] != first["files"]["1940"]
+    assert not os.path.exists(tmp_path / "archive" / "IV000005555" / first["files"]["1940"])  # Ersetzte Partition entfernt
+
+    expected = calculate_averages(parse_station_data((STATION_CSV + StationHandler.appended).decode(), 1944, 1956), 1945, 1956)
+    assert result == (expected, 200)
+    # Fenster liest nur die Jahrzehnte 1940 und 1950
+    assert [dates.tolist() for dates, _, _ in archive.read("IV000005555", 1950, 1951)] == [[19560701]]
+
+def test_station_archive_survives_concurrent_replacement(tmp_path):
+    archive = StationArchive(str(tmp_path / "archive"))
+    column = lambda date: (np.array([date], dtype=np.int32), np.array([0], dtype=np.int8), np.array([1], dtype=np.int32))
+    stale = archive.replace("X", [column(19450101)], "v1")
+    archive.replace("X", [column(19460101)], "v2")
+
+    # Beschreibung vor dem Ersetzen gelesen: Partition fehlt, neue Beschreibung wird gelesen
+    metas = iter([stale])
+    with patch.object(archive, "meta", lambda station_id: next(metas, None) or StationArchive.meta(archive, station_id)):
+        assert [dates.tolist() for dates, _, _ in archive.read("X", 1940, 1949)] == [[19460101]]
+
+    threads = [threading.Thread(target=archive.replace, args=("X", [column(19450101 + i)], f"v{i}")) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Keine verwaisten Partitionen trotz gleichzeitiger Aktualisierungen
+    names = {name for name in os.listdir(tmp_path / "archive" / "X") if name.endswith(".npy")}
+    assert names == set(archive.meta("X")["files"].values())
+    # Partitionen und Beschreibung sind für alle lesbar
+    for name in names | {"meta.json"}:
+        assert os.stat(tmp_path / "archive" / "X" / name).st_mode & 0o777 == 0o644
+
+def test_station_archive_evicts_least_recently_used(tmp_path):
+    archive = StationArchive(str(tmp_path / "archive"), 0)
+    column = (np.array([19450101], dtype=np.int32), np.array([0], dtype=np.int8), np.array([1], dtype=np.int32))
+    for station_id in ("A", "B"):
+        archive.replace(station_id, [column], "v1")
+    size = sum(entry.stat().st_size for entry in os.scandir(tmp_path / "archive" / "A"))
+    os.utime(tmp_path / "archive" / "A" / "meta.json", (1000, 1000))
+    os.utime(tmp_path / "archive" / "B" / "meta.json", (2000, 2000))
+    assert len(list(archive.read("A", 1940, 1949))) == 1  # A zuletzt gelesen
+
+    # Dritte Station überschreitet das Limit: B wurde am längsten nicht verwendet
+    archive.max_bytes = int(size * 2.5)
+    archive.replace("C", [column], "v1")
+    assert archive.meta("B") is None and list(archive.read("B", 1940, 1949)) == []
+    assert archive.meta("A") is not None and archive.meta("C") is not None
+    assert os.listdir(tmp_path / "archive" / "B") == [".lock"]
+
+def test_parse_dly_block_drops_malformed_values():
+    days = [b"  -12", b"  --5", b"-9999", b"  150", b"    -", b"  1-2"] + [b"-9999"] * 25
+    line = b"GME00129634200001TMAX" + b"".join(day + b"   " for day in days)
+    other = b"GME00129634200001PRCP" + b"    1   " * 31
+    dates, elements, values = parse_dly_block(line + b"\n" + other + b"\n")
+    assert dates.tolist() == [20000101, 20000104]
+    assert elements.tolist() == [0, 0] and values.tolist() == [-12, 150]
+
+def test_iter_station_data_filters_rows():
+    lines = [b"ID,DATE,ELEMENT,DATA_VALUE", b"X,19440101,TMAX,1", b"X,19450101,PRCP,2", b"X,19450101,TMIN,NA", b"X,19450102,TMAX,3"]
+    assert list(iter_station_data(iter(lines), 1945, 1945)) == [
+        {"date": "19450101", "datatype": "TMIN", "value": None},
+        {"date": "19450102", "datatype": "TMAX", "value": 3},
+    ]
+
+def test_station_columns_match_line_parser():
+    lines = [
+        "ID,DATE,ELEMENT,DATA_VALUE,M_FLAG,Q_FLAG,S_FLAG,OBS_TIME",
+        "USW00094728,19441231,TMAX,-12,,,7,",
+        "USW00094728,19450101,TMIN,NA,,,7,",
+        "USW00094728,19450101,PRCP,5,,,7,",
+        "USW00094728,19450102,TMAX,215,,,7,",
+        "USW00094728,19450230,TMIN,3,,,7,",
+        "X,19450103,TMIN,7",
+        "USW00094728,19460101,TMAX,9\r",
+    ]
+    text = "\n".join(lines) + "\n"
+    expected = MonthlyAggregates.from_results(parse_station_data(text, 1944, 1946))
+    for block_size in (1, 1024):
+        chunks = [text[i:i + 16].encode() for i in range(0, len(text), 16)]
+        aggregates = MonthlyAggregates.from_columns(iter_station_columns(chunks, 1944, 1946, block_size))
+        assert aggregates.first_year == expected.first_year
+        assert np.array_equal(aggregates.sums, expected.sums)
+        assert np.array_equal(aggregates.counts, expected.counts)
+
+    dates, elements, values = parse_station_block(b"USW00094728,19450102,TMAX,215,,,7,\nUSW00094728,19450102,SNOW,1,,,7,", 1945, 1945)
+    assert dates.tolist() == [19450102] and elements.tolist() == [0] and values.tolist() == [215]
+
+def test_station_file_cache_evicts_least_recently_used(tmp_path):
+    cache = StationFileCache(str(tmp_path), 25)
+    cache.put("A", [b"a" * 10], {}).close()
+    cache.put("B", [b"b" * 10], {}).close()
+    os.utime(tmp_path / "A.csv", ns=(1, 1))
+    os.utime(tmp_path / "B.csv", ns=(2, 2))
+    assert cache.get("A").content == b"a" * 10  # Zugriff macht A zum zuletzt genutzten Eintrag
+
+    cache.put("C", [b"c" * 10], {}).close()
+    assert cache.get("B") is None
+    assert cache.get("A").content == b"a" * 10
+    assert cache.get("C").content == b"c" * 10
+    assert cache.get("../A") is None
+
+def test_station_file_cache_rejects_oversized_body_without_length(tmp_path):
+    cache = StationFileCache(str(tmp_path), 25)
+    cache.put("A", [b"a" * 10], {}).close()
+    assert cache.put("B", [b"b" * 20, b"b" * 20], {}) is None  # Chunked, ohne Content-Length
+    assert not cache.accepts("B", {"Content-Length": "26"})
+    assert cache.get("A").content == b"a" * 10
+    assert sorted(os.listdir(tmp_path)) == ["A.csv", "A.json"]
+
+
+def test_station_file_cache_verifies_appended_files(tmp_path):
+    cache = StationFileCache(str(tmp_path), 40, full_download_seconds=60)
+    cached = cache.put("A", [b"a" * 10], {"ETag": '"v1"'})
+    assert cached.verified is not None and cache.range_headers(cached)["Range"] == "bytes=0-"
+
+    # MD5-ETag: die vollständige ergänzte Datei wird geprüft
+    assert cache.append("A", cache.get("A"), [b"a" * 10 + b"b" * 5], {"Content-Range": "bytes 0-14/15", "ETag": '"' + "0" * 32 + '"'}) is None
+    md5 = hashlib.md5(b"a" * 10 + b"b" * 5).hexdigest()
+    appended = cache.append("A", cache.get("A"), [b"a" * 10 + b"b" * 5], {"Content-Range": "bytes 0-14/15", "ETag": f'"{md5}"'})
+    assert appended.content == b"a" * 10 + b"b" * 5
+
+    # Größer als der Cache: Eintrag bleibt unverändert
+    assert cache.append("A", cache.get("A"), [b"a" * 10 + b"b" * 5 + b"c" * 30], {"Content-Range": "bytes 0-44/45"}) is None
+    assert cache.get("A").content == b"a" * 10 + b"b" * 5
+
+    # Letzte vollständige Prüfung zu alt: ohne Range erneut vollständig abrufen
+    cached = cache.get("A")
+    cached.verified -= 61
+    assert "Range" not in cache.range_headers(cached) and cache.range_headers(cached)["If-None-Match"] == f'"{md5}"'
+    cached.close()
+
+def test_station_file_cache_writes_async_streams_in_thread(tmp_path):
+    cache = StationFileCache(str(tmp_path), 25)
+    threads = set()
+
+    async def chunks(*parts):
+        for part in parts:
+            yield part
+
+    def write(path, chunks, max_bytes=None, md5=None):
+        threads.add(threading.current_thread())
+        return StationFileCache._write(cache, path, chunks, max_bytes, md5)
+
+    async def main():
+        with patch.object(cache, "_write", write):
+            stored = await cache.put_async("A", chunks(b"a" * 5, b"a" * 5), {})
+            appended = await cache.append_async("A", stored, chunks(b"a" * 10, b"b" * 5), {"Content-Range": "bytes 0-14/15"})
+            oversized = await cache.put_async("B", chunks(b"b" * 20, b"b" * 20), {})
+        return appended, oversized
+
+    appended, oversized = asyncio.run(main())
+    assert appended.content == b"a" * 10 + b"b" * 5 and oversized is None
+    assert threading.main_thread() not in threads  # Schreiben außerhalb der Ereignisschleife
+
+def test_response_cache_serves_repeats_with_etag():
+    app = Flask(__name__)
+    init_routes(app)
+    client = app.test_client()
+    calls = []
+
+    def station_data(station_id, start_year, end_year):
+        calls.append(station_id)
+        return [{"year": start_year}], 200
+
+    with patch("controller.response_cache", ResponseCache()) as cache, patch("controller.get_station_data", station_data):
+        first = client.get("/station-data/X/2000/2001")
+        second = client.get("/station-data/X/2000/2001")
+        assert first.get_json() == second.get_json() == [{"year": 2000}]
+        assert calls == ["X"]
+        assert first.headers["ETag"] == second.headers["ETag"]
+        assert "max-age" in first.headers["Cache-Control"]
+
+        not_modified = client.get("/station-data/X/2000/2001", headers={"If-None-Match": first.headers["ETag"]})
+        assert not_modified.status_code == 304
+        assert client.get("/cache-stats").get_json() == {"hits": 2, "misses": 1, "entries": 1, "bytes": len(first.data)}
+
+def test_station_data_columnar_formats_and_compression():
+    app = Flask(__name__)
+    init_routes(app)
+    client = app.test_client()
+    rows = [{"year": year, "tmax": 10.5, "tmin": None} for year in range(1900, 2000)]
+
+    with patch("controller.response_cache", ResponseCache()), patch("controller.get_station_data", lambda *args: (rows, 200)):
+        plain = client.get("/station-data/X/1900/1999", headers={"Accept": "text/html,*/*;q=0.8"})
+        assert plain.mimetype == "application/json" and plain.get_json() == rows
+        assert "Content-Encoding" not in plain.headers
+
+        columnar = client.get("/station-data/X/1900/1999?format=columnar").get_json()
+        assert columnar["year"] == list(range(1900, 2000)) and columnar["tmin"] == [None] * 100
+        assert columnar["spring_tmax"] == [None] * 100  # Fehlende Felder als null
+
+        packed = client.get("/station-data/X/1900/1999", headers={"Accept": "application/msgpack"})
+        assert packed.mimetype == "application/msgpack"
+        assert msgpack.unpackb(packed.data)["tmax"] == [10.5] * 100
+
+        for encoding, decompress in (("gzip", gzip.decompress), ("br", brotli.decompress)):
+            response = client.get("/station-data/X/1900/1999", headers={"Accept-Encoding": encoding})
+            assert response.headers["Content-Encoding"] == encoding
+            assert decompress(response.data) == plain.data
+            assert response.headers["ETag"] != plain.headers["ETag"]
+
+        assert client.get("/station-data/X/1900/1999?format=arrow").status_code == 406
+
+def test_response_cache_evicts_and_expires():
+    cache = ResponseCache(max_bytes=10, ttl=3600)
+    cache.put("a", 1, b"aaaa")
+    cache.put("b", 1, b"bbbb")
+    assert cache.get("a", 1).body == b"aaaa"
+    cache.put("c", 1, b"cccc")
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 2) is None  # Neue Katalog-Generation macht den Eintrag ungültig
+    assert cache.get("c", 1).body == b"cccc"
+
+    cache = ResponseCache(max_bytes=10, ttl=0)
+    cache.put("a", 1, b"aaaa")
+    assert cache.get("a", 1) is None
+
+
+def test_get_station_data_coalesces_concurrent_requests(tmp_path):
+    flight = SingleFlight()
+    archive = StationArchive(str(tmp_path / "archive"))
+    release = threading.Event()
+    calls = []
+
+    def update(station_id):
+        calls.append(station_id)
+        release.wait(5)
+        csv = b"ID,DATE,ELEMENT,DATA_VALUE\nX,20000115,TMAX,100\nX,20010115,TMAX,50\n"
+        cached = StationFileCache(str(tmp_path), 1024).put(station_id, [csv], {"ETag": '"v1"'})
+        try:
+            return archive.update(station_id, cached)
+        finally:
+            cached.close()
+
+    results = []
+    with patch("business.station_flight", flight), patch("business.update_station_archive", update), patch("business.station_archive", archive):
+        threads = [threading.Thread(target=lambda: results.append(get_station_data("X", 2000, 2001))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while flight.in_flight("X") != len(threads) - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        waiting = flight.in_flight("X")
+        release.set()
+        for thread in threads:
+            thread.join(5)
+    assert waiting == len(threads) - 1  # Alle übrigen Anfragen warten auf den laufenden Abruf
+    assert not any(thread.is_alive() for thread in threads)
+
+    assert calls == ["X"]
+    assert len(results) == 4 and all(result == results[0] for result in results)
+    assert results[0][0][0]["winter_tmax"] == 10.0
+
+def test_single_flight_shares_exceptions():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("X", lambda: int("x"))
+    assert flight.in_flight("X") is None
+    assert flight.do("X", lambda: 1) == 1
+
+
+def test_async_single_flight_shares_one_task():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("X", load) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert calls == [1] and not flight.in_flight("X")
+
+# Test der asynchronen Datenschicht gegen den lokalen Server
+def test_async_get_station_data(station_server, tmp_path):
+    pytest.importorskip("httpx")
+    import external_async
+    import business_async
+
+    async def main():
+        client = external_async.AsyncHttpClient(retries=1, backoff=0)
+        with patch("external_async.async_http_client", client):
+            StationHandler.failures = 1
+            results = await asyncio.gather(*(business_async.get_station_data("IV000005555", 1945, 1945) for _ in range(3)))
+        await client.aclose()
+        return results, client.stats()
+
+    with patch("external.DATA_URL_AWS", station_server), patch("external.station_file_cache", StationFileCache(str(tmp_path), 1024)):
+        with patch("business_async.station_archive", StationArchive(str(tmp_path / "archive"))):
+            results, stats = asyncio.run(main())
+
+    assert StationHandler.statuses == [503, 200]
+    assert stats == {**stats, "requests": 1, "failures": 0}
+    assert all(result == results[0] for result in results)
+    assert results[0][0][0]["winter_tmax"] == 33.4
+
+def test_asgi_app_serves_cached_station_data():
+    pytest.importorskip("httpx")
+    pytest.importorskip("asgiref")
+    import asgi
+
+    async def station_data(station_id, start_year, end_year):
+        return [{"year": start_year}], 200
+
+    async def request(path, headers=()):
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        await asgi.app({"type": "http", "method": "GET", "path": path, "headers": list(headers), "query_string": b""}, receive, send)
+        return messages[0]["status"], dict(messages[0]["headers"]), messages[1]["body"]
+
+    with patch("asgi.response_cache", ResponseCache()), patch.object(asgi, "ROUTES", [(*route[:3], station_data) if route[1] == "station-data" else route for route in asgi.ROUTES]):
+        status, headers, body = asyncio.run(request("/station-data/X/2000/2001"))
+        assert status == 200 and json.loads(body) == [{"year": 2000}]
+        status, _, _ = asyncio.run(request("/station-data/X/2000/2001", [(b"if-none-match", headers[b"etag"])]))
+        assert status == 304
+
+
+def test_station_data_batch_endpoint():
+    app = Flask(__name__)
+    init_routes(app)
+    client = app.test_client()
+
+    def station_data(station_id, start_year, end_year):
+        if station_id == "BAD":
+            raise Exception("Error fetching station data")
+        return [{"year": start_year, "station": station_id}], 200
+
+    with patch("business.get_station_data", station_data):
+        response = client.post("/station-data/batch", json={"station_ids": ["A", "BAD", "B", "A"], "start_year": 2000, "end_year": 2001})
+        assert response.get_json() == [
+            {"id": "A", "data": [{"year": 2000, "station": "A"}]},
+            {"id": "BAD", "error": "Error fetching station data"},
+            {"id": "B", "data": [{"year": 2000, "station": "B"}]},
+        ]
+
+        response = client.post("/station-data/batch?format=ndjson", json={"station_ids": ["A", "B"], "start_year": 2000, "end_year": 2001})
+        assert response.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert sorted(line["id"] for line in lines) == ["A", "B"]
+
+        with patch("controller.get_stations_within_radius", return_value=([{"id": "C"}], 200)) as radius_query:
+            response = client.post("/station-data/batch", json={"latitude": 48.0, "longitude": 8.0, "radius": 50, "limit": 5, "start_year": 2000, "end_year": 2001})
+        radius_query.assert_called_once_with(48.0, 8.0, 50.0, 5, 2000, 2001)
+        assert response.get_json() == [{"id": "C", "data": [{"year": 2000, "station": "C"}]}]
+
+    assert client.post("/station-data/batch", json={"station_ids": ["A"]}).status_code == 400
+
+# Test der regionalen Mittel: Zellmittel, Flächengewichte und Prozesspool
+def test_region_data_is_area_weighted(tmp_path):
+    archive = StationArchive(str(tmp_path / "archive"))
+    values = {"A": 100, "B": 200, "C": 300, "D": 100, "E": 200}
+
+    def update(station_id):
+        if station_id not in values:
+            raise Exception("Error fetching station data")
+        # Der Dezember zählt zum Folgejahr, das als unvollständig entfällt
+        csv = f"ID,DATE,ELEMENT,DATA_VALUE\n{station_id},20000115,TMAX,{values[station_id]}\n{station_id},20001215,TMAX,0\n".encode()
+        cached = StationFileCache(str(tmp_path / "cache"), 1024).put(station_id, [csv], {"ETag": '"v1"'})
+        try:
+            return archive.update(station_id, cached)
+        finally:
+            cached.close()
+
+    stations = [
+        {"id": "A", "latitude": 48.1, "longitude": 8.1},
+        {"id": "B", "latitude": 48.2, "longitude": 8.2},  # Gleiche Zelle wie A
+        {"id": "C", "latitude": 0.5, "longitude": 8.1},
+        {"id": "BAD", "latitude": 0.5, "longitude": 8.1},
+    ]
+    north_area = np.sin(np.radians(50)) - np.sin(np.radians(47.5))
+    south_area = np.sin(np.radians(2.5))
+    backfill = ThreadPoolExecutor(max_workers=2)
+    with patch("regional.update_station_archive", update), patch("regional.station_archive", archive), patch("regional.backfill_executor", backfill):
+        with patch("regional._fetch_failures", {}), patch("regional._backfilling", set()):
+            for processes in (0, 2):
+                rows, status = get_region_data(stations, 2000, 2000, 2.5, processes)
+                assert status == 200 and len(rows) == 1
+                assert rows[0]["tmax"] == round((15.0 * north_area + 30.0 * south_area) / (north_area + south_area), 1)
+                assert rows[0]["winter_tmax"] == rows[0]["tmax"] and rows[0]["tmin"] is None
+                assert (rows[0]["stations"], rows[0]["cells"]) == (3, 2)
+
+            # 360 ist kein Vielfaches von 7: die letzte Spalte (177° bis 180°) zählt nur 3/7 einer Zelle
+            narrow = [{"id": "D", "latitude": 0.5, "longitude": 179.0}, {"id": "E", "latitude": 0.5, "longitude": 0.5}]
+            rows, status = get_region_data(narrow, 2000, 2000, 7, 0)
+            assert status == 200 and rows[0]["tmax"] == round((10.0 * 3 + 20.0 * 7) / 10, 1)
+            backfill.shutdown(wait=True)
+
+    with pytest.raises(ValueError):
+        get_region_data(stations, 2000, 2000, 0, 0)
+
+def test_region_data_fetches_cold_stations_in_background(tmp_path):
+    import regional
+    archive = StationArchive(str(tmp_path / "archive"))
+    fetched = []
+
+    def update(station_id):
+        fetched.append(station_id)
+        if station_id == "BAD":
+            raise Exception("Error fetching station data")
+        column = (np.array([20000115, 20001215], dtype=np.int32), np.array([0, 0], dtype=np.int8), np.array([100, 0], dtype=np.int32))
+        return archive.replace(station_id, [column], '"v1"')
+
+    stations = [{"id": station_id, "latitude": 48.0, "longitude": 8.0} for station_id in ("A", "B", "BAD")]
+    backfill = ThreadPoolExecutor(max_workers=2)
+    with patch("regional.update_station_archive", update), patch("regional.station_archive", archive), patch("regional.REGION_MAX_COLD_FETCHES", 2):
+        with patch("regional._fetch_failures", {}), patch("regional._backfilling", set()), patch("regional.backfill_executor", backfill):
+            result, status = get_region_data(stations, 2000, 2000, 2.5, 0)
+            assert status == 202 and result["pending"] == 3
+            deadline = time.monotonic() + 5
+            while regional._backfilling and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert sorted(fetched) == ["A", "B", "BAD"]
+
+            # Archiviert oder zuletzt fehlgeschlagen: innerhalb der Grenze, BAD wird nicht erneut abgerufen
+            with patch("regional.region_executor") as request_path:
+                rows, status = get_region_data(stations, 2000, 2000, 2.5, 0)
+            assert status == 200 and rows[0]["stations"] == 2 and fetched.count("BAD") == 1
+            request_path.submit.assert_not_called()  # Archivierte Stationen werden nur im Hintergrund aktualisiert
+            deadline = time.monotonic() + 5
+            while regional._backfilling and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert sorted(fetched) == ["A", "A", "B", "B", "BAD"]
+
+            # Nach Ablauf der Wartezeit wird der Fehlschlag vergessen und BAD erneut abgerufen
+            with patch("regional.REGION_RETRY_SECONDS", 0):
+                get_region_data(stations, 2000, 2000, 2.5, 0)
+            assert fetched.count("BAD") == 2
+            backfill.shutdown(wait=True)
+
+    with patch("regional.REGION_PROCESSES", 8), patch("regional._worker_processes", 8):
+        regional.share_processes(3)
+        assert regional._worker_processes == 2
+
+# Test des Vorwärmens: beliebteste Stationen und Regionen, Fortschritt
+def test_prewarm_warms_popular_and_regional_stations(tmp_path):
+    popularity = StationPopularity(str(tmp_path / "popularity.json"))
+    for station_id in ["B", "A", "B", "C", "B", "A"]:
+        popularity.record(station_id)
+    popularity.save()
+    assert StationPopularity(popularity.path).top(2) == ["B", "A"]
+
+    warmed = []
+
+    def update(station_id):
+        warmed.append(station_id)
+        if station_id == "BAD":
+            raise Exception("Error fetching station data")
+
+    prewarmer = Prewarmer(StationPopularity(popularity.path), top_stations=2, regions="48.0,8.0,50", workers=2, status_path=str(tmp_path / "status.json"))
+    with patch("prewarm.update_station_archive", update), patch("prewarm.get_stations_within_radius", return_value=([{"id": "A"}, {"id": "BAD"}], 200)) as radius_query:
+        progress = prewarmer.run()
+
+    radius_query.assert_called_once_with(48.0, 8.0, 50.0, PREWARM_REGION_LIMIT, None, None)
+    assert sorted(warmed) == ["A", "B", "BAD"]
+    assert progress == {**progress, "running": False, "total": 3, "done": 3, "failed": 1}
+    assert prewarmer.progress() == progress
+    with pytest.raises(ValueError):
+        parse_regions("48.0,8.0")
+
+def test_prewarm_progress_is_shared_between_processes(tmp_path):
+    prewarmer = Prewarmer(StationPopularity(str(tmp_path / "popularity.json")), regions="", status_path=str(tmp_path / "status.json"))
+    with patch("prewarm.update_station_archive", lambda station_id: None):
+        progress = prewarmer.run()
+    assert Prewarmer(StationPopularity(prewarmer.popularity.path), status_path=prewarmer.status_path).progress() == progress  # Anderer Prozess
+
+# Test der Überwachung des Hintergrundprozesses im gunicorn-Master
+def test_background_process_is_restarted_after_unexpected_exit():
+    import importlib.util
+    import signal
+    from types import SimpleNamespace
+    from unittest.mock import MagicMock
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", os.path.join(os.path.dirname(__file__), "gunicorn.conf.py"))
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    conf.BACKGROUND_RESTART_SECONDS = 0
+    server = SimpleNamespace(reap_workers=MagicMock(), log=MagicMock())
+
+    def reap_until(condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            server.reap_workers()
+            time.sleep(0.01)
+        assert condition()
+
+    conf.run_background_jobs = lambda master_pid: None  # Endet sofort
+    conf.start_background_process(server)
+    conf.supervise_background_process(server)
+    first_pid = server.background_pid
+    conf.run_background_jobs = lambda master_pid: time.sleep(60)
+    reap_until(lambda: server.background_pid != first_pid)
+    server.log.error.assert_called_once()
+
+    # Beenden mit SIGTERM, z. B. in on_exit: kein Neustart
+    os.kill(server.background_pid, signal.SIGTERM)
+    reap_until(lambda: server.background_pid is None)
+    assert server.log.error.call_count == 1
+
+def test_station_popularity_merges_processes(tmp_path):
+    # Zwei Instanzen stehen für zwei Worker-Prozesse mit gemeinsamer Datei
+    first = StationPopularity(str(tmp_path / "popularity.json"))
+    second = StationPopularity(first.path)
+    first.record("A")
+    second.record("B")
+    second.record("B")
+    first.save()
+    second.save()
+    first.save()  # Ohne neue Abrufe unverändert
+    assert json.loads((tmp_path / "popularity.json").read_text()) == {"A": 1, "B": 2}
+    assert StationPopularity(first.path).top(5) == ["B", "A"]
+
+def test_station_popularity_counts_only_found_stations(tmp_path):
+    popularity = StationPopularity(str(tmp_path / "popularity.json"), max_stations=2)
+    app = Flask(__name__)
+    init_routes(app)
+    client = app.test_client()
+
+    def station_data(station_id, start_year, end_year):
+        if station_id == "JUNK":
+            return {"message": "Error fetching station data: 404"}, 500
+        return [{"year": start_year}], 200
+
+    with patch("controller.get_station_data", station_data), patch("controller.response_cache", ResponseCache()), patch("controller.station_popularity", popularity):
+        for station_id in ["A", "JUNK", "A", "B"]:
+            client.get(f"/station-data/{station_id}/2000/2000")
+    assert popularity.top(5) == ["A", "B"]
+
+    # Weitere Stationen über der Obergrenze werden weder gezählt noch gespeichert
+    popularity.record("C")
+    popularity.save()
+    popularity.record("C")
+    popularity.record("C")
+    popularity.record("C")
+    popularity.save()
+    assert json.loads((tmp_path / "popularity.json").read_text()) == {"C": 3, "A": 2}
+
+# Test der Messpunkte: Server-Timing-Header und /metrics
+def test_request_metrics_and_server_timing():
+    app = Flask(__name__)
+    init_routes(app)
+    client = app.test_client()
+
+    def station_data(station_id, start_year, end_year):
+        return [{"year": start_year}], 200
+
+    with patch("controller.get_station_data", station_data), patch("controller.response_cache", ResponseCache()):
+        with patch("controller.request_metrics", RequestMetrics()), patch("metrics.request_metrics", RequestMetrics()) as stage_metrics:
+            with patch("controller.SERVER_TIMING", True):
+                response = client.get("/station-data/X/2000/2001")
+            assert response.status_code == 200
+            assert "serialize;dur=" in response.headers["Server-Timing"] and "total;dur=" in response.headers["Server-Timing"]
+            assert client.get("/station-data/X/2000/2001").headers.get("Server-Timing") is None
+
+            metrics = client.get("/metrics").get_data(as_text=True)
+            assert 'http_responses_total{route="/station-data/<string:station_id>/<int:start_year>/<int:end_year>",status="200"} 2' in metrics
+            assert 'station_stage_seconds_count{stage="serialize"} 1' in stage_metrics.render()  # Zweiter Abruf aus dem Cache
+
+def test_slow_request_profiler_keeps_slow_profiles(tmp_path):
+    profiler = SlowRequestProfiler(slow_seconds=0.5, sample_rate=1, directory=str(tmp_path))
+    profile = profiler.start()
+    sorted(range(1000))
+    assert profiler.finish(profile, 0.1, "/station-data/X/2000/2001") is None  # Schnell: verworfen
+
+    profile = profiler.start()
+    sorted(range(1000))
+    path = profiler.finish(profile, 1.0, "/station-data/X/2000/2001")
+    assert path.endswith("station-data_X_2000_2001.prof")
+    assert pstats.Stats(path).total_calls > 0
+    assert SlowRequestProfiler(slow_seconds=0).start() is None
+
+# Benchmark-Suite läuft ohne Netzwerk auf synthetischen Daten
+def test_benchmark_suite_runs_offline():
+    from benchmarks import suite
+
+    results = suite.run(station_sizes=(200,), year_sizes=(2,), runs=2, queries=5)
+    assert [result["name"] for result in results["results"]] == [
+        "parse_stations_data", "parse_inventory_data", "get_stations_within_radius",
+        "parse_station_data", "calculate_averages", "station_columns_averages",
+    ]
+    assert all(result["p99_ms"] >= result["p50_ms"] > 0 and result["peak_memory_bytes"] >= 0 for result in results["results"])
+    assert [row[4] for row in suite.compare(results, results)] == [1.0] * 6
+
+def test_inventory_updates_notify_after_update():
+    updated = threading.Event()
+    with patch("controller.update_stations", return_value=True):
+        stop = start_inventory_updates(check_seconds=60, on_update=updated.set)
+        assert updated.wait(5)
+    stop.set()
+
+# Import einer lokalen GHCN-Kopie: CSV, CSV.gz und .dly aus dem Tarball, Fortsetzen und Betrieb ohne Netzwerk
+def test_import_local_mirror(tmp_path):
+    import io
+    import tarfile
+    from mirror_import import import_mirror
+
+    mirror = tmp_path / "mirror"
+    (mirror / "csv" / "by_station").mkdir(parents=True)
+    (mirror / "csv.gz" / "by_station").mkdir(parents=True)
+    (mirror / "ghcnd-stations.txt").write_text(
+        "GME00129634  48.0458    8.4617  720.0    VILLINGEN-SCHWENNINGEN                  10929\n"
+        "GME00128002  48.1819    8.6358  588.0    ROTTWEIL                                     \n"
+    )
+    (mirror / "ghcnd-inventory.txt").write_text("GME00129634  48.0458    8.4617 TMAX 1947 2025\nGME00128002  48.1819    8.6358 TMIN 1957 2025\n")
+    (mirror / "csv" / "by_station" / "GME00129634.csv").write_text("ID,DATE,ELEMENT,DATA_VALUE\nGME00129634,20000115,TMAX,100\n")
+    (mirror / "csv.gz" / "by_station" / "GME00128002.csv.gz").write_bytes(gzip.compress(b"ID,DATE,ELEMENT,DATA_VALUE\nGME00128002,20000115,TMIN,-20\n"))
+    dly = ("USW00000001200001TMAX" + "  150   " + "-9999   " * 30 + "\nUSW00000001200001PRCP" + "    5   " * 31 + "\n").encode()
+    with tarfile.open(mirror / "ghcnd_all.tar.gz", "w:gz") as tar:
+        for name, content in (("ghcnd_all/USW00000001.dly", dly), ("ghcnd_all/GME00129634.dly", b"")):
+            member = tarfile.TarInfo(name)
+            member.size = len(content)
+            tar.addfile(member, io.BytesIO(content))
+
+    archive = StationArchive(str(tmp_path / "archive"))
+    catalog_path = str(tmp_path / "stations.npy")
+    result = import_mirror(LocalMirror(str(mirror)), archive, catalog_path, processes=2)
+    assert result == {"stations": 2, "imported": 3, "skipped": 0, "failed": 0}
+    assert len(read_catalog(catalog_path)[0]) == 2
+    for station_id, date, element, value in (("GME00129634", 20000115, 0, 100), ("GME00128002", 20000115, 1, -20), ("USW00000001", 20000101, 0, 150)):
+        (dates, elements, values), = archive.read(station_id, 2000, 2000)
+        assert (dates.tolist(), elements.tolist(), values.tolist()) == ([date], [element], [value])
+
+    # Erneuter Lauf nach einer Unterbrechung überspringt bereits archivierte Stationen
+    assert import_mirror(LocalMirror(str(mirror)), archive, catalog_path, processes=0)["skipped"] == 3
+
+    with patch("external.local_mirror", LocalMirror(str(mirror))), patch("external.fetch_url") as fetch:
+        meta = archive.meta("GME00128002")
+        response = fetch_station_data("GME00128002")
+        assert archive.update("GME00128002", response) == meta  # Gleiche Version wie beim Import: nicht erneut geparst
+        response.close()
+        assert fetch_station_data("USW00000001")[1] == 404
+        fetch.assert_not_called()
+
+    # Asynchroner Pfad (ASGI) liest ebenfalls nur die lokale Kopie
+    pytest.importorskip("httpx")
+    import external_async
+    with patch("external.local_mirror", LocalMirror(str(mirror))), patch("external_async.fetch_url") as fetch:
+        response = asyncio.run(external_async.fetch_station_data("GME00128002"))
+        assert response.content == b"ID,DATE,ELEMENT,DATA_VALUE\nGME00128002,20000115,TMIN,-20\n"
+        assert asyncio.run(external_async.fetch_station_data("USW00000001"))[1] == 404
+        fetch.assert_not_called()
+
+
 if __name__ == "__main__":
     test_parse_station_data()
     test_parse_inventory_data()
@@ -0,0 +1,15 @@
+import argparse
+import sys
+from controller import update_inventory
+
+# Stationsliste als eigenständiger Befehl aktualisieren, z. B. per Cronjob
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Updates the station catalog from the NOAA station and inventory files.")
+    parser.add_argument("--force", action="store_true", help="update regardless of the age of the station list")
+    parser.add_argument("--refresh-days", type=int, help="minimum age of the station list in days")
+    args = parser.parse_args()
+
+    updated = update_inventory(args.refresh_days, args.force)
+    if updated is None:
+        sys.exit(1)
+    print("Station catalog updated." if updated else "Station catalog is up to date.")